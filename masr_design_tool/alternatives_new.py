@@ -1,12 +1,32 @@
-import shelve
-from operator import add
+from collections import OrderedDict, namedtuple
 
+import numpy as np
+
+import batchsizing
+import catalogdb
+import catalogsnapshot
 import dblocation
+from battery import BatteryVoltageIndex
 
 db_location = dblocation.db_location
 
+# Compact stand-in for a vehicle object yielded by iter_alternatives(records=True). The feasible attribute has the same
+# meaning as Vehicle.feasible (True, or a (reason for failure, failed value) tuple), and performance and geometry are
+# the lists the vehicle set_performance and set_geometry methods would be given (None if the alternative is not
+# feasible).
+AlternativeRecord = namedtuple('AlternativeRecord', ['platform', 'pmcombo', 'battery', 'pmaterial', 'feasible',
+                                                     'performance', 'geometry'])
+
+# Yielded by iter_alternatives(prune=True) in place of a group of alternatives that were rejected for the same reason
+# without being sized one by one (see batchsizing.prune_and_evaluate). The feasible attribute is a (reason for failure,
+# None) tuple so that these can be passed to the same consumers as vehicle objects.
+PrunedAlternatives = namedtuple('PrunedAlternatives', ['platform', 'feasible', 'count', 'fail_sum'])
+
+# The memoizing component matrix of the last search and the key it was loaded with (see load_component_matrix)
+_last_matrix = {'key': None, 'matrix': None}
+
 
-def generate_alternatives(constraints):
+def generate_alternatives(constraints, platforms=None, batch=True, processes=None, dominance_safe=False):
     """
     This function is called from oo_quad_GUI.quadGUI.alternatives_frame.find_alternatives(). The constraints input is
     a list of constraints defined by the user within the main GUI and is of the form:
@@ -18,11 +38,25 @@ def generate_alternatives(constraints):
     The purpose of this function is to find all of the possible vehicle alternatives given the input constraints,
     although the function output is actually a full list of both infeasible and feasible alternatives (see block
     comment below).
+
+    The platforms input is a list of vehicle class names (e.g., ['Quadmultipiece', 'Quadonepiece']) to size every
+    component combination for. By default only the multi piece quadrotor is considered.
+
+    If batch is True (the default) the sizing models are evaluated for all alternatives at once using each platform's
+    batch_is_feasible classmethod (see batchsizing.py) and the vehicle objects are then built from the results. If
+    batch is False each alternative is built and checked one at a time with its is_feasible method. Both give the same
+    alternatives in the same order.
+
+    If processes is greater than 1 (batch mode only) the prop/motor combos are split across a pool of that many worker
+    processes (see batchsizing.evaluate). The output is the same as for a single process.
+
+    If dominance_safe is True, prop/motor combos that are dominated by another combo (one that makes every vehicle
+    better in every performance attribute, see batchsizing.ComponentSkyline) are left out of the search. Exactly the
+    same Pareto designs are found, but the dominated designs are not, so this is only for when the Pareto designs are
+    all that matter.
     """
-    pmcombo_db = shelve.open(db_location+'propmotorcombodb')
-    battery_db = shelve.open(db_location+'batterydb')
-    print_material_db = shelve.open(db_location+'printingmaterialdb')
-    platforms = ['Quadmultipiece']
+    if platforms is None:
+        platforms = ['Quadmultipiece']
 
     # This is a "full factorial" search for possible alternatives. If the number of components available becomes large
     # this method of searching may need to be revised. My logic here saves all alternatives in the 'alternatives' list.
@@ -31,16 +65,32 @@ def generate_alternatives(constraints):
     # the first reason the algorithm found for rejecting the alternative. By saving all alternatives in one list they
     # will be easy to pass back to the main gui for display or for statistical purposes. If the list of alternatives
     # becomes very large a list may take up too much memory. In this case other data structures should be used to hold
-    # feasible or non-feasible alternatives.
+    # feasible or non-feasible alternatives (see iter_alternatives below).
     alternatives = []
     selected_pmaterials = constraints[-2]
     # If the user has not selected any print materials, no alternatives are possible
     if not selected_pmaterials:
         return alternatives
-    for pmcombo in pmcombo_db.values():
-        # pre-filter out all batteries that will not be compatible with the prop/motor combo data
-        good_bats = [bat for bat in battery_db.values()
-                     if abs(float(bat.voltage['value'])-float(pmcombo.test_bat_volt_rating['value'])) < 0.1]
+    pmcombos, batteries = load_components()
+    if dominance_safe:
+        skyline = batchsizing.ComponentSkyline(batchsizing.ComponentMatrix(pmcombos, batteries, selected_pmaterials,
+                                                                           pair=False), constraints, platforms)
+        pmcombos, batteries = skyline.pmcombos, skyline.batteries
+    if batch:
+        # The component matrix is loaded once and shared by all platforms. The vehicles are interleaved by platform to
+        # keep the same order as the loops below.
+        matrix = batchsizing.ComponentMatrix(pmcombos, batteries, selected_pmaterials)
+        results = batchsizing.evaluate(matrix, constraints, platforms, processes)
+        for i in xrange(len(matrix.triples()[0])):
+            for result in results:
+                alternatives.append(result.vehicle(i))
+        return alternatives
+
+    # The batteries are only read from the database once. The voltage index is then used to pre-filter out all batteries
+    # that will not be compatible with the prop/motor combo data.
+    bat_index = BatteryVoltageIndex(batteries)
+    for pmcombo in pmcombos:
+        good_bats = bat_index.compatible(pmcombo.test_bat_volt_rating['value'])
         for battery in good_bats:
             for pmaterial in selected_pmaterials:
                 for platform in platforms:
@@ -54,13 +104,346 @@ def generate_alternatives(constraints):
                         this_vehicle.set_geometry(geometry)
                     alternatives.append(this_vehicle)
 
-    pmcombo_db.close()
-    battery_db.close()
-    print_material_db.close()
-
     return alternatives
 
 
+def load_components(tolerance=0.1):
+    """
+    Returns the list of all prop/motor combos in the catalog and the list of the batteries that are compatible with at
+    least one of them (i.e., within 'tolerance' volts of the test battery voltage of a combo, see BatteryVoltageIndex).
+    The batteries are found with voltage range queries on the cached catalogs (see catalogdb.load_catalog). Both lists
+    are in catalog order.
+    """
+    pmcombo_db = catalogdb.load_catalog('propmotorcombodb')
+    battery_db = catalogdb.load_catalog('batterydb')
+    test_volts = set(volt for _, volt in pmcombo_db.column('test_bat_volt') if volt is not None)
+    # The windows are padded slightly, the exact compatibility test is left to the BatteryVoltageIndex
+    pad = tolerance * 1e-3
+    batteries = battery_db.query(voltage=[(volt-tolerance-pad, volt+tolerance+pad) for volt in sorted(test_volts)])
+    return pmcombo_db.values(), batteries
+
+
+def snapshot_matrix(selected_pmaterials, memoize=False, pair=True, tolerance=0.1):
+    """
+    Returns a batchsizing.ComponentMatrix of the same components as load_components and the selected print materials,
+    with its arrays memory-mapped from the catalog snapshots (see catalogsnapshot). The component objects are only
+    loaded from the catalogs when a vehicle is made from the matrix.
+    """
+    test_volts = np.unique(catalogsnapshot.load_columns('propmotorcombodb').column('test_bat_volt'))
+    test_volts = test_volts[~np.isnan(test_volts)]
+    bat_volts = np.asarray(catalogsnapshot.load_columns('batterydb').column('voltage'))
+    # The same padded windows as load_components
+    pad = tolerance * 1e-3
+    in_window = np.zeros(len(bat_volts), dtype=bool)
+    for volt in test_volts:
+        in_window |= (bat_volts >= volt-tolerance-pad) & (bat_volts <= volt+tolerance+pad)
+    return catalogsnapshot.component_matrix(selected_pmaterials, np.flatnonzero(in_window), memoize, pair)
+
+
+def load_component_matrix(selected_pmaterials, memoize=False, dominance_safe=False, constraints=None, platforms=None):
+    """
+    Returns a batchsizing.ComponentMatrix of the prop/motor combos and batteries in the databases and the selected print
+    materials, read from the catalog snapshots (see snapshot_matrix).
+
+    If dominance_safe is True only the components that are not dominated on any of the vehicle class names in
+    'platforms' for the requirements in 'constraints' are put in the matrix (see generate_alternatives). The
+    batchsizing.ComponentSkyline that picked them, which holds the number of components and alternatives dropped, is
+    kept in the skyline attribute of the matrix.
+
+    If memoize is True the matrix memoizes its sizing quantities (see batchsizing.ComponentMatrix) and is kept for the
+    next call. As long as the prop/motor combo and battery catalogs have not been written to and the same print
+    materials are selected, the next call returns the same matrix, so a search where only the requirement thresholds
+    were changed does not have to redo the threshold independent part of the sizing.
+    """
+    if memoize:
+        key = (catalogdb.versions(['propmotorcombodb', 'batterydb']),
+               tuple((pmat.name, pmat.density['value']) for pmat in selected_pmaterials))
+        if dominance_safe:
+            # The dominance tests only depend on the parts of the requirements that change the vehicle weight
+            key += (tuple(platforms), constraints[-1], sum(s.weight['value'] for s in constraints[-3]))
+        if _last_matrix['key'] == key:
+            return _last_matrix['matrix']
+
+    if dominance_safe:
+        matrix = batchsizing.ComponentSkyline(snapshot_matrix(selected_pmaterials, pair=False), constraints,
+                                              platforms).matrix(memoize)
+    else:
+        matrix = snapshot_matrix(selected_pmaterials, memoize)
+    if memoize:
+        _last_matrix['key'] = key
+        _last_matrix['matrix'] = matrix
+    return matrix
+
+
+def iter_alternatives(constraints, platforms=None, records=False, processes=None, shard_size=50000, prune=False,
+                      memoize=False, dominance_safe=False):
+    """
+    Generator version of generate_alternatives(). The alternatives are yielded in the same order as
+    generate_alternatives returns them, but they are sized a shard of prop/motor combos at a time (see
+    batchsizing.iter_evaluate) and nothing is kept once it has been yielded. As long as the caller does not keep every
+    alternative either (see FailureHistogram and FeasibleSet below), the peak memory use stays flat no matter how many
+    components are in the databases.
+
+    If records is False the vehicle objects are yielded. If records is True an AlternativeRecord is yielded instead,
+    which holds the components and the sizing outcome without building the vehicle object. This is much faster for
+    large searches where most of the alternatives are only counted.
+
+    The platforms and processes inputs are the same as for generate_alternatives. The shard_size input is the number of
+    compatible (prop/motor combo, battery) pairs sized at once.
+
+    If prune is True, groups of alternatives that are bound to fail for the same reason are rejected without sizing
+    each one (see batchsizing.prune_and_evaluate), and a single PrunedAlternatives record is yielded for each reason
+    instead. Only the alternatives that were not pruned are yielded individually. In this case the alternatives of each
+    shard are yielded one platform at a time, so the order differs from generate_alternatives.
+
+    If memoize is True the component matrix and its threshold independent sizing quantities are kept between calls
+    (see load_component_matrix). This is meant for interactive use, where the same search is repeated with slightly
+    different requirements, and costs a few arrays with one entry per alternative.
+
+    If dominance_safe is True the dominated components are left out of the search (see generate_alternatives).
+    """
+    selected_pmaterials = constraints[-2]
+    # If the user has not selected any print materials, no alternatives are possible
+    if not selected_pmaterials:
+        return
+    if platforms is None:
+        platforms = ['Quadmultipiece']
+
+    matrix = load_component_matrix(selected_pmaterials, memoize, dominance_safe, constraints, platforms)
+
+    def alternative(platform, result, i):
+        if not records:
+            return result.vehicle(i)
+        feasibility, performance, geometry = result.outcome(i)
+        if feasibility != 'true':
+            feasible = (feasibility, performance)
+            performance = None
+        else:
+            feasible = True
+        return AlternativeRecord(platform, matrix.pmcombos[result.pm[i]], matrix.batteries[result.bat[i]],
+                                 matrix.pmaterials[result.mat[i]], feasible, performance, geometry)
+
+    for results in batchsizing.iter_evaluate(matrix, constraints, platforms, shard_size, processes, prune):
+        if not prune:
+            for i in xrange(len(results[0])):
+                for platform, result in zip(platforms, results):
+                    yield alternative(platform, result, i)
+            continue
+        for platform, result in zip(platforms, results):
+            for reason, (count, fail_sum) in result.pruned.items():
+                yield PrunedAlternatives(platform, (reason, None), count, fail_sum)
+            for i in xrange(len(result)):
+                yield alternative(platform, result, i)
+
+
+def store_alternatives(constraints, platforms=None, processes=None, shard_size=50000, prune=True, memoize=False,
+                       dominance_safe=False):
+    """
+    Runs the same search as iter_alternatives (see it for the inputs) and returns an AlternativeStore holding the
+    outcome. Only the feasible alternatives are built as vehicle objects; the infeasible ones are stored as compact
+    columns straight from the batch sizing results, without building a vehicle object or a record for each of them.
+    """
+    if platforms is None:
+        platforms = ['Quadmultipiece']
+    selected_pmaterials = constraints[-2]
+    # If the user has not selected any print materials, no alternatives are possible
+    if not selected_pmaterials:
+        return AlternativeStore(None, platforms)
+    matrix = load_component_matrix(selected_pmaterials, memoize, dominance_safe, constraints, platforms)
+    store = AlternativeStore(matrix, platforms)
+    for results in batchsizing.iter_evaluate(matrix, constraints, platforms, shard_size, processes, prune):
+        store.add_results(results)
+    return store
+
+
+class AlternativeStore(object):
+    """
+    Compact columnar store of the outcome of a search. The feasible alternatives are built as vehicle objects and kept
+    in the feasible list. For each infeasible alternative only the following is kept, as one NumPy array per column
+    (see columns()):
+
+        platform    - index of the vehicle class name in self.platforms
+        pmcombo     - index of the prop/motor combo in self.matrix.pmcombos
+        battery     - index of the battery in self.matrix.batteries
+        pmaterial   - index of the print material in self.matrix.pmaterials
+        reason      - index of the reason for failure in batchsizing.fail_reasons
+        fail_value  - the value that failed the constraint (nan if there is none)
+
+    An infeasible vehicle object can still be built on demand with vehicle(k). Alternatives that were pruned (see
+    batchsizing.prune_and_evaluate) are only counted. len() of the store is the number of alternatives searched, the
+    number of stored infeasible rows is n_stored_failures. The failure counts and averages of everything stored are
+    kept in the stats attribute, a FailureHistogram. If the components of the search were pre-filtered (see
+    load_component_matrix), the batchsizing.ComponentSkyline that picked them is kept in the skyline attribute.
+    """
+    def __init__(self, matrix, platforms):
+        self.matrix = matrix
+        self.platforms = list(platforms)
+        self.skyline = matrix.skyline if matrix is not None else None
+        self.feasible = []
+        self.stats = FailureHistogram()
+        self._chunks = []
+
+    def __len__(self):
+        # Every alternative of the search: feasible, stored infeasible, and pruned
+        return self.stats.n_alternatives
+
+    @property
+    def n_stored_failures(self):
+        """
+        Number of infeasible alternatives stored as compact rows (i.e., the length of the columns() arrays).
+        """
+        return sum(len(chunk[0]) for chunk in self._chunks)
+
+    def add_results(self, results):
+        """
+        Adds the BatchResults (one per platform, in the order of self.platforms) of a shard of self.matrix.
+        """
+        for code, result in enumerate(results):
+            feasible = result.feasible_mask()
+            for i in np.nonzero(feasible)[0]:
+                self.feasible.append(result.vehicle(i))
+            self.stats.n_alternatives += len(self.feasible) - self.stats.n_feasible
+            self.stats.n_feasible = len(self.feasible)
+
+            failed = ~feasible
+            self.add_failures(code, result.pm[failed], result.bat[failed], result.mat[failed], result.reason[failed],
+                              result.fail_value[failed])
+            for fail_reason, (count, fail_sum) in result.pruned.items():
+                self.stats.add_failures(fail_reason, count, fail_sum)
+
+    def add_failures(self, platform, pm, bat, mat, reason, fail_value):
+        """
+        Stores the infeasible alternatives of the vehicle class self.platforms[platform] given by the column arrays pm,
+        bat, mat, reason and fail_value (see columns()) and counts them in the stats.
+        """
+        self._chunks.append((np.full(len(reason), platform, dtype=np.int8), np.asarray(pm, dtype=np.int32),
+                             np.asarray(bat, dtype=np.int32), np.asarray(mat, dtype=np.int32),
+                             np.asarray(reason, dtype=np.int8), np.asarray(fail_value, dtype=float)))
+        reason, fail_value = self._chunks[-1][4:]
+        for reason_code in np.unique(reason):
+            values = fail_value[reason == reason_code]
+            fail_sum = None if np.isnan(values).any() else float(values.sum())
+            self.stats.add_failures(batchsizing.fail_reasons[reason_code], len(values), fail_sum)
+
+    def columns(self):
+        """
+        Returns a dictionary of the infeasible alternative columns described above.
+        """
+        names = ['platform', 'pmcombo', 'battery', 'pmaterial', 'reason', 'fail_value']
+        if len(self._chunks) != 1:
+            # Merge the chunks so that they only need to be concatenated once
+            dtypes = [np.int8, np.int32, np.int32, np.int32, np.int8, float]
+            self._chunks = [tuple(np.concatenate([chunk[k] for chunk in self._chunks]).astype(dtypes[k])
+                                  if self._chunks else np.zeros(0, dtype=dtypes[k]) for k in range(len(names)))]
+        return dict(zip(names, self._chunks[0]))
+
+    def vehicle(self, k):
+        """
+        Builds the vehicle object of infeasible alternative k, with its feasible attribute set to the usual (reason for
+        failure, failed value) tuple.
+        """
+        columns = self.columns()
+        platform = self.platforms[columns['platform'][k]]
+        this_vehicle = getattr(__import__(platform.lower()), platform)(
+            self.matrix.pmcombos[columns['pmcombo'][k]], self.matrix.batteries[columns['battery'][k]],
+            self.matrix.pmaterials[columns['pmaterial'][k]])
+        fail_value = columns['fail_value'][k]
+        this_vehicle.feasible = (batchsizing.fail_reasons[columns['reason'][k]],
+                                 None if np.isnan(fail_value) else float(fail_value))
+        return this_vehicle
+
+
+def collect_alternatives(alternatives, *consumers):
+    """
+    Passes every alternative from the 'alternatives' iterable (e.g., iter_alternatives) to the add method of each of the
+    consumers and returns the consumers. For example:
+
+        histogram, feasible_set = collect_alternatives(iter_alternatives(constraints), FailureHistogram(),
+                                                       FeasibleSet())
+    """
+    for alt in alternatives:
+        for consumer in consumers:
+            consumer.add(alt)
+    return consumers
+
+
+class FailureHistogram(object):
+    """
+    Counts alternatives by their reason for failure as they are added, so that infeasible alternatives do not need to
+    be kept around to display failure statistics. Works with vehicle objects, AlternativeRecords, and
+    PrunedAlternatives.
+
+        n_alternatives  - total number of alternatives added
+        n_feasible      - number of feasible alternatives added
+        counts          - dictionary of the form {reason for failure: number of alternatives}
+        fail_sums       - dictionary of the form {reason for failure: sum of failed values}. The value is None if any
+                          of the failed values for that reason was not a number.
+    """
+    def __init__(self):
+        self.n_alternatives = 0
+        self.n_feasible = 0
+        self.counts = {}
+        self.fail_sums = {}
+
+    def add(self, alt):
+        if isinstance(alt, PrunedAlternatives):
+            self.add_failures(alt.feasible[0], alt.count, alt.fail_sum)
+            return
+        # Note that "is True" is needed here since a failed alternative's feasible attribute is a non-empty tuple.
+        if alt.feasible is True:
+            self.n_alternatives += 1
+            self.n_feasible += 1
+            return
+        reason, fail_value = alt.feasible
+        self.add_failures(reason, 1, fail_value)
+
+    def add_failures(self, reason, count, fail_sum):
+        """
+        Adds 'count' alternatives that failed for 'reason', whose failed values add up to 'fail_sum'.
+        """
+        self.n_alternatives += count
+        if reason in self.counts:
+            self.counts[reason] += count
+            if self.fail_sums[reason] is not None:
+                self.fail_sums[reason] = self.add_fail_value(self.fail_sums[reason], fail_sum)
+        else:
+            self.counts[reason] = count
+            self.fail_sums[reason] = self.add_fail_value(0, fail_sum)
+
+    @staticmethod
+    def add_fail_value(fail_sum, fail_value):
+        try:
+            return fail_sum + fail_value
+        except TypeError:
+            return None
+
+    def average(self, reason):
+        """
+        Returns the average failed value for 'reason', or None if the failed values for that reason are not numbers.
+        """
+        if self.fail_sums[reason] is None:
+            return None
+        return float(self.fail_sums[reason]) / self.counts[reason]
+
+    def sorted_reasons(self):
+        """
+        Returns the reasons for failure sorted from most to least common.
+        """
+        return sorted(self.counts, key=self.counts.get, reverse=True)
+
+
+class FeasibleSet(object):
+    """
+    Keeps only the feasible alternatives that are added to it (in the alternatives list attribute).
+    """
+    def __init__(self):
+        self.alternatives = []
+
+    def add(self, alt):
+        if alt.feasible is True:
+            self.alternatives.append(alt)
+
+
 def score_alternatives(alternatives, weightings):
     """
     This function takes in a list of feasible alternatives, scores the alternatives based on user-specified importance
@@ -79,74 +462,593 @@ def score_alternatives(alternatives, weightings):
                                 ('perf_attr2', [perf_attr2_weight, 'low']), ... )])
     where the 'high' and 'low' tell whether or not a high value of the attr is desirable or vice versa.
 
-    This function is called from oo_quad_GUI.AlternativesFrame.find_alternatives
-    """
-    # First we need to normalize the weighting values
-    wgt_vals = [float(val[0]) for val in weightings.values()]
-    wgt_sum = sum(wgt_vals)
-    norm_wgt_vals = [wgt/wgt_sum for wgt in wgt_vals]
-    # Loop through all performance attributes contained in the weightings dictionary.
-    total_d_pos = [0] * len(alternatives)
-    total_d_neg = [0] * len(alternatives)
-    for i, perf_attr in enumerate(weightings):
-        weight = norm_wgt_vals[i]
+    To re-rank the same alternatives when only the weightings change, keep the AlternativeScores instance instead (as
+    main_GUI.AlternativesFrame does).
+    """
+    return AlternativeScores(alternatives, weightings).rescore(weightings)
+
+
+class AlternativeScores(object):
+    """
+    Holds what score_alternatives computes from the feasible alternatives that does not depend on the importance
+    weightings: the normalized (alternatives x attributes) objective matrix and the Pareto flags. Only the weighted
+    TOPSIS closeness is recomputed by rescore, so the alternatives can be re-ranked as soon as the weightings change.
+    The alternatives can also be sorted into Pareto fronts with set_front_ranks, which is only done on request because
+    it takes longer than finding the Pareto frontier, and thinned out to an epsilon-Pareto archive with
+    epsilon_members.
+
+    The weightings input only needs to hold the attribute names and the 'high'/'low' directions here (see
+    score_alternatives). The alternatives are kept in the order they were given, which is the order of the rows.
+    """
+
+    def __init__(self, alternatives, weightings):
+        self.alternatives = list(alternatives)
+        self.attrs = weightings.keys()
+        self.directions = [weightings[attr][1] for attr in self.attrs]
+        self.objectives = objective_matrix(self.alternatives, self.attrs)
+        self.normalized = normalize_objectives(self.objectives)
+        self.scores = None
+        self.front_rank = None
+        self.max_front = None
+        self.archive = None
+        self.archive_resolutions = None
+
+        # Find Pareto solutions. The frontier does not depend on the weightings.
+        self.on_front = pareto_mask(self.objectives, self.directions)
+        for alt, pareto in zip(self.alternatives, self.on_front):
+            if pareto:
+                alt.pareto = True
+
+    def matches(self, weightings):
+        """
+        Tells whether the weightings are over the same attributes and directions as the ones the scores were set up
+        with, i.e., whether rescore can be used instead of building new scores.
+        """
+        return (weightings.keys() == self.attrs and
+                [weightings[attr][1] for attr in self.attrs] == self.directions)
+
+    def set_front_ranks(self, max_front=None):
+        """
+        Sorts the alternatives into Pareto fronts (see front_ranks) and assigns the front of each one to its front
+        attribute (1 for the Pareto frontier). If max_front is given, the alternatives beyond that many fronts get
+        max_front + 1. The fronts do not depend on the weightings, so they are only sorted out once.
+        """
+        if self.front_rank is None or (self.max_front is not None and
+                                       (max_front is None or max_front > self.max_front)):
+            self.front_rank = front_ranks(self.objectives, self.directions, max_front=max_front)
+            self.max_front = max_front
+        ranks = self.front_rank if max_front is None else np.minimum(self.front_rank, max_front + 1)
+        for alt, rank in zip(self.alternatives, ranks.tolist()):
+            alt.front = rank
+        return ranks
+
+    def epsilon_members(self, resolutions):
+        """
+        Returns the alternatives in the epsilon-Pareto archive (see epsilon_archive) for the given resolutions, a
+        dictionary of the form {'perf_attr1': resolution, ...} in the units of the alternatives' attributes, in the
+        order of the alternatives. The archive is kept until the resolutions change.
+        """
+        key = [resolutions[attr] for attr in self.attrs]
+        if key != self.archive_resolutions:
+            self.archive = epsilon_archive(self.objectives, self.directions, key)
+            self.archive_resolutions = key
+        return [self.alternatives[i] for i in self.archive.tolist()]
+
+    def rescore(self, weightings, method='TOPSIS'):
+        """
+        Applies the weightings to the cached normalized objectives with the given ranking method (a key of
+        ranking_methods), assigns the scores to the quad.score attribute and returns the list of alternatives.
+        """
+        weights = [weightings[attr][0] for attr in self.attrs]
+        self.scores = ranking_methods[method](self.normalized, weights, self.directions)
+        for quad, score in zip(self.alternatives, self.scores.tolist()):
+            quad.score = score
+        return self.alternatives
+
+    def weight_sensitivity(self, weightings, n_samples=2000, concentration=50.0, method='TOPSIS', max_rank=10,
+                           seed=None):
+        """
+        Monte Carlo analysis of how robust the ranking is to the importance weightings. n_samples weighting vectors are
+        drawn from a Dirichlet distribution centred on the given weightings (the larger the concentration, the closer
+        the samples stay to them), the alternatives are scored with the given ranking method for every sample, and the
+        ranks are summarized in a WeightSensitivity. The cached normalized objectives are used for every sample.
+        """
+        weights = np.array([weightings[attr][0] for attr in self.attrs], dtype=float)
+        samples = np.random.RandomState(seed).dirichlet(concentration * weights / weights.sum(), n_samples)
+        sensitivity = WeightSensitivity(len(self.alternatives), samples, max_rank)
+        for scores in batched_scores(self.normalized, samples, self.directions, method):
+            sensitivity.add_scores(scores)
+        return sensitivity
+
+    def best(self, k):
+        """
+        Returns the k alternatives with the highest scores from the last rescore, best first. Equal scores keep their
+        original order.
+        """
+        if k < 1:
+            return []
+        if k >= len(self.scores):
+            order = np.argsort(-self.scores, kind='mergesort')
+        else:
+            # Only the rows scoring at least the k-th best score are sorted. Taking every row tied with the k-th best
+            # (in their original order) keeps the result the same as a stable sort of all the scores.
+            kth_score = -np.partition(-self.scores, k - 1)[k - 1]
+            candidates = np.nonzero(self.scores >= kth_score)[0]
+            order = candidates[np.argsort(-self.scores[candidates], kind='mergesort')][:k]
+        return [self.alternatives[i] for i in order.tolist()]
+
+
+class WeightSensitivity(object):
+    """
+    Rank statistics of the alternatives of an AlternativeScores over a set of sampled importance weightings (see
+    AlternativeScores.weight_sensitivity). Rank 1 is the best alternative, and alternatives with equal scores share the
+    best rank among them. For alternative i:
+
+        prob_best[i]     - fraction of the samples in which it was ranked first
+        rank_probs[i, r] - fraction of the samples in which it was ranked r + 1, for the first max_rank ranks
+        mean_rank[i]     - its average rank over the samples
+        rank_std[i]      - the standard deviation of its rank
+    """
+
+    def __init__(self, n_alternatives, samples, max_rank=10):
+        self.samples = samples
+        self.n_samples = 0
+        self.max_rank = max_rank
+        self.rank_counts = np.zeros((n_alternatives, max_rank), dtype=int)
+        self.rank_sum = np.zeros(n_alternatives)
+        self.rank_sq_sum = np.zeros(n_alternatives)
+
+    def add_scores(self, scores):
+        """
+        Adds the ranks of the alternatives given a (samples x alternatives) array of scores (high values desirable).
+        """
+        n = scores.shape[1]
+        for row in scores:
+            # One plus the number of alternatives with a strictly higher score
+            rank = n - np.searchsorted(np.sort(row), row, side='right') + 1
+            top = rank <= self.max_rank
+            self.rank_counts[top, rank[top] - 1] += 1
+            self.rank_sum += rank
+            self.rank_sq_sum += rank.astype(float)**2
+        self.n_samples += len(scores)
+
+    @property
+    def rank_probs(self):
+        return self.rank_counts / float(max(1, self.n_samples))
+
+    @property
+    def prob_best(self):
+        return self.rank_probs[:, 0]
+
+    @property
+    def mean_rank(self):
+        return self.rank_sum / max(1, self.n_samples)
+
+    @property
+    def rank_std(self):
+        variance = self.rank_sq_sum / max(1, self.n_samples) - self.mean_rank**2
+        return np.sqrt(np.maximum(variance, 0))
+
+    def prob_top(self, k):
+        """
+        Returns the fraction of the samples in which each alternative was ranked k or better (k <= max_rank).
+        """
+        return self.rank_probs[:, :k].sum(axis=1)
+
+    def most_robust(self, k):
+        """
+        Returns the indices of the k alternatives most often ranked first, ties broken by the average rank.
+        """
+        return np.lexsort([self.mean_rank, -self.prob_best])[:k]
+
+
+def batched_scores(normalized, weight_samples, directions, method='TOPSIS', max_elements=4000000):
+    """
+    Yields (samples x alternatives) arrays of the scores given to the rows of the 'normalized' objectives array by the
+    ranking method for each row of the (samples x attributes) weight_samples array, a few samples at a time. TOPSIS
+    and the weighted sum are computed for all the samples of a batch with a matrix product. The other methods are
+    applied to one sample at a time.
+    """
+    weight_samples = np.asarray(weight_samples, dtype=float)
+    weight_samples = weight_samples / weight_samples.sum(axis=1)[:, np.newaxis]
+    n = len(normalized)
+    step = max(1, max_elements // max(1, n))
+    if method == 'TOPSIS' and n:
+        # With positive weights the weighted ideals are the weighted best and worst values, so the squared distances
+        # are the squared weights times the squared unweighted differences, summed over the attributes.
+        high = np.array([direction == 'high' for direction in directions])
+        col_max = normalized.max(axis=0)
+        col_min = normalized.min(axis=0)
+        pos_sq = (normalized - np.where(high, col_max, col_min))**2
+        neg_sq = (normalized - np.where(high, col_min, col_max))**2
+    elif method == 'weighted sum':
+        utilities = _utilities(normalized, directions)
+    for start in xrange(0, len(weight_samples), step):
+        batch = weight_samples[start:start+step]
+        if method == 'TOPSIS' and n:
+            d_pos = np.sqrt(np.dot(batch**2, pos_sq.T))
+            d_neg = np.sqrt(np.dot(batch**2, neg_sq.T))
+            total = d_pos + d_neg
+            scores = np.ones(total.shape)
+            np.divide(d_neg, total, out=scores, where=total > 0)
+        elif method == 'weighted sum':
+            scores = np.dot(batch, utilities.T)
+        else:
+            scores = np.array([ranking_methods[method](normalized, weights, directions) for weights in batch])
+            scores = scores.reshape(len(batch), n)
+        yield scores
+
+
+def topsis_closeness(objectives, weights, directions):
+    """
+    Returns a NumPy array holding the TOPSIS closeness to the positive ideal solution of each row of the (alternatives
+    x attributes) 'objectives' array (see objective_matrix). weights holds the importance weighting of each column and
+    directions holds 'high' or 'low' for each column, telling whether a high or a low value is desirable.
+    """
+    return weighted_closeness(normalize_objectives(objectives), weights, directions)
+
+
+def normalize_objectives(objectives):
+    """
+    Divides each column of the 'objectives' array by its vector norm. A column whose values are all zero cannot be
+    normalized and is left at zero, so it does not count towards the TOPSIS distances.
+    """
+    # Sum of squares down each column. Reducing a row-major array along the first axis adds the rows in order.
+    objectives = np.ascontiguousarray(objectives, dtype=float)
+    norm = np.sqrt(np.add.reduce(objectives**2, axis=0))
+    norm[norm == 0] = 1.0
+    return objectives / norm
+
+
+def weighted_closeness(normalized, weights, directions):
+    """
+    Returns the TOPSIS closeness of each row of the 'normalized' objectives array (see normalize_objectives) for the
+    given importance weightings. If an alternative is both the positive and the negative ideal solution (all
+    alternatives perform the same) its closeness is 1.
+    """
+    weights = np.array(weights, dtype=float)
+    weights /= weights.sum()
+    if not len(normalized):
+        return np.zeros(0)
+    weighted = weights * normalized
+    pos_ideal, neg_ideal = _ideal_solutions(weighted.max(axis=0), weighted.min(axis=0), directions)
+    return _closeness(weighted, pos_ideal, neg_ideal)
+
+
+def _ideal_solutions(col_max, col_min, directions):
+    """
+    Returns the positive and negative ideal solutions given the largest and smallest weighted value of each attribute.
+    """
+    high = np.array([direction == 'high' for direction in directions])
+    return np.where(high, col_max, col_min), np.where(high, col_min, col_max)
+
+
+def _closeness(weighted, pos_ideal, neg_ideal):
+    """
+    Returns the TOPSIS closeness of each row of the 'weighted' normalized objectives array.
+    """
+    # The distances are summed one attribute at a time (there are only a few) so the rounding does not depend on how
+    # NumPy happens to split up a reduction along a row.
+    d_pos = np.zeros(len(weighted))
+    d_neg = np.zeros(len(weighted))
+    for j in xrange(weighted.shape[1]):
+        d_pos += (weighted[:, j] - pos_ideal[j])**2
+        d_neg += (weighted[:, j] - neg_ideal[j])**2
+    d_pos = np.sqrt(d_pos)
+    d_neg = np.sqrt(d_neg)
+
+    total = d_pos + d_neg
+    closeness = np.ones(len(weighted))
+    np.divide(d_neg, total, out=closeness, where=total > 0)
+    return closeness
+
+
+def weighted_sum(normalized, weights, directions):
+    """
+    Returns the weighted sum of the utilities (see _utilities) of each row of the 'normalized' objectives array. The
+    best possible score is 1.
+    """
+    weights = np.array(weights, dtype=float)
+    weights /= weights.sum()
+    score = np.zeros(len(normalized))
+    utilities = _utilities(normalized, directions)
+    for j in xrange(len(weights)):
+        score += weights[j] * utilities[:, j]
+    return score
+
+
+def vikor(normalized, weights, directions, v=0.5):
+    """
+    Returns 1 - Q, where Q is the VIKOR compromise measure of each row of the 'normalized' objectives array, so that
+    high scores are desirable like with the other ranking methods. Q weighs the group utility (the weighted sum of the
+    distances from the best value of each attribute) against the individual regret (the largest weighted distance) by
+    v and 1 - v, each one scaled to the range found among the alternatives.
+    """
+    weights = np.array(weights, dtype=float)
+    weights /= weights.sum()
+    if not len(normalized):
+        return np.zeros(0)
+    regrets = weights * (1.0 - _utilities(normalized, directions))
+    group = np.zeros(len(normalized))
+    for j in xrange(len(weights)):
+        group += regrets[:, j]
+    individual = regrets.max(axis=1)
+    q = v*_scaled(group) + (1 - v)*_scaled(individual)
+    return 1.0 - q
+
+
+def lexicographic(normalized, weights, directions):
+    """
+    Ranks the rows of the 'normalized' objectives array on the attribute with the highest weighting, breaking ties with
+    the next highest, and so on (equal weightings keep the attribute order). The score goes from 1 for the best row to
+    0 for the worst one, and rows that perform the same get the same score.
+    """
+    n = len(normalized)
+    if n < 2:
+        return np.ones(n)
+    priority = sorted(range(len(weights)), key=lambda j: -weights[j])
+    utilities = _utilities(normalized, directions)
+    # np.lexsort sorts by the last key first. The utilities are negated so that the best row comes first.
+    order = np.lexsort([-utilities[:, j] for j in reversed(priority)])
+    ordered = utilities[order][:, priority]
+    new_value = np.concatenate([[True], (ordered[1:] != ordered[:-1]).any(axis=1)])
+    position = np.empty(n)
+    position[order] = np.maximum.accumulate(np.where(new_value, np.arange(n), 0))
+    return 1.0 - position/(n - 1)
+
+
+def _utilities(normalized, directions):
+    """
+    Rescales each column of the 'normalized' objectives array so that the best value among the alternatives is 1 and
+    the worst is 0. A column in which all alternatives perform the same is all ones.
+    """
+    high = np.array([direction == 'high' for direction in directions])
+    col_max = normalized.max(axis=0) if len(normalized) else np.zeros(len(directions))
+    col_min = normalized.min(axis=0) if len(normalized) else np.zeros(len(directions))
+    spread = col_max - col_min
+    utilities = np.where(high, normalized - col_min, col_max - normalized)
+    return np.divide(utilities, spread, out=np.ones_like(utilities), where=spread > 0)
+
+
+def _scaled(values):
+    """
+    Rescales 'values' to go from 0 at the smallest value to 1 at the largest one (all zeros if they are all equal).
+    """
+    spread = values.max() - values.min()
+    if spread > 0:
+        return (values - values.min()) / spread
+    return np.zeros(len(values))
+
+
+# Ranking methods that can be used to score the feasible alternatives (see AlternativeScores.rescore). Each one takes
+# the normalized objectives (see normalize_objectives), the importance weightings and the 'high'/'low' directions of
+# the attributes, and returns an array of scores in which high values are desirable.
+ranking_methods = OrderedDict([('TOPSIS', weighted_closeness), ('weighted sum', weighted_sum), ('VIKOR', vikor),
+                               ('lexicographic', lexicographic)])
+
+
+def objective_matrix(alternatives, attrs):
+    """
+    Returns a NumPy array with one row per alternative and one column per performance attribute name in 'attrs'.
+    Attributes may be either {'value': ..., 'unit': ...} dictionaries or plain numbers.
+    """
+    columns = []
+    for attr in attrs:
         try:
-            attr_vals = [getattr(quad, perf_attr)['value'] for quad in alternatives]
+            columns.append([getattr(quad, attr)['value'] for quad in alternatives])
         except TypeError:
-            attr_vals = [getattr(quad, perf_attr) for quad in alternatives]
-        # Find norm
-        norm = sum(val**2 for val in attr_vals)**0.5
-        # Normalize the attribute values
-        norm_attr_vals = [val/norm for val in attr_vals]
-        # Apply weighting to normalized values
-        weighted_vals = [weight*val for val in norm_attr_vals]
-        if weightings[perf_attr][1] == 'high':
-            pos_ideal = max(weighted_vals)
-            neg_ideal = min(weighted_vals)
-        else:
-            pos_ideal = min(weighted_vals)
-            neg_ideal = max(weighted_vals)
-        d_pos = [(val-pos_ideal)**2 for val in weighted_vals]
-        d_neg = [(val-neg_ideal)**2 for val in weighted_vals]
-        total_d_pos = map(add, total_d_pos, d_pos)
-        total_d_neg = map(add, total_d_neg, d_neg)
-    total_d_pos = [x**0.5 for x in total_d_pos]
-    total_d_neg = [x**0.5 for x in total_d_neg]
-    closeness = map(lambda pos, neg: float(neg)/(pos+neg), total_d_pos, total_d_neg)
-
-    # Find Pareto solutions
-    def float_is_close(f1, f2, rel_tol=1e-09, abs_tol=0.0):
-        """
-        Floating point "equals" function
-        """
-        return abs(f1-f2) <= max(rel_tol*max(abs(f1), abs(f2)), abs_tol)
-
-    def is_dominated(a1, a2):
-        """
-        Takes in two feasible alternatives and determines whether alternative 1 is dominated by alternative 2, returning
-        True or False appropriately.
-        """
-        for attr in weightings:
-            try:
-                a1_attr_val = getattr(a1, attr)['value']
-                a2_attr_val = getattr(a2, attr)['value']
-            except TypeError:
-                a1_attr_val = getattr(a1, attr)
-                a2_attr_val = getattr(a2, attr)
-            if weightings[attr][1] == 'high':
-                if (a1_attr_val > a2_attr_val) or float_is_close(a1_attr_val, a2_attr_val):
-                    return False
-            else:
-                if (a1_attr_val < a2_attr_val) or float_is_close(a1_attr_val, a2_attr_val):
-                    return False
-        return True
+            columns.append([getattr(quad, attr) for quad in alternatives])
+    return np.ascontiguousarray(np.array(columns, dtype=float).reshape(len(attrs), len(alternatives)).T)
 
-    for alt in alternatives:
-        comps = (is_dominated(alt, a_comp) for a_comp in alternatives if a_comp is not alt)
-        if not any(comps):
-            alt.pareto = True
-
-    # Assign TOPSIS scores to the quad.score attribute.
-    for i, quad in enumerate(alternatives):
-        quad.score = closeness[i]
-    return alternatives
\ No newline at end of file
+
+def pareto_mask(objectives, directions, rel_tol=1e-09, block_size=256):
+    """
+    Returns a boolean array telling which rows of the (alternatives x attributes) 'objectives' array are on the Pareto
+    frontier. directions holds 'high' or 'low' for each column, telling whether a high or a low value is desirable.
+
+    An alternative is dominated (not on the frontier) if some other alternative is better in every attribute. Values
+    that are "close" (|a-b| <= rel_tol*max(|a|, |b|)) are never better than one another.
+
+    Instead of comparing every pair of alternatives, the rows are sorted so that an alternative can only be dominated
+    by one that comes before it (see _dominance_order) and checked a block at a time against the frontier found so far
+    and against the rest of their block. Dominance is transitive, so checking against the frontier is enough. The cost
+    is the O(n log n) sort plus one vectorized comparison per row and frontier member.
+    """
+    # Turn every attribute into one where low values are desirable. Negating both values does not change closeness.
+    signs = np.array([-1.0 if direction == 'high' else 1.0 for direction in directions])
+    values = np.asarray(objectives, dtype=float) * signs
+    n = len(values)
+    on_front = np.zeros(n, dtype=bool)
+    if not n:
+        return on_front
+
+    order = _dominance_order(values)
+    front = values[:0]
+    for start in xrange(0, n, block_size):
+        block_rows = order[start:start+block_size]
+        block = values[block_rows]
+        # Rows dominated by the frontier so far can be dropped before comparing the rest of the block with each other
+        keep = ~_dominated_by_any(front, block, rel_tol)
+        block_rows = block_rows[keep]
+        block = block[keep]
+        keep = ~_dominated_by_any(block, block, rel_tol)
+        on_front[block_rows[keep]] = True
+        front = np.concatenate([front, block[keep]])
+    return on_front
+
+
+def front_ranks(objectives, directions, rel_tol=1e-09, max_front=None, block_size=256):
+    """
+    Non-dominated sorting of the rows of the (alternatives x attributes) 'objectives' array (see pareto_mask for the
+    meaning of directions, rel_tol and dominance). Returns an integer array holding the Pareto front of each row: 1 for
+    the Pareto frontier, 2 for the frontier of what is left once front 1 is removed, and so on. If max_front is given,
+    only that many fronts are sorted out and every other row gets max_front + 1, which is much quicker when only the
+    first few fronts are of interest.
+
+    The front of a row is one more than the highest front of the rows that dominate it. The rows are sorted as in
+    pareto_mask, so the rows that dominate a row come before it, and handled a block at a time. If a row is dominated
+    by a member of front k it is also dominated by a member of every front before k, so the first front found so far
+    that does not dominate a row is found with a binary search over the fronts, for the whole block at once. The rows of
+    the block that dominate one another are then handled with one comparison matrix.
+    """
+    signs = np.array([-1.0 if direction == 'high' else 1.0 for direction in directions])
+    values = np.asarray(objectives, dtype=float) * signs
+    n = len(values)
+    ranks = np.zeros(n, dtype=int)
+    if not n:
+        return ranks
+
+    # Members of each front so far (index 0 is front 1), kept in arrays that double in size when full
+    front_values = []
+    front_sizes = []
+    order = _dominance_order(values)
+    for start in xrange(0, n, block_size):
+        block_rows = order[start:start+block_size]
+        block = values[block_rows]
+
+        # Binary search for the first front that does not dominate each row, all rows of the block in step
+        lo = np.zeros(len(block), dtype=int)
+        hi = np.full(len(block), min(len(front_values), max_front or n), dtype=int)
+        searching = lo < hi
+        while searching.any():
+            mid = (lo + hi) // 2
+            for k in np.unique(mid[searching]).tolist():
+                rows = np.flatnonzero(searching & (mid == k))
+                dominated = _dominated_by_any(front_values[k][:front_sizes[k]], block[rows], rel_tol)
+                lo[rows[dominated]] = k + 1
+                hi[rows[~dominated]] = k
+            searching = lo < hi
+
+        # Rows of the block can only be dominated by rows that come before them in the block
+        within = _dominates(block, block, rel_tol)
+        block_ranks = lo
+        for i in xrange(1, len(block)):
+            dominators = within[:i, i]
+            if dominators.any():
+                block_ranks[i] = max(block_ranks[i], block_ranks[:i][dominators].max() + 1)
+        if max_front is not None:
+            block_ranks = np.minimum(block_ranks, max_front)
+        ranks[block_rows] = block_ranks + 1
+
+        for k in np.unique(block_ranks).tolist():
+            if k == max_front:
+                continue
+            members = block[block_ranks == k]
+            if k == len(front_values):
+                front_values.append(np.empty((max(16, len(members)), values.shape[1])))
+                front_sizes.append(0)
+            size = front_sizes[k] + len(members)
+            if size > len(front_values[k]):
+                grown = np.empty((max(size, 2*len(front_values[k])), values.shape[1]))
+                grown[:front_sizes[k]] = front_values[k][:front_sizes[k]]
+                front_values[k] = grown
+            front_values[k][front_sizes[k]:size] = members
+            front_sizes[k] = size
+    return ranks
+
+
+def epsilon_archive(objectives, directions, resolutions, block_size=256):
+    """
+    Returns the (sorted) indices of the rows of the (alternatives x attributes) 'objectives' array that make up an
+    epsilon-Pareto archive: an approximation of the Pareto frontier with at most one alternative per grid box, where
+    the boxes are resolutions[j] wide in attribute j (e.g., 0.5 N of weight, 1 min of endurance). directions holds
+    'high' or 'low' for each column.
+
+    Each box is represented by its alternative closest to the best corner of the box (which is one that dominates
+    the others in the box, if there is one), and a box is dropped if another box is at least as good in every
+    attribute. Near-duplicate designs therefore collapse into one, and the size of the archive is bounded by the
+    number of non-dominated boxes rather than by the number of alternatives. The alternatives are grouped by box with
+    one sort, and only the boxes are compared with one another.
+    """
+    signs = np.array([-1.0 if direction == 'high' else 1.0 for direction in directions])
+    scaled = np.asarray(objectives, dtype=float) * signs / np.asarray(resolutions, dtype=float)
+    if not len(scaled):
+        return np.zeros(0, dtype=int)
+    boxes = np.floor(scaled).astype(np.int64)
+    offset = scaled - boxes
+    corner_dist = np.zeros(len(scaled))
+    for j in xrange(scaled.shape[1]):
+        corner_dist += offset[:, j]**2
+
+    # Sort by box (lexicographically, so a box can only be dominated by one that comes before it), then by the
+    # distance to the corner, and keep the first alternative of each box.
+    order = np.lexsort([corner_dist] + [boxes[:, j] for j in reversed(xrange(boxes.shape[1]))])
+    sorted_boxes = boxes[order]
+    first = np.concatenate([[True], (sorted_boxes[1:] != sorted_boxes[:-1]).any(axis=1)])
+    representatives = order[first]
+    rep_boxes = sorted_boxes[first]
+
+    on_front = np.zeros(len(rep_boxes), dtype=bool)
+    front = rep_boxes[:0]
+    for start in xrange(0, len(rep_boxes), block_size):
+        block = rep_boxes[start:start+block_size]
+        keep = ~_weakly_dominates(front, block).any(axis=0)
+        # The boxes are all different, so a box only weakly dominates itself among the boxes of the block
+        within = _weakly_dominates(block, block)
+        np.fill_diagonal(within, False)
+        keep &= ~within.any(axis=0)
+        on_front[start:start+block_size] = keep
+        front = np.concatenate([front, block[keep]])
+    return np.sort(representatives[on_front])
+
+
+def _weakly_dominates(candidates, values):
+    """
+    Returns a (len(candidates) x len(values)) boolean array telling whether each row of 'candidates' is lower than or
+    equal to each row of 'values' in every column.
+    """
+    dominates = np.ones((len(candidates), len(values)), dtype=bool)
+    for j in xrange(values.shape[1]):
+        dominates &= candidates[:, j, np.newaxis] <= values[:, j]
+    return dominates
+
+
+def _dominance_order(values):
+    """
+    Returns an ordering of the rows of 'values' (low values desirable) in which no row comes before a row that
+    dominates it. The rows are sorted by the sum of their values, each column scaled by its spread, and then by the
+    columns themselves. Rows near the ideal come first, so the frontier that is built up while going through the rows
+    in this order starts out with the members that dominate the most other rows.
+    """
+    spread = values.max(axis=0) - values.min(axis=0) if len(values) else np.ones(values.shape[1])
+    spread[~(spread > 0)] = 1.0
+    # Rounding is monotone, so a row that is lower in every column never gets a higher sum
+    scaled_sum = np.zeros(len(values))
+    for j in xrange(values.shape[1]):
+        scaled_sum += values[:, j] / spread[j]
+    return np.lexsort(np.vstack([values.T[::-1], scaled_sum]))
+
+
+def _dominates(candidates, values, rel_tol):
+    """
+    Returns a (len(candidates) x len(values)) boolean array telling whether each row of 'candidates' is better (lower,
+    and not close) than each row of 'values' in every column.
+    """
+    # A difference greater than the closeness tolerance (which is never negative) also means the candidate is lower.
+    # Going one column at a time keeps the arrays two-dimensional, which is much faster than broadcasting over a short
+    # last axis.
+    values_tol = rel_tol*abs(values)
+    candidates_tol = rel_tol*abs(candidates)
+    dominates = np.ones((len(candidates), len(values)), dtype=bool)
+    for j in xrange(values.shape[1]):
+        dominates &= ((values[:, j] - candidates[:, j, np.newaxis]) >
+                      np.maximum(values_tol[:, j], candidates_tol[:, j, np.newaxis]))
+    return dominates
+
+
+def _dominated_by_any(candidates, values, rel_tol, max_pairs=65536):
+    """
+    For each row of 'values', tells whether some row of 'candidates' is better (lower, and not close) in every column.
+    The candidates are compared a few at a time, and the rows already found to be dominated are left out of the next
+    comparisons.
+    """
+    dominated = np.zeros(len(values), dtype=bool)
+    undecided = np.arange(len(values))
+    start = 0
+    while start < len(candidates) and len(undecided):
+        step = max(1, max_pairs // len(undecided))
+        found = _dominates(candidates[start:start+step], values[undecided], rel_tol).any(axis=0)
+        dominated[undecided[found]] = True
+        undecided = undecided[~found]
+        start += step
+    return dominated
@@ -0,0 +1,894 @@
+import copy
+import math
+import multiprocessing
+from itertools import izip
+import numpy as np
+from battery import BatteryVoltageIndex
+from propmotorcombo import CurrentThrustTable
+from tools import convert_unit
+
+"""
+This module contains the array-based ("batch") machinery used by alternatives_new.generate_alternatives to size every
+(prop/motor combo, battery, print material) triple in one vectorized pass instead of building one vehicle object per
+triple and calling its is_feasible method. The sizing equations themselves still live in the vehicle classes (see
+Quadmultipiece.batch_is_feasible); this module only provides the shared pieces:
+
+    ComponentMatrix - Loads the numeric component attributes needed by the sizing models into NumPy arrays and builds
+                      the list of compatible (pmcombo, battery, pmaterial) index triples.
+    BatchResult     - Holds the verdict, first failure reason, failed value, performance and geometry of every triple.
+    batch_interp    - Row-wise version of tools.interp used for the current vs. thrust lookup.
+
+It also holds payload_and_endurance, the thrust/payload/endurance part of the sizing models, which is the same for all
+of the quadrotor platforms, evaluate, which runs the platform models either in this process or sharded across a
+multiprocessing pool, iter_evaluate, which yields the results one shard at a time, and prune_and_evaluate, which
+rejects whole groups of triples that are bound to fail before sizing the rest.
+"""
+
+# Rejection reasons returned by the vehicle is_feasible methods. A BatchResult stores the index of the reason in this
+# list rather than the string itself. Index 0 is used for feasible alternatives. If a vehicle class adds a new
+# rejection reason it must be appended here.
+fail_reasons = ['true', "Max dimension too large.", "Hub too large for printer", "Arms too long for printer.",
+                "Body too large for printer.", "Too heavy.", "Not enough payload capacity.", "Insufficient Data",
+                "Not enough endurance.", "Takes too long to build."]
+
+# Rejection reasons that only depend on the prop/motor combo. Every platform sizing model must test these before any
+# constraint that depends on the battery or print material, so that if one triple of a prop/motor combo is rejected for
+# one of these reasons, every triple of that combo is rejected for the same reason with the same value (see
+# prune_and_evaluate).
+pmcombo_fail_reasons = ["Max dimension too large.", "Hub too large for printer", "Arms too long for printer.",
+                        "Body too large for printer."]
+
+# In the hover endurance model each prop/motor combo gives hover_thrust_factor times its share of the vehicle weight
+# plus payload
+hover_thrust_factor = 1.125
+
+
+class ComponentMatrix(object):
+    """
+    Holds the numeric attributes of the prop/motor combos, batteries, and print materials used in a search as NumPy
+    arrays (one entry per component, in the order the components were given). Prop/motor combo thrust and current
+    vectors are stored, sorted by thrust, as rows of the padded 2D arrays thrust_table and current_table. Unused thrust
+    entries are +inf and unused current entries are nan.
+
+    Only batteries whose voltage is within 0.1 V of the prop/motor combo test battery voltage are paired with that
+    combo (this is the same pre-filter generate_alternatives has always used; see battery.BatteryVoltageIndex). The
+    compatible pairs are held in pair_pm and pair_bat.
+
+    If memoize is True the platform sizing models keep the quantities that do not depend on the requirement thresholds
+    (size, vehicle weight, build time, etc.) for every triple in the memo dictionary (see memoized()), so evaluating the
+    same matrix again with different thresholds only re-runs the comparisons. This costs a few arrays with one entry
+    per triple, so it is only worth it for a matrix that is evaluated more than once.
+
+    If pair is False the compatible pairs are not worked out (pair_pm and pair_bat are left empty), since for a very
+    large catalog they can take more memory than the component arrays. Such a matrix can only be evaluated through
+    select() views.
+
+    The arrays are normally read from the component objects (see component_columns). They may instead be given as
+    'columns', e.g. memory-mapped from a catalog snapshot (see catalogsnapshot.component_matrix). The pmcombos and
+    batteries are then only indexed when a vehicle is made from the matrix, so they may be lazy sequences.
+    """
+    # Arrays with one entry (or row) per prop/motor combo. These are the arrays that are split up by shard().
+    pmcombo_columns = ['prop_dia', 'prop_weight', 'motor_body_dia', 'motor_weight', 'max_thrust', 'test_bat_volt',
+                       'thrust_table', 'current_table']
+
+    def __init__(self, pmcombos, batteries, pmaterials, memoize=False, pair=True, columns=None):
+        if columns is None:
+            self.pmcombos = list(pmcombos)
+            self.batteries = list(batteries)
+            columns = component_columns(self.pmcombos, self.batteries)
+        else:
+            # The arrays are given (see catalogsnapshot), so the components may be any sequence that can be indexed, and
+            # the objects are only read when a vehicle is made
+            self.pmcombos = pmcombos
+            self.batteries = batteries
+        self.pmaterials = list(pmaterials)
+
+        # Prop/motor combo attributes
+        for attr in self.pmcombo_columns:
+            setattr(self, attr, columns[attr])
+
+        # Battery attributes. Capacity is stored in mAh since that is what the endurance equation uses. The capacity in
+        # Wh (as the batteries hold it) is kept as well so that components() does not convert it back.
+        self.bat_weight = np.asarray(columns['bat_weight'], dtype=float)
+        self.bat_voltage = np.asarray(columns['bat_voltage'], dtype=float)
+        self.bat_capacity_wh = np.asarray(columns['bat_capacity'], dtype=float)
+        self.bat_capacity = convert_unit(self.bat_capacity_wh, 'Wh', 'mAh', self.bat_voltage)
+
+        # Print material attributes
+        self.pmat_density = np.array([pmat.density['value'] for pmat in self.pmaterials], dtype=float)
+
+        # Pre-filter out all batteries that will not be compatible with the prop/motor combo data
+        bat_index = BatteryVoltageIndex(self.batteries, voltages=self.bat_voltage)
+        compatible = [bat_index.compatible_positions(volt) for volt in self.test_bat_volt] if pair else []
+        self.pair_pm = np.repeat(np.arange(len(compatible)), [len(bats) for bats in compatible])
+        self.pair_bat = np.array([i for bats in compatible for i in bats], dtype=int)
+        self.memo = {} if memoize else None
+        # The ComponentSkyline the components were picked by, if any (see ComponentSkyline.matrix)
+        self.skyline = None
+        self._all_triples = None
+        self._subset = None
+        self._triples = None
+        # If the prop/motor combo arrays are memory-mapped from a catalog snapshot, the {attribute: .npy file}
+        # dictionary of the mapped files and the rows of the files they hold (see __getstate__)
+        self.column_files = None
+        self.pm_rows = None
+
+    def __copy__(self):
+        view = ComponentMatrix.__new__(ComponentMatrix)
+        view.__dict__.update(self.__dict__)
+        return view
+
+    def __getstate__(self):
+        # Memory-mapped arrays are not pickled (e.g., into a shard sent to a worker process). The process that unpickles
+        # the matrix maps the same files instead, which also lets the processes share the pages of the files.
+        state = self.__dict__.copy()
+        if self.column_files is not None:
+            for attr in self.column_files:
+                state[attr] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.column_files is not None:
+            start, stop = self.pm_rows
+            for attr, filename in self.column_files.items():
+                setattr(self, attr, np.load(filename, mmap_mode='r' if stop > start else None)[start:stop])
+
+    def all_triples(self):
+        """
+        Returns the (pmcombo, battery, pmaterial) index arrays of every compatible triple, ordered the same way as the
+        nested loops in generate_alternatives (pmcombo, then battery, then print material). The triple of pair p and
+        print material m is at position p*len(pmat_density) + m. The arrays are built once and shared by every platform
+        evaluated on this matrix.
+        """
+        if self._all_triples is None:
+            n_mat = len(self.pmat_density)
+            pm = np.repeat(self.pair_pm, n_mat)
+            bat = np.repeat(self.pair_bat, n_mat)
+            mat = np.tile(np.arange(n_mat), len(self.pair_pm))
+            self._all_triples = pm, bat, mat
+        return self._all_triples
+
+    def triples(self):
+        """
+        Returns the (pmcombo, battery, pmaterial) index arrays of the triples to be evaluated. These are all of the
+        triples (see all_triples) unless the matrix was made by subset().
+        """
+        if self._triples is not None:
+            return self._triples
+        if self._subset is None:
+            return self.all_triples()
+        self._triples = tuple(indices[self._subset] for indices in self.all_triples())
+        return self._triples
+
+    def subset(self, positions):
+        """
+        Returns a view of the matrix whose triples are only those at 'positions' in all_triples(). The view shares the
+        component arrays and the memo of this matrix.
+        """
+        view = copy.copy(self)
+        view._subset = positions
+        view._triples = None
+        return view
+
+    def select(self, pm, bat, mat):
+        """
+        Returns a view of the matrix whose triples are given directly by the (pmcombo, battery, pmaterial) index arrays
+        pm, bat and mat. Unlike subset(), the triples do not have to be compatible pairs of this matrix, which is what
+        evolutionarysearch uses to evaluate a population without ever building all_triples(). The view is not memoized.
+        """
+        view = copy.copy(self)
+        view._subset = None
+        view._triples = (np.asarray(pm, dtype=int), np.asarray(bat, dtype=int), np.asarray(mat, dtype=int))
+        view.memo = None
+        return view
+
+    def memoized(self, key, compute, version=None):
+        """
+        Returns compute(pm, bat, mat), a dictionary of arrays with one entry per triple, for the triples of this matrix.
+        If memoization is on, compute is called once for all of the triples of the matrix and the dictionary is kept
+        under 'key' in the memo. It is only computed again if it was stored with a different 'version'.
+        """
+        if self.memo is None:
+            return compute(*self.triples())
+        entry = self.memo.get(key)
+        if entry is None or entry[0] != version:
+            entry = version, compute(*self.all_triples())
+            self.memo[key] = entry
+        if self._subset is None:
+            return entry[1]
+        return dict((name, values[self._subset]) for name, values in entry[1].items())
+
+    def components(self, pm, bat, memoize=False):
+        """
+        Returns a new ComponentMatrix of the prop/motor combos at positions 'pm' and the batteries at positions 'bat' of
+        this matrix (index arrays, in order) and all of its print materials. The arrays are taken from this matrix, so
+        none of the component objects are read.
+        """
+        columns = dict((attr, np.asarray(getattr(self, attr))[pm]) for attr in self.pmcombo_columns)
+        columns.update(bat_weight=self.bat_weight[bat], bat_voltage=self.bat_voltage[bat],
+                       bat_capacity=self.bat_capacity_wh[bat])
+        return ComponentMatrix(take(self.pmcombos, pm), take(self.batteries, bat), self.pmaterials, memoize,
+                               columns=columns)
+
+    def shard(self, start, stop):
+        """
+        Returns a copy of the matrix holding only prop/motor combos start to stop-1 (and all of the batteries and print
+        materials). Only the numeric arrays are kept, not the component objects, so a shard is cheap to send to a worker
+        process. The triples of consecutive shards, concatenated, are the triples of the full matrix.
+        """
+        shard = copy.copy(self)
+        shard.pmcombos = []
+        shard.batteries = []
+        shard.pmaterials = []
+        for attr in self.pmcombo_columns:
+            setattr(shard, attr, getattr(self, attr)[start:stop])
+        if self.column_files is not None:
+            shard.pm_rows = (self.pm_rows[0] + start, self.pm_rows[0] + stop)
+        in_shard = (self.pair_pm >= start) & (self.pair_pm < stop)
+        shard.pair_pm = self.pair_pm[in_shard] - start
+        shard.pair_bat = self.pair_bat[in_shard]
+        shard.memo = {} if self.memo is not None else None
+        shard._all_triples = None
+        shard._subset = None
+        shard._triples = None
+        return shard
+
+
+class BatchResult(object):
+    """
+    The outcome of evaluating every triple of a ComponentMatrix for one vehicle platform. For triple i:
+
+        reason[i]      - index into fail_reasons of the first reason the triple was rejected (0 if feasible)
+        fail_value[i]  - the value that failed the constraint (nan if there is none)
+        performance[i] - [weight, max payload, endurance, max dimension, build time] (only meaningful if feasible)
+        geometry[i]    - [hub xdim, hub ydim, arm length] (only meaningful if feasible)
+
+    The platform sizing model fills these in using the reject() method, which applies constraints in the same order as
+    the scalar is_feasible method so that only the first failure is recorded.
+
+    If the result was made by prune_and_evaluate, the triples that were rejected without being evaluated one by one are
+    not part of the result. They are only counted in the pruned attribute, a dictionary of the form
+    {rejection reason: [number of triples, sum of failed values]}.
+    """
+    def __init__(self, matrix, platform_cls, pm, bat, mat):
+        self.matrix = matrix
+        self.platform_cls = platform_cls
+        self.pm = pm
+        self.bat = bat
+        self.mat = mat
+        n = len(pm)
+        self.alive = np.ones(n, dtype=bool)
+        self.reason = np.zeros(n, dtype=np.int8)
+        self.fail_value = np.full(n, np.nan)
+        self.performance = np.zeros((n, 5))
+        self.geometry = np.zeros((n, 3))
+        self.pruned = {}
+
+    def __len__(self):
+        return len(self.pm)
+
+    def reject(self, failed, reason, value=None):
+        """
+        Marks every still-feasible triple for which 'failed' is True as rejected for 'reason' with the failed value
+        'value'. Both 'failed' and 'value' may be scalars or arrays with one entry per triple.
+        """
+        failed = self.alive & failed
+        self.reason[failed] = fail_reasons.index(reason)
+        if value is not None:
+            self.fail_value[failed] = np.broadcast_to(value, self.alive.shape)[failed]
+        self.alive &= ~failed
+
+    def feasible_mask(self):
+        return self.reason == 0
+
+    def outcome(self, i):
+        """
+        Returns the tuple the scalar is_feasible method returns for triple i, i.e. ('true', performance, geometry) or
+        (rejection reason, rejected value, None).
+        """
+        if self.reason[i] == 0:
+            return 'true', self.performance[i].tolist(), self.geometry[i].tolist()
+        fail_value = self.fail_value[i]
+        return fail_reasons[self.reason[i]], None if np.isnan(fail_value) else float(fail_value), None
+
+    def vehicle(self, i):
+        """
+        Builds the vehicle object for triple i with its feasible, performance, and geometry attributes set exactly as
+        generate_alternatives sets them.
+        """
+        this_vehicle = self.platform_cls(self.matrix.pmcombos[self.pm[i]], self.matrix.batteries[self.bat[i]],
+                                         self.matrix.pmaterials[self.mat[i]])
+        feasibility, performance, geometry = self.outcome(i)
+        if feasibility != 'true':
+            this_vehicle.feasible = (feasibility, performance)
+        else:
+            this_vehicle.set_performance(performance)
+            this_vehicle.set_geometry(geometry)
+        return this_vehicle
+
+    def vehicles(self):
+        return [self.vehicle(i) for i in xrange(len(self))]
+
+    def compact(self):
+        """
+        Returns the evaluation results as a tuple of arrays (reason, fail_value, performance, geometry), where the
+        performance and geometry rows are only given for the feasible triples. This is what worker processes send back
+        instead of vehicle objects (see evaluate()).
+        """
+        feasible = self.feasible_mask()
+        return self.reason, self.fail_value, self.performance[feasible], self.geometry[feasible]
+
+    @classmethod
+    def merge(cls, matrix, platform_cls, compact_results):
+        """
+        Builds a single BatchResult for the full 'matrix' from the compact() results of its consecutive shards.
+        """
+        pm, bat, mat = matrix.triples()
+        result = cls(matrix, platform_cls, pm, bat, mat)
+        if compact_results:
+            reasons, fail_values, performances, geometries = zip(*compact_results)
+            result.reason = np.concatenate(reasons)
+            result.fail_value = np.concatenate(fail_values)
+            feasible = result.feasible_mask()
+            result.performance[feasible] = np.concatenate(performances)
+            result.geometry[feasible] = np.concatenate(geometries)
+        result.alive = result.feasible_mask()
+        return result
+
+
+def evaluate(matrix, constraints, platforms, processes=None):
+    """
+    Evaluates every triple of 'matrix' for each vehicle class name in 'platforms' and returns a list with one
+    BatchResult per platform.
+
+    If processes is greater than 1 the prop/motor combos are split into contiguous shards holding about the same number
+    of triples and the shards are evaluated by a multiprocessing pool with that many worker processes. Each worker only
+    sends back the compact arrays of its shard (see BatchResult.compact), and the shards are merged in order, so the
+    results are identical to evaluating everything in this process.
+    """
+    platform_classes = [getattr(__import__(platform.lower()), platform) for platform in platforms]
+    n_pmcombos = len(matrix.prop_dia)
+    if not processes or processes < 2 or n_pmcombos < 2:
+        return [platform_cls.batch_is_feasible(matrix, constraints) for platform_cls in platform_classes]
+
+    # Use several shards per process so that one slow shard does not leave the other processes idle
+    bounds = shard_bounds(matrix, 4*processes)
+    jobs = [(matrix.shard(start, stop), constraints, platforms, False) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        shard_results = pool.map(_evaluate_shard, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    return [BatchResult.merge(matrix, platform_cls, [shard[k] for shard in shard_results])
+            for k, platform_cls in enumerate(platform_classes)]
+
+
+def iter_evaluate(matrix, constraints, platforms, shard_size=50000, processes=None, prune=False):
+    """
+    Generator version of evaluate(). The prop/motor combos of 'matrix' are split into contiguous shards of about
+    'shard_size' compatible (pmcombo, battery) pairs and the shards are evaluated one at a time. For each shard a list
+    with one BatchResult per platform is yielded. The results refer back to 'matrix' (their pm attribute holds indices
+    into the full matrix), so result.vehicle(i) can be used on them as usual.
+
+    Only the arrays of the shard being evaluated are held at any time, so the peak memory use does not grow with the
+    size of the catalog. Concatenating the yielded results gives the same alternatives, in the same order, as
+    evaluate().
+
+    If processes is greater than 1 the shards are evaluated by a multiprocessing pool with that many worker processes
+    and yielded in order as they come back.
+
+    If prune is True each shard is evaluated with prune_and_evaluate, so the yielded results only hold the triples
+    that were not pruned (the pruned triples are counted in the pruned attribute of each result).
+
+    If 'matrix' memoizes (and processes is not greater than 1) its shards are kept in its memo so that their memoized
+    sizing quantities are reused the next time the matrix is evaluated with the same shard_size.
+    """
+    platform_classes = [getattr(__import__(platform.lower()), platform) for platform in platforms]
+    bounds = shard_bounds(matrix, int(math.ceil(len(matrix.pair_pm) / float(shard_size))))
+    ranges = zip(bounds[:-1], bounds[1:])
+
+    if not processes or processes < 2:
+        for start, stop in ranges:
+            if matrix.memo is None:
+                shard = matrix.shard(start, stop)
+            else:
+                shard = matrix.memo.get(('shard', start, stop))
+                if shard is None:
+                    shard = matrix.memo[('shard', start, stop)] = matrix.shard(start, stop)
+            if prune:
+                results = [prune_and_evaluate(shard, constraints, platform_cls) for platform_cls in platform_classes]
+            else:
+                results = [platform_cls.batch_is_feasible(shard, constraints) for platform_cls in platform_classes]
+            yield _rebase(results, matrix, start)
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        jobs = ((matrix.shard(start, stop), constraints, platforms, prune) for start, stop in ranges)
+        for (start, stop), shard_results in izip(ranges, pool.imap(_evaluate_shard, jobs)):
+            if prune:
+                # Pruned results are already small, so the workers send back the results themselves
+                results = shard_results
+            else:
+                shard = matrix.shard(start, stop)
+                results = [BatchResult.merge(shard, platform_cls, [compact_result])
+                           for platform_cls, compact_result in zip(platform_classes, shard_results)]
+            yield _rebase(results, matrix, start)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _rebase(results, matrix, start):
+    """
+    Points the BatchResults of the shard of 'matrix' starting at prop/motor combo 'start' back to the full matrix.
+    """
+    for result in results:
+        result.matrix = matrix
+        result.pm = result.pm + start
+    return results
+
+
+def shard_bounds(matrix, n_shards):
+    """
+    Splits the prop/motor combos of 'matrix' into at most 'n_shards' contiguous ranges holding about the same number of
+    compatible (pmcombo, battery) pairs. Returns the array of range boundaries, starting with 0 and ending with the
+    number of prop/motor combos.
+    """
+    n_pmcombos = len(matrix.prop_dia)
+    n_shards = min(n_pmcombos, n_shards)
+    pairs_per_pmcombo = np.bincount(matrix.pair_pm, minlength=n_pmcombos)
+    bounds = np.searchsorted(np.cumsum(pairs_per_pmcombo), np.linspace(0, len(matrix.pair_pm), n_shards+1)[1:-1])
+    return np.unique(np.concatenate([[0], bounds+1, [n_pmcombos]]).clip(0, n_pmcombos))
+
+
+def _evaluate_shard(job):
+    """
+    Worker process function for evaluate() and iter_evaluate(). Must stay at module level so that it can be pickled.
+    """
+    shard, constraints, platforms, prune = job
+    platform_classes = [getattr(__import__(platform.lower()), platform) for platform in platforms]
+    if prune:
+        return [prune_and_evaluate(shard, constraints, platform_cls) for platform_cls in platform_classes]
+    return [platform_cls.batch_is_feasible(shard, constraints).compact() for platform_cls in platform_classes]
+
+
+def prune_and_evaluate(matrix, constraints, platform_cls):
+    """
+    Branch and bound version of platform_cls.batch_is_feasible(matrix, constraints). Whole groups of triples that are
+    bound to fail are rejected without evaluating each of them, and only the remaining triples are sized in full. The
+    returned BatchResult holds the remaining triples (in the usual order) and counts the pruned triples in its pruned
+    attribute. The pruned triples are counted under the same first rejection reason the full evaluation would give them.
+
+    Two kinds of groups are pruned:
+
+    1) Prop/motor combos rejected for one of the pmcombo_fail_reasons. One triple of each combo is evaluated and if it
+       fails for one of these reasons so does every other triple of the combo.
+    2) For the remaining combos, the batteries of each (pmcombo, print material) pair are sorted by weight. The vehicle
+       weight only increases with the battery weight, so once a battery is too heavy so is every heavier one, and since
+       the payload capacity is the available thrust minus the vehicle weight, once a battery fails the payload
+       constraint (or is too heavy) so does every heavier one. The first battery to fail each of these is found with a
+       binary search, which sizes O(log(number of batteries)) triples per pair instead of all of them.
+
+    The sums of the pruned failed values are computed from the weight of the lightest battery's vehicle, so they may
+    differ from the full evaluation by floating point round-off.
+    """
+    pm, bat, mat = matrix.all_triples()
+    n_pmcombos = len(matrix.prop_dia)
+    n_mat = len(matrix.pmat_density)
+    if not len(pm):
+        return platform_cls.batch_is_feasible(matrix, constraints)
+    pairs_per_pmcombo = np.bincount(matrix.pair_pm, minlength=n_pmcombos)
+    first_pair = np.cumsum(pairs_per_pmcombo) - pairs_per_pmcombo
+    pruned_counts = np.zeros(len(fail_reasons))
+    pruned_sums = np.zeros(len(fail_reasons))
+
+    # 1) Prop/motor combo level pruning
+    probe_pm = np.nonzero(pairs_per_pmcombo)[0]
+    probe = _evaluate_subset(matrix, constraints, platform_cls, first_pair[probe_pm]*n_mat)
+    pmcombo_codes = [fail_reasons.index(reason) for reason in pmcombo_fail_reasons]
+    dead = np.in1d(probe.reason, pmcombo_codes)
+    n_dead_triples = pairs_per_pmcombo[probe_pm[dead]] * n_mat
+    np.add.at(pruned_counts, probe.reason[dead], n_dead_triples)
+    np.add.at(pruned_sums, probe.reason[dead], probe.fail_value[dead] * n_dead_triples)
+    live_pm = probe_pm[~dead]
+
+    # 2) Battery range pruning for each (pmcombo, print material) pair. pair_order lists the pairs sorted by prop/motor
+    # combo and then battery weight, and pair_rank is the position of each pair within its combo in that order.
+    pair_order = np.lexsort((matrix.bat_weight[matrix.pair_bat], matrix.pair_pm))
+    sorted_bat = matrix.pair_bat[pair_order]
+    pair_rank = np.empty(len(pair_order), dtype=int)
+    pair_rank[pair_order] = np.arange(len(pair_order)) - first_pair[matrix.pair_pm[pair_order]]
+    group_pm = np.repeat(live_pm, n_mat)
+    group_mat = np.tile(np.arange(n_mat), len(live_pm))
+    group_start = first_pair[group_pm]
+    group_size = pairs_per_pmcombo[group_pm]
+
+    heavy = [fail_reasons.index("Too heavy.")]
+    payload = [fail_reasons.index("Not enough payload capacity.")]
+    first_fail = _first_failing(matrix, constraints, platform_cls, group_mat, group_start, group_size, pair_order,
+                                heavy + payload)
+    first_heavy = _first_failing(matrix, constraints, platform_cls, group_mat, group_start, group_size, pair_order,
+                                 heavy)
+
+    # Failed values of the pruned ranges. The vehicle weight is the weight of the lightest battery's vehicle with its
+    # battery swapped out, and the payload capacity is the thrust based lift minus the vehicle weight.
+    lightest = _evaluate_subset(matrix, constraints, platform_cls, pair_order[group_start]*n_mat + group_mat)
+    lightest_weight = lightest.performance[:, 0]
+    dry_weight = lightest_weight - matrix.bat_weight[sorted_bat[group_start]]
+    lift = lightest.performance[:, 1] + lightest_weight
+    bat_weight_sum = np.concatenate([[0], np.cumsum(matrix.bat_weight[sorted_bat])])
+    n_payload = first_heavy - first_fail
+    n_heavy = group_size - first_heavy
+    payload_bat_weight = bat_weight_sum[group_start+first_heavy] - bat_weight_sum[group_start+first_fail]
+    heavy_bat_weight = bat_weight_sum[group_start+group_size] - bat_weight_sum[group_start+first_heavy]
+    pruned_counts[payload] += n_payload.sum()
+    pruned_sums[payload] += (n_payload*(lift-dry_weight) - payload_bat_weight).sum()
+    pruned_counts[heavy] += n_heavy.sum()
+    pruned_sums[heavy] += (n_heavy*dry_weight + heavy_bat_weight).sum()
+
+    # Keep the triples of live combos that rank before the first failing battery of their (pmcombo, material) pair
+    group_of_pm = np.full(n_pmcombos, -1)
+    group_of_pm[live_pm] = np.arange(len(live_pm)) * n_mat
+    group = group_of_pm[pm] + mat
+    keep = group_of_pm[pm] >= 0
+    keep[keep] = pair_rank[np.arange(len(pm))[keep] // n_mat] < first_fail[group[keep]]
+
+    result = _evaluate_subset(matrix, constraints, platform_cls, np.nonzero(keep)[0])
+    result.pruned = dict((fail_reasons[code], [int(pruned_counts[code]), float(pruned_sums[code])])
+                         for code in np.nonzero(pruned_counts)[0])
+    return result
+
+
+def _evaluate_subset(matrix, constraints, platform_cls, positions):
+    """
+    Runs platform_cls.batch_is_feasible on the triples at 'positions' in matrix.all_triples() only. The returned
+    BatchResult refers to 'matrix'.
+    """
+    result = platform_cls.batch_is_feasible(matrix.subset(positions), constraints)
+    result.matrix = matrix
+    return result
+
+
+def _first_failing(matrix, constraints, platform_cls, group_mat, group_start, group_size, pair_order, codes):
+    """
+    Binary search used by prune_and_evaluate. For every (pmcombo, print material) group, finds the position (in battery
+    weight order) of the lightest battery whose triple is rejected for one of the reasons in 'codes'. Every heavier
+    battery of the group must be rejected for one of these reasons too. The group size is returned for groups where no
+    battery is rejected.
+    """
+    lo = np.zeros(len(group_mat), dtype=int)
+    hi = group_size.copy()
+    active = np.nonzero(lo < hi)[0]
+    while len(active):
+        mid = (lo[active] + hi[active]) // 2
+        positions = pair_order[group_start[active]+mid]*len(matrix.pmat_density) + group_mat[active]
+        probe = _evaluate_subset(matrix, constraints, platform_cls, positions)
+        fails = np.in1d(probe.reason, codes)
+        hi[active] = np.where(fails, mid, hi[active])
+        lo[active] = np.where(fails, lo[active], mid+1)
+        active = active[lo[active] < hi[active]]
+    return lo
+
+
+class ComponentSkyline(object):
+    """
+    Dominance-safe pre-filter of the components of a ComponentMatrix. A component is dropped if another component of
+    the same kind can take its place in every alternative and give a vehicle that passes every constraint the original
+    passes and is better in every performance attribute (weight, payload, endurance, max dimension and build time), in
+    the same sense as alternatives_new.pareto_mask: better, and not close within rel_tol. The Pareto designs of the
+    kept components are then exactly the Pareto designs of all of the components, but the dominated alternatives are
+    gone, so failure counts and scores that are normalized over all of the alternatives change.
+
+    Batteries are never dropped. The max dimension and build time of a vehicle do not depend on its battery, so a
+    battery swap never gives a design that is better in every attribute. The prop/motor combos are compared with the
+    sizing models of the vehicle classes in 'platforms' (see prop_motor_skyline). A combo is only dropped if it is
+    dominated on every platform.
+
+    After construction, battery_mask and pmcombo_mask hold True for the components that are kept, the pmcombos,
+    batteries and pmaterials sequences hold the kept components (of the same kind of sequence as the ones of 'matrix',
+    see take), source holds 'matrix', and n_alternatives and n_kept hold the number of alternatives before and after
+    the filter.
+    """
+    def __init__(self, matrix, constraints, platforms, rel_tol=1e-09):
+        self.platforms = list(platforms)
+        n_pmcombos = len(matrix.prop_dia)
+        self.battery_mask = np.ones(len(matrix.bat_weight), dtype=bool)
+        if len(matrix.bat_weight) and len(matrix.pmat_density):
+            self.pmcombo_mask = np.zeros(n_pmcombos, dtype=bool)
+            for platform_cls in [getattr(__import__(platform.lower()), platform) for platform in platforms]:
+                terms = size_pmcombos(matrix, constraints, platform_cls)
+                self.pmcombo_mask |= prop_motor_skyline(matrix, platform_cls, terms, rel_tol)
+        else:
+            # There are no alternatives to filter
+            self.pmcombo_mask = np.ones(n_pmcombos, dtype=bool)
+
+        # Count the alternatives with the windows of compatible batteries, without building the pairs
+        bat_index = BatteryVoltageIndex(matrix.batteries, voltages=matrix.bat_voltage)
+        kept_before = np.concatenate([[0], np.cumsum(self.battery_mask[bat_index.positions])])
+        windows = np.array([bat_index.compatible_window(volt) for volt in matrix.test_bat_volt], dtype=int)
+        windows = windows.reshape(-1, 2)
+        per_pair = len(matrix.pmat_density) * len(self.platforms)
+        self.n_alternatives = int((windows[:, 1] - windows[:, 0]).sum()) * per_pair
+        kept_pairs = kept_before[windows[:, 1]] - kept_before[windows[:, 0]]
+        self.n_kept = int(kept_pairs[self.pmcombo_mask].sum()) * per_pair
+
+        self.source = matrix
+        self.pmcombos = take(matrix.pmcombos, np.flatnonzero(self.pmcombo_mask))
+        self.batteries = take(matrix.batteries, np.flatnonzero(self.battery_mask))
+        self.pmaterials = matrix.pmaterials
+
+    def matrix(self, memoize=False):
+        """
+        Returns a ComponentMatrix of the kept components (in their original order) and all of the print materials, with
+        its arrays taken from the matrix the components were picked from. Its skyline attribute is set to this object.
+        """
+        kept = self.source.components(np.flatnonzero(self.pmcombo_mask), np.flatnonzero(self.battery_mask),
+                                      memoize)
+        kept.skyline = self
+        return kept
+
+    def summary(self):
+        return "Pre-filter dropped %d prop/motor combos, %d batteries (%d of %d alternatives)." % \
+            ((~self.pmcombo_mask).sum(), (~self.battery_mask).sum(), self.n_alternatives - self.n_kept,
+             self.n_alternatives)
+
+
+def size_pmcombos(matrix, constraints, platform_cls):
+    """
+    Sizes every prop/motor combo of 'matrix' with every print material on the platform class 'platform_cls', using the
+    first battery (the battery only adds its own weight). Returns a dictionary holding the (pmcombo x print material)
+    array 'weight' of vehicle weights without the battery, and the 'size', 'arm_len' and 'build_time' arrays with one
+    entry per combo. The sizing models give these for every vehicle, even the rejected ones.
+    """
+    n_pmcombos = len(matrix.prop_dia)
+    pm = np.arange(n_pmcombos)
+    weights = []
+    for mat in xrange(len(matrix.pmat_density)):
+        view = matrix.select(pm, np.zeros(n_pmcombos, dtype=int), np.full(n_pmcombos, mat, dtype=int))
+        sized = platform_cls.batch_is_feasible(view, constraints)
+        weights.append(sized.performance[:, 0] - matrix.bat_weight[0])
+    return {'weight': np.column_stack(weights), 'size': sized.performance[:, 3], 'arm_len': sized.geometry[:, 2],
+            'build_time': sized.performance[:, 4]}
+
+
+def _thrust_curves(matrix):
+    """
+    Returns the list of (thrust, current) test data arrays of the prop/motor combos of 'matrix' and the arrays of their
+    lowest and highest thrusts.
+    """
+    valid = np.isfinite(matrix.thrust_table)
+    curves = [(matrix.thrust_table[k][valid[k]], matrix.current_table[k][valid[k]]) for k in xrange(len(valid))]
+    thrust_min = np.array([thrust[0] if len(thrust) else np.inf for thrust, _ in curves])
+    thrust_max = np.array([thrust[-1] if len(thrust) else -np.inf for thrust, _ in curves])
+    return curves, thrust_min, thrust_max
+
+
+def prop_motor_skyline(matrix, platform_cls, terms, rel_tol=1e-09):
+    """
+    Returns a boolean array holding True for the prop/motor combos of 'matrix' that are not dominated by another combo
+    of the same test battery voltage on the vehicle platform class 'platform_cls' ('terms' is its size_pmcombos
+    output). Combo a dominates combo b if, with the same battery and print material (for each print material):
+
+        - the vehicle with a is smaller, lighter and takes less time to build, and its arms are no longer,
+        - a has at least as much max thrust (so with a lighter vehicle it also has more payload capacity), and its
+          thrust data reaches at least as high,
+        - wherever b has data at the hover thrust of its vehicle, a has data at the (lower) hover thrust of its
+          vehicle and draws less current there than b does (so its endurance is longer).
+
+    Smaller, lighter, etc. mean better by more than the closeness tolerance of alternatives_new.pareto_mask ('rel_tol'
+    times the larger value), so that the vehicle with a is better in every performance attribute in the sense of the
+    Pareto test. The weight and payload tolerances are checked against bounds of the vehicle weight and payload
+    capacity over every compatible battery.
+
+    The current condition covers every payload requirement since the hover thrusts of the two vehicles always differ by
+    the same amount, hover_thrust_factor times their weight difference per arm. Hover thrusts below that of the
+    vehicle with the lightest compatible battery and no payload can not occur and are not checked.
+    """
+    weights = terms['weight']
+    n_arms = platform_cls.n_arms
+    curves, thrust_min, thrust_max = _thrust_curves(matrix)
+    bat_index = BatteryVoltageIndex(matrix.batteries, voltages=matrix.bat_voltage)
+    sorted_weights = matrix.bat_weight[bat_index.positions]
+    windows = [bat_index.compatible_window(volt) for volt in matrix.test_bat_volt]
+    lightest_bat = np.array([sorted_weights[start:stop].min() if stop > start else np.inf for start, stop in windows])
+    heaviest_bat = np.array([sorted_weights[start:stop].max() if stop > start else 0.0 for start, stop in windows])
+
+    def dominates(a, b):
+        # The vehicle weight of a must be lower by more than the tolerance of the heaviest vehicle. The payload
+        # capacity of a is then higher by at least as much, which must also be more than the tolerance of its largest
+        # possible payload capacity (no more than its thrust available plus its weight).
+        weight_tol = rel_tol * (n_arms * matrix.max_thrust[a] + np.maximum(weights[a], weights[b]) + heaviest_bat[b])
+        if not (weights[b] - weights[a] > weight_tol).all():
+            return False
+        lowest = hover_thrust_factor * (weights[b] + lightest_bat[b]) / n_arms
+        for k, shift in enumerate(hover_thrust_factor * (weights[b] - weights[a]) / n_arms):
+            start = max(thrust_min[b], lowest[k])
+            if start > thrust_max[b]:
+                continue
+            if thrust_min[a] > start - shift:
+                return False
+            # Both current curves are piecewise linear in b's hover thrust, so checking at their joints is enough. The
+            # endurance is inversely proportional to the current, so a's is longer by more than its tolerance if a
+            # draws less than (1 - rel_tol) times the current of b.
+            thrust = np.concatenate([[start], curves[b][0], curves[a][0] + shift])
+            thrust = thrust[(thrust >= start) & (thrust <= thrust_max[b])]
+            current_a = np.interp(thrust - shift, *curves[a])
+            if not ((current_a > 0) & (current_a < (1 - rel_tol) * np.interp(thrust, *curves[b]))).all():
+                return False
+        return True
+
+    values = np.column_stack([terms['size'], terms['build_time'], weights, terms['arm_len'], -matrix.max_thrust,
+                              -thrust_max, thrust_min])
+    strict = np.arange(values.shape[1]) < 2 + weights.shape[1]
+    return _skyline(values, strict, matrix.test_bat_volt, dominates, rel_tol)
+
+
+def _skyline(values, strict, groups, accept, rel_tol=1e-09, block_size=256):
+    """
+    Returns a boolean array holding True for the rows of 'values' (to be minimized in every column) that are not
+    dominated by another row of the same group in 'groups'. Row i dominates row j if it is lower than j and not close
+    (see alternatives_new.pareto_mask) in every column where 'strict' is True, no larger in the other columns, and if
+    accept(i, j) is True. Rows that are equal never dominate each other, so all of them are kept. Dominated rows may be
+    the ones that dominate other rows, which is fine as long as the dominance test is transitive.
+    """
+    keep = np.ones(len(values), dtype=bool)
+    for group in np.unique(groups):
+        rows = np.flatnonzero(groups == group)
+        group_values = values[rows][:, np.newaxis, :]
+        for start in xrange(0, len(rows), block_size):
+            block = rows[start:start+block_size]
+            block_values = values[block][np.newaxis, :, :]
+            tol = rel_tol * np.maximum(abs(group_values), abs(block_values))
+            candidates = np.where(strict, block_values - group_values > tol, group_values <= block_values).all(axis=2)
+            for k in np.flatnonzero(candidates.any(axis=0)):
+                dominators = rows[candidates[:, k]]
+                keep[block[k]] = not any(accept(i, block[k]) for i in dominators)
+    return keep
+
+
+def payload_and_endurance(result, vehicle_weight, constraints, n_arms, key):
+    """
+    Applies the payload capacity and endurance constraints to the triples of 'result' that are still feasible, given
+    the vehicle weight of every triple. This is the hover-only payload/endurance model used by the is_feasible method of
+    every quadrotor platform. Returns the (payload_capacity, vehicle_endurance) arrays.
+
+    'key' is the memo key the platform stored its sizing quantities under (see ComponentMatrix.memoized). If the matrix
+    memoizes, the vehicle endurance of every triple is kept in the memo as well and is only computed again when the
+    payload requirement changes.
+    """
+    endurance_req, payload_req, max_weight, max_size, maneuverability = constraints[:5]
+    matrix = result.matrix
+    pm = result.pm
+
+    thrust_margin_coef = [1.29, 1.66, 2.09][['Normal', 'High', 'Acrobatic'].index(maneuverability)]
+    thrust_available = n_arms * matrix.max_thrust[pm]
+    payload_capacity = (thrust_available / thrust_margin_coef) - vehicle_weight
+    result.reject(payload_capacity < payload_req, "Not enough payload capacity.", payload_capacity)
+
+    if matrix.memo is None:
+        # Only interpolate for triples that are still feasible since the others may be outside the thrust data
+        live = np.nonzero(result.alive)[0]
+        endurance = _endurance(matrix, pm[live], result.bat[live], vehicle_weight[live], payload_req, n_arms)
+        vehicle_endurance = np.full(len(result), np.nan)
+        no_data = np.zeros(len(result), dtype=bool)
+        vehicle_endurance[live] = endurance['vehicle_endurance']
+        no_data[live] = endurance['no_data']
+    else:
+        # The vehicle weight of every triple of the full matrix was memoized by the caller under 'key'
+        all_weights = matrix.memo[key][1]['vehicle_weight']
+        endurance = matrix.memoized(key + ('endurance',), lambda all_pm, all_bat, all_mat:
+                                    _endurance(matrix, all_pm, all_bat, all_weights, payload_req, n_arms),
+                                    version=payload_req)
+        vehicle_endurance = endurance['vehicle_endurance']
+        no_data = endurance['no_data']
+
+    result.reject(no_data, "Insufficient Data")
+    with np.errstate(invalid='ignore'):
+        result.reject(vehicle_endurance < endurance_req, "Not enough endurance.", vehicle_endurance)
+    return payload_capacity, vehicle_endurance
+
+
+def _endurance(matrix, pm, bat, vehicle_weight, payload_req, n_arms):
+    """
+    Hover endurance of the given triples for payload_and_endurance. Returns a dictionary holding the vehicle_endurance
+    array (nan where the thrust required is outside of the prop/motor combo data) and the no_data array (True there).
+    """
+    avg_thrust = hover_thrust_factor * (vehicle_weight + payload_req) / n_arms
+    avg_current, ok = batch_interp(matrix.thrust_table, matrix.current_table, pm, avg_thrust)
+    vehicle_endurance = matrix.bat_capacity[bat] / (n_arms * avg_current * 1000) * 60
+    return {'vehicle_endurance': vehicle_endurance, 'no_data': ~ok}
+
+
+def component_columns(pmcombos, batteries):
+    """
+    Returns the dictionary of the arrays ComponentMatrix needs (the attributes in ComponentMatrix.pmcombo_columns and
+    bat_weight, bat_voltage and bat_capacity, in Wh) read from the prop/motor combo and battery objects.
+    """
+    columns = {}
+    columns['prop_dia'] = np.array([pmc.prop.diameter['value'] for pmc in pmcombos], dtype=float)
+    columns['prop_weight'] = np.array([pmc.prop.weight['value'] for pmc in pmcombos], dtype=float)
+    columns['motor_body_dia'] = np.array([pmc.motor.body_diameter['value'] for pmc in pmcombos], dtype=float)
+    columns['motor_weight'] = np.array([pmc.motor.weight['value'] for pmc in pmcombos], dtype=float)
+    columns['max_thrust'] = np.array([pmc.max_thrust['value'] for pmc in pmcombos], dtype=float)
+    columns['test_bat_volt'] = np.array([float(pmc.test_bat_volt_rating['value']) for pmc in pmcombos], dtype=float)
+    columns['thrust_table'], columns['current_table'] = pad_curves([pmc.thrust_vec['value'] for pmc in pmcombos],
+                                                                   [pmc.current_vec['value'] for pmc in pmcombos])
+    columns['bat_weight'] = np.array([bat.weight['value'] for bat in batteries], dtype=float)
+    columns['bat_voltage'] = np.array([float(bat.voltage['value']) for bat in batteries], dtype=float)
+    columns['bat_capacity'] = np.array([bat.capacity['value'] for bat in batteries], dtype=float)
+    return columns
+
+
+def take(components, positions):
+    """
+    Returns the components at 'positions' (an index array) of the sequence 'components'. A list gives a list, and a
+    lazy sequence (e.g., a catalogsnapshot.ComponentList) is indexed with the array so that no component is read.
+    """
+    if isinstance(components, list):
+        return [components[i] for i in positions]
+    return components[positions]
+
+
+def pad_curves(x_vecs, y_vecs):
+    """
+    Packs a list of x (thrust) vectors and a list of y (current) vectors of varying length into two 2D arrays with one
+    row per vector. Each row is sorted by x the same way as propmotorcombo.CurrentThrustTable (the table behind the
+    Propmotorcombo.interp_many lookups of the is_feasible methods), so that batch_interp gives the same results for
+    test data that was not entered in ascending order. The unused x entries are +inf and the unused y entries are
+    nan so that padded entries never take part in an interpolation.
+    """
+    n_cols = max([len(x) for x in x_vecs] + [1])
+    x_table = np.full((len(x_vecs), n_cols), np.inf)
+    y_table = np.full((len(y_vecs), n_cols), np.nan)
+    for row, (x, y) in enumerate(zip(x_vecs, y_vecs)):
+        curve = CurrentThrustTable(x, y)
+        x_table[row, :len(curve.thrust)] = curve.thrust
+        y_table[row, :len(curve.current)] = curve.current
+    return x_table, y_table
+
+
+def float_is_close(f1, f2, rel_tol=1e-09, abs_tol=0.000001):
+    """
+    Array version of tools.float_is_close.
+    """
+    return np.abs(f1-f2) <= np.maximum(rel_tol*np.maximum(np.abs(f1), np.abs(f2)), abs_tol)
+
+
+def batch_interp(x_table, y_table, rows, xint):
+    """
+    Row-wise version of tools.interp. For each k, interpolates the curve (x_table[rows[k]], y_table[rows[k]]) at
+    xint[k] using the same rules as tools.interp: an x value "close" to xint returns its y value directly, otherwise the
+    first x value greater than xint and the one before it are used for linear interpolation. Each row of x_table must be
+    sorted in ascending order (see pad_curves for the padding convention).
+
+    Returns (yint, ok), where ok[k] is False wherever tools.interp would have raised "Insufficient Data" (yint[k] is nan
+    there).
+    """
+    x = x_table[rows]
+    y = y_table[rows]
+    xt = xint[:, np.newaxis]
+    valid = np.isfinite(x)
+    has_data = valid.any(axis=1)
+    x_min = np.where(valid, x, np.inf).min(axis=1)
+    x_max = np.where(valid, x, -np.inf).max(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        in_range = ((x_min <= xint) & (xint <= x_max)) | float_is_close(xint, x_min) | float_is_close(xint, x_max)
+        close = valid & float_is_close(x, xt)
+        above = valid & (xt < x)
+
+        r = np.arange(len(rows))
+        has_close = close.any(axis=1)
+        y_close = y[r, close.argmax(axis=1)]
+        i_above = above.argmax(axis=1)
+        x1 = x[r, i_above-1]
+        y1 = y[r, i_above-1]
+        slope = (y[r, i_above]-y1)/(x[r, i_above]-x1)
+        yint = np.where(has_close, y_close, slope*(xint-x1) + y1)
+
+    ok = has_data & in_range & (has_close | above.any(axis=1))
+    yint[~ok] = np.nan
+    return yint, ok
@@ -1,3 +1,4 @@
+from bisect import bisect_left, bisect_right
 from displayable import Displayable
 from collections import OrderedDict
 from tools import convert_unit, CapacityConvError
@@ -196,4 +197,56 @@ class Battery(Displayable):
         if return_widgets:
             return mainframe, current_obj_vars
         else:
-            return mainframe
\ No newline at end of file
+            return mainframe
+
+class BatteryVoltageIndex(object):
+    """
+    Index of a list of batteries sorted by rated voltage. It is used to find the batteries that are compatible with the
+    test battery voltage of a prop/motor combo (i.e., within 'tolerance' volts of it) with a binary search instead of
+    checking every battery. Build the index once per search and reuse it for every prop/motor combo.
+
+    Batteries are always returned in the order they were given to the index so that the order of the alternatives does
+    not depend on the index.
+    """
+    def __init__(self, batteries, tolerance=0.1, voltages=None):
+        # If the voltages of the batteries are already known (e.g., ComponentMatrix.bat_voltage) they may be given so
+        # that the battery objects are not read
+        self.batteries = list(batteries) if voltages is None else batteries
+        self.tolerance = tolerance
+        if voltages is None:
+            voltages = [bat.voltage['value'] for bat in self.batteries]
+        voltages = [float(volt) for volt in voltages]
+        self.positions = sorted(range(len(self.batteries)), key=lambda i: voltages[i])
+        self.voltages = [voltages[i] for i in self.positions]
+
+    def compatible_window(self, voltage):
+        """
+        Returns (start, stop) such that self.positions[start:stop] are the positions in self.batteries of the batteries
+        whose voltage is within self.tolerance of 'voltage' (in order of voltage). The compatible batteries are always
+        a contiguous run of the voltage sorted list.
+        """
+        voltage = float(voltage)
+        # The binary search window is padded slightly so that floating point round-off at its edges can not drop a
+        # battery. The exact test below decides the edge cases the same way the old linear filter did.
+        pad = self.tolerance * 1e-6
+        start = bisect_left(self.voltages, voltage - self.tolerance - pad)
+        stop = bisect_right(self.voltages, voltage + self.tolerance + pad)
+        while start < stop and not abs(self.voltages[start] - voltage) < self.tolerance:
+            start += 1
+        while stop > start and not abs(self.voltages[stop-1] - voltage) < self.tolerance:
+            stop -= 1
+        return start, stop
+
+    def compatible_positions(self, voltage):
+        """
+        Returns the (sorted) positions in self.batteries of the batteries whose voltage is within self.tolerance of
+        'voltage'.
+        """
+        start, stop = self.compatible_window(voltage)
+        return sorted(self.positions[start:stop])
+
+    def compatible(self, voltage):
+        """
+        Returns the list of batteries whose voltage is within self.tolerance of 'voltage'.
+        """
+        return [self.batteries[i] for i in self.compatible_positions(voltage)]
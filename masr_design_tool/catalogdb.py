@@ -0,0 +1,508 @@
+import cPickle as pickle
+import glob
+import os
+import shelve
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import dblocation
+
+"""
+This module contains the SQLite catalog store that holds the component databases (batterydb, propmotorcombodb,
+motordb, etc.). Every catalog is one table of the catalog file. A row holds the component name, the pickled component
+object, and a typed numeric column for each attribute listed in catalog_columns, so that components can be found with
+indexed range queries (e.g., every battery within 0.1 V of 11.1 V) without unpickling the whole catalog. The thrust and
+current test data of the prop/motor combos are also kept point by point in a separate table.
+
+open_catalog returns a Catalog, which has the same dictionary-like interface as the shelve objects the databases used
+to be (db[name] = obj, del db[name], db.values(), db.keys(), len(db), name in db, db.close()) plus the query methods.
+The first time a catalog is opened its old shelve database, if there is one, is copied into the catalog file (see
+migrate_shelves). The shelve files are left as they were.
+
+The shelve databases in the databases folder are the component data that ships with the tool. The catalog file (and
+the column snapshots of catalogsnapshot) are not shipped: they are built from the shelves the first time the tool is
+run, and from then on the catalog file is the one that is read and written. The shelves are not written to again, so
+they still hold the shipped data, and migrate_shelves can copy them over the catalog file to start again from it.
+
+Code that only reads a catalog should use load_catalog instead, which returns a read-only CatalogSnapshot of it kept in
+memory for the whole process. A catalog is then only read from disk (and unpickled) again once it has been written to,
+either through a Catalog of this process or by another process (which changes the modification time of the file and
+the version stamp of the catalog).
+"""
+
+db_location = dblocation.db_location
+catalog_file = db_location + 'catalogs.sqlite'
+
+# The numeric columns of each catalog: (column name, attribute path, indexed). The attribute path may go through
+# sub-objects (e.g., 'prop.diameter'). Attributes stored as {'value': ..., 'unit': ...} dictionaries are stored by value
+# (in the units the object keeps them in). Catalogs that are not listed here only get the name and object columns.
+catalog_columns = {
+    'batterydb': [('weight', 'weight', True), ('capacity', 'capacity', True), ('voltage', 'voltage', True),
+                  ('cells', 'cells', False), ('cost', 'cost', False), ('xdim', 'xdim', False),
+                  ('ydim', 'ydim', False), ('zdim', 'zdim', False)],
+    'propmotorcombodb': [('test_bat_volt', 'test_bat_volt_rating', True), ('max_thrust', 'max_thrust', False),
+                         ('prop_diameter', 'prop.diameter', True), ('prop_weight', 'prop.weight', False),
+                         ('motor_weight', 'motor.weight', True), ('motor_body_diameter', 'motor.body_diameter', False)],
+    'motordb': [('weight', 'weight', True), ('kv', 'Kv', False), ('body_diameter', 'body_diameter', True),
+                ('cost', 'cost', False)],
+    'propellerdb': [('weight', 'weight', True), ('diameter', 'diameter', True), ('pitch', 'pitch', False),
+                    ('n_blades', 'n_blades', False), ('cost', 'cost', False)],
+    'sensordb': [('weight', 'weight', True), ('xdim', 'xdim', False), ('ydim', 'ydim', False),
+                 ('zdim', 'zdim', False)],
+    'printerdb': [('length', 'length', False), ('width', 'width', False), ('height', 'height', False)],
+    'printingmaterialdb': [('density', 'density', False), ('cs_area', 'cs_area', False)],
+    'cutterdb': [('length', 'length', False), ('width', 'width', False)],
+    'cuttingmaterialdb': [('density', 'density', False), ('thickness', 'thickness', False)],
+}
+
+# Table holding the prop/motor combo test data, one row per data point
+curve_table = 'propmotorcombo_curves'
+
+# The CatalogSnapshots returned by load_catalog, by (catalog file, catalog name)
+_snapshots = {}
+
+
+def open_catalog(name, path=None):
+    """
+    Returns the Catalog called 'name' (e.g., 'batterydb') of the catalog file at 'path' (by default catalog_file). This
+    is what shelve.open(db_location + name) used to be.
+    """
+    return Catalog(name, path)
+
+
+class Catalog(object):
+    """
+    One component catalog of an SQLite catalog file (see the module docstring). If the catalog is not in the file yet
+    it is created, and filled from its old shelve database if 'migrate' is True. Writes made outside of a transaction()
+    block are committed right away, just as a shelve writes through. Every write also increments the version stamp of
+    the catalog (see version()).
+    """
+    def __init__(self, name, path=None, migrate=True):
+        self.name = name
+        self.path = path or catalog_file
+        self.columns = catalog_columns.get(name, [])
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.text_factory = str
+        self._depth = 0
+        if not self._table_exists():
+            with self.transaction():
+                self._create_table()
+                if migrate:
+                    self._copy_shelve()
+
+    def _table_exists(self):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                                 (self.name,)).fetchone() is not None
+
+    def _create_table(self):
+        columns = ''.join(', %s REAL' % column for column, _, _ in self.columns)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS %s (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, '
+                          'obj BLOB NOT NULL%s)' % (self.name, columns))
+        for column, _, indexed in self.columns:
+            if indexed:
+                self.conn.execute('CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)' % (self.name, column, self.name,
+                                                                                    column))
+        self.conn.execute('CREATE TABLE IF NOT EXISTS catalog_versions (name TEXT PRIMARY KEY, version INTEGER)')
+        if self.name == 'propmotorcombodb':
+            self.conn.execute('CREATE TABLE IF NOT EXISTS %s (name TEXT NOT NULL, point INTEGER NOT NULL, '
+                              'thrust REAL, current REAL, PRIMARY KEY (name, point))' % curve_table)
+
+    def _copy_shelve(self):
+        """
+        Copies the old shelve database of this catalog, if there is one in the folder of the catalog file, into the
+        (empty) table.
+        """
+        shelve_path = os.path.join(os.path.dirname(os.path.abspath(self.path)), self.name)
+        if not glob.glob(shelve_path + '.*') and not os.path.exists(shelve_path):
+            return
+        db = shelve.open(shelve_path, 'r')
+        try:
+            self.update((obj_name, db[obj_name]) for obj_name in db.keys())
+        finally:
+            db.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager that groups every write made inside the with block into one transaction, which is committed at
+        the end of the block or rolled back if the block raises. Transactions may be nested; only the outermost one
+        commits, and drops the load_catalog snapshot of the catalog.
+        """
+        if self._depth == 0:
+            self.conn.execute('BEGIN IMMEDIATE')
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute('ROLLBACK')
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute('COMMIT')
+            invalidate(self.name, self.path)
+
+    def version(self):
+        """
+        Returns the version stamp of the catalog, a number that goes up every time the catalog is written to.
+        """
+        row = self.conn.execute('SELECT version FROM catalog_versions WHERE name=?', (self.name,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self):
+        # The stamp is also at least the time in ms, so that a catalog file made again from scratch does not reuse the
+        # stamps of the old file
+        self.conn.execute('INSERT OR REPLACE INTO catalog_versions (name, version) VALUES (?, ?)',
+                          (self.name, max(self.version() + 1, int(time.time() * 1000))))
+
+    # Dictionary-like interface (the same as the shelve databases)
+    def __getitem__(self, obj_name):
+        row = self.conn.execute('SELECT obj FROM %s WHERE name=?' % self.name, (obj_name,)).fetchone()
+        if row is None:
+            raise KeyError(obj_name)
+        return pickle.loads(str(row[0]))
+
+    def __setitem__(self, obj_name, obj):
+        with self.transaction():
+            self._write(obj_name, obj)
+            self._bump_version()
+
+    def update(self, items):
+        """
+        Writes every (name, object) pair of 'items' to the catalog in one transaction. This is much faster than setting
+        the components one at a time outside of a transaction.
+        """
+        with self.transaction():
+            for obj_name, obj in items:
+                self._write(obj_name, obj)
+            self._bump_version()
+
+    def _write(self, obj_name, obj):
+        values = [column_value(obj, path) for _, path, _ in self.columns]
+        columns = ''.join(', %s' % column for column, _, _ in self.columns)
+        existing = self.conn.execute('SELECT id FROM %s WHERE name=?' % self.name, (obj_name,)).fetchone()
+        blob = sqlite3.Binary(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        if existing is None:
+            self.conn.execute('INSERT INTO %s (name, obj%s) VALUES (?, ?%s)' %
+                              (self.name, columns, ', ?' * len(values)), [obj_name, blob] + values)
+        else:
+            # Overwriting keeps the position of the component in the catalog
+            assignments = ''.join(', %s=?' % column for column, _, _ in self.columns)
+            self.conn.execute('UPDATE %s SET obj=?%s WHERE id=?' % (self.name, assignments),
+                              [blob] + values + [existing[0]])
+        if self.name == 'propmotorcombodb':
+            self.conn.execute('DELETE FROM %s WHERE name=?' % curve_table, (obj_name,))
+            self.conn.executemany('INSERT INTO %s (name, point, thrust, current) VALUES (?, ?, ?, ?)' %
+                                  curve_table, [(obj_name, point, thrust, current) for point, (thrust, current) in
+                                                enumerate(zip(obj.thrust_vec['value'], obj.current_vec['value']))])
+
+    def __delitem__(self, obj_name):
+        with self.transaction():
+            if self.conn.execute('DELETE FROM %s WHERE name=?' % self.name, (obj_name,)).rowcount == 0:
+                raise KeyError(obj_name)
+            if self.name == 'propmotorcombodb':
+                self.conn.execute('DELETE FROM %s WHERE name=?' % curve_table, (obj_name,))
+            self._bump_version()
+
+    def rename(self, obj_name, new_name):
+        """
+        Renames the component 'obj_name' to 'new_name' without changing its position in the catalog. Note that the name
+        attribute of the stored object is not changed, so the object should be written again under its new name.
+        """
+        with self.transaction():
+            if new_name in self:
+                raise ValueError("An object named '%s' is already in the database." % new_name)
+            if self.conn.execute('UPDATE %s SET name=? WHERE name=?' % self.name, (new_name, obj_name)).rowcount == 0:
+                raise KeyError(obj_name)
+            if self.name == 'propmotorcombodb':
+                self.conn.execute('UPDATE %s SET name=? WHERE name=?' % curve_table, (new_name, obj_name))
+            self._bump_version()
+
+    def __contains__(self, obj_name):
+        return self.conn.execute('SELECT 1 FROM %s WHERE name=?' % self.name, (obj_name,)).fetchone() is not None
+
+    has_key = __contains__
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM %s' % self.name).fetchone()[0]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [row[0] for row in self.conn.execute('SELECT name FROM %s ORDER BY id' % self.name)]
+
+    def values(self):
+        return [pickle.loads(str(row[0])) for row in self.conn.execute('SELECT obj FROM %s ORDER BY id' % self.name)]
+
+    def items(self):
+        return [(row[0], pickle.loads(str(row[1])))
+                for row in self.conn.execute('SELECT name, obj FROM %s ORDER BY id' % self.name)]
+
+    def rows(self):
+        """
+        Returns the list of (name, object, {column: value}) tuples of every component in catalog order.
+        """
+        names = [column for column, _, _ in self.columns]
+        query = 'SELECT name, obj%s FROM %s ORDER BY id' % (''.join(', %s' % column for column in names), self.name)
+        return [(row[0], pickle.loads(str(row[1])), dict(zip(names, row[2:]))) for row in self.conn.execute(query)]
+
+    def table(self):
+        """
+        Returns the list of component names and the ordered dictionary of {column: list of values} of the numeric
+        columns, in catalog order, without unpickling any of the components.
+        """
+        names = [column for column, _, _ in self.columns]
+        query = 'SELECT name%s FROM %s ORDER BY id' % (''.join(', %s' % column for column in names), self.name)
+        rows = self.conn.execute(query).fetchall()
+        return [row[0] for row in rows], OrderedDict((column, [row[i+1] for row in rows])
+                                                     for i, column in enumerate(names))
+
+    def close(self):
+        self.conn.close()
+
+    # Indexed queries
+    def _where(self, ranges):
+        """
+        Builds the WHERE clause and its parameters for the column ranges of query().
+        """
+        clauses = []
+        params = []
+        for column, bounds in ranges.items():
+            if column not in [name for name, _, _ in self.columns]:
+                raise ValueError("The %s catalog has no numeric column '%s'." % (self.name, column))
+            if isinstance(bounds, tuple):
+                bounds = [bounds]
+            alternatives = []
+            for low, high in bounds:
+                tests = []
+                if low is not None:
+                    tests.append('%s >= ?' % column)
+                    params.append(low)
+                if high is not None:
+                    tests.append('%s <= ?' % column)
+                    params.append(high)
+                alternatives.append('(%s)' % ' AND '.join(tests) if tests else '%s IS NOT NULL' % column)
+            # An empty list of ranges matches nothing
+            clauses.append('(%s)' % ' OR '.join(alternatives) if alternatives else '0')
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def query(self, order_by=None, **ranges):
+        """
+        Returns the components whose numeric columns (see catalog_columns) are within the given ranges, e.g.
+        query(voltage=(11.0, 11.2), weight=(None, 2.0)) for the batteries between 11.0 and 11.2 V that weigh 2 N or
+        less. A range is a (low, high) tuple, where None leaves that end open, or a list of such tuples, any of which
+        may match. The components are returned in catalog order, or in order of the column 'order_by'.
+        """
+        where, params = self._where(ranges)
+        order = order_by if order_by is not None else 'id'
+        if order not in ['id', 'name'] + [name for name, _, _ in self.columns]:
+            raise ValueError("The %s catalog has no column '%s'." % (self.name, order))
+        return [pickle.loads(str(row[0])) for row in
+                self.conn.execute('SELECT obj FROM %s%s ORDER BY %s' % (self.name, where, order), params)]
+
+    def count(self, **ranges):
+        """
+        Returns the number of components within the ranges (see query()) without unpickling any of them.
+        """
+        where, params = self._where(ranges)
+        return self.conn.execute('SELECT COUNT(*) FROM %s%s' % (self.name, where), params).fetchone()[0]
+
+    def column(self, column):
+        """
+        Returns the list of (name, value) pairs of the numeric column 'column' in catalog order.
+        """
+        if column not in [name for name, _, _ in self.columns]:
+            raise ValueError("The %s catalog has no numeric column '%s'." % (self.name, column))
+        return self.conn.execute('SELECT name, %s FROM %s ORDER BY id' % (column, self.name)).fetchall()
+
+    def curves(self):
+        """
+        Returns a dictionary of {combo name: (thrust list, current list)} holding the test data of every prop/motor
+        combo of the catalog, read from the curve table without unpickling the combos.
+        """
+        curves = {}
+        for name, thrust, current in self.conn.execute('SELECT name, thrust, current FROM %s ORDER BY name, point' %
+                                                       curve_table):
+            curve = curves.setdefault(name, ([], []))
+            curve[0].append(thrust)
+            curve[1].append(current)
+        return curves
+
+
+def column_value(obj, path):
+    """
+    Returns the value of the attribute 'path' of 'obj' as a float (None if it is missing or not a number).
+    """
+    value = obj
+    for attr in path.split('.'):
+        value = getattr(value, attr, None)
+    if isinstance(value, dict):
+        value = value.get('value')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def migrate_shelves(names=None, path=None):
+    """
+    Copies the shelve databases 'names' (by default every catalog in catalog_columns that has a shelve database in the
+    database folder) into the catalog file at 'path', replacing what the catalog file held for them. Returns a
+    dictionary of {catalog name: number of components copied}.
+    """
+    path = path or catalog_file
+    if names is None:
+        folder = os.path.dirname(os.path.abspath(path))
+        names = [name for name in sorted(catalog_columns) if glob.glob(os.path.join(folder, name) + '.*')]
+    copied = {}
+    for name in names:
+        catalog = Catalog(name, path, migrate=False)
+        try:
+            with catalog.transaction():
+                catalog.conn.execute('DROP TABLE %s' % name)
+                if name == 'propmotorcombodb':
+                    catalog.conn.execute('DROP TABLE IF EXISTS %s' % curve_table)
+                catalog._create_table()
+                catalog._copy_shelve()
+            copied[name] = len(catalog)
+        finally:
+            catalog.close()
+    return copied
+
+
+def versions(names, path=None):
+    """
+    Returns a tuple of the (catalog name, version stamp) pairs of the catalogs 'names', which changes whenever one of
+    the catalogs is written to (see Catalog.version).
+    """
+    stamps = []
+    for name in names:
+        catalog = Catalog(name, path)
+        try:
+            stamps.append((name, catalog.version()))
+        finally:
+            catalog.close()
+    return tuple(stamps)
+
+
+def load_catalog(name, path=None):
+    """
+    Returns the CatalogSnapshot of the catalog called 'name' of the catalog file at 'path' (by default catalog_file).
+    The snapshot is loaded once and shared by every caller until the catalog changes: as long as the modification time
+    of the file is the same the snapshot is returned without opening the file, and if it has changed the catalog is only
+    read again if its version stamp has changed too.
+    """
+    path = path or catalog_file
+    snapshot = _snapshots.get((path, name))
+    if snapshot is not None and os.path.exists(path) and snapshot.mtime == os.path.getmtime(path):
+        return snapshot
+    catalog = Catalog(name, path)
+    try:
+        mtime = os.path.getmtime(path)
+        version = catalog.version()
+        if snapshot is not None and snapshot.version() == version:
+            snapshot.mtime = mtime
+        else:
+            snapshot = CatalogSnapshot(name, catalog.columns, catalog.rows(), version, mtime)
+    finally:
+        catalog.close()
+    _snapshots[(path, name)] = snapshot
+    return snapshot
+
+
+def invalidate(name=None, path=None):
+    """
+    Drops the snapshot of the catalog 'name' (all of them if name is None) so that the next load_catalog call reads it
+    from disk.
+    """
+    path = path or catalog_file
+    for key in _snapshots.keys():
+        if key[0] == path and name in (None, key[1]):
+            del _snapshots[key]
+
+
+class CatalogSnapshot(object):
+    """
+    In memory, read-only copy of a catalog, made by load_catalog. It has the same read interface as a Catalog (db[name],
+    db.values(), db.keys(), len(db), name in db, db.close() and query/count/column) but never touches the disk. The
+    component objects are shared by every user of the snapshot and must not be modified.
+    """
+    def __init__(self, name, columns, rows, version, mtime):
+        self.name = name
+        self.columns = columns
+        self.mtime = mtime
+        self._version = version
+        self._names = [row[0] for row in rows]
+        self._objs = dict((row[0], row[1]) for row in rows)
+        self._values = dict((row[0], row[2]) for row in rows)
+
+    def __getitem__(self, obj_name):
+        return self._objs[obj_name]
+
+    def __contains__(self, obj_name):
+        return obj_name in self._objs
+
+    has_key = __contains__
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def keys(self):
+        return list(self._names)
+
+    def values(self):
+        return [self._objs[obj_name] for obj_name in self._names]
+
+    def items(self):
+        return [(obj_name, self._objs[obj_name]) for obj_name in self._names]
+
+    def version(self):
+        return self._version
+
+    def close(self):
+        pass
+
+    def _select(self, ranges):
+        """
+        Returns the names of the components within the column ranges (see Catalog.query) in catalog order.
+        """
+        for column in ranges:
+            if column not in [name for name, _, _ in self.columns]:
+                raise ValueError("The %s catalog has no numeric column '%s'." % (self.name, column))
+        ranges = dict((column, [bounds] if isinstance(bounds, tuple) else bounds) for column, bounds in ranges.items())
+
+        def within(value, low, high):
+            return value is not None and (low is None or value >= low) and (high is None or value <= high)
+        return [obj_name for obj_name in self._names
+                if all(any(within(self._values[obj_name][column], low, high) for low, high in bounds)
+                       for column, bounds in ranges.items())]
+
+    def query(self, order_by=None, **ranges):
+        """
+        Same as Catalog.query.
+        """
+        names = self._select(ranges)
+        if order_by == 'name':
+            names.sort()
+        elif order_by not in [None, 'id']:
+            if order_by not in [name for name, _, _ in self.columns]:
+                raise ValueError("The %s catalog has no column '%s'." % (self.name, order_by))
+            # Missing values come first, as they do in SQLite
+            names.sort(key=lambda obj_name: (self._values[obj_name][order_by] is not None,
+                                              self._values[obj_name][order_by]))
+        return [self._objs[obj_name] for obj_name in names]
+
+    def count(self, **ranges):
+        return len(self._select(ranges))
+
+    def column(self, column):
+        if column not in [name for name, _, _ in self.columns]:
+            raise ValueError("The %s catalog has no numeric column '%s'." % (self.name, column))
+        return [(obj_name, self._values[obj_name][column]) for obj_name in self._names]
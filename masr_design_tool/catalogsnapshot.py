@@ -0,0 +1,180 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import batchsizing
+import catalogdb
+
+"""
+This module contains the compiled column snapshots of the component catalogs used by the sizing engine. A snapshot of a
+catalog is a folder of NumPy .npy files: the component names, one float array per numeric column of the catalog (see
+catalogdb.catalog_columns) and, for the prop/motor combos, the padded thrust and current tables (see
+batchsizing.pad_curves), along with a small header.json. The snapshots are compiled from the numeric columns and the
+curve table of the catalog file, so no component is unpickled.
+
+Snapshots are kept in the 'snapshots' folder next to the catalog file, one folder per catalog version stamp (e.g.,
+'batterydb-1492532156334'). load_columns compiles the snapshot of the current version if there is none yet (i.e.,
+the first time it is needed after the catalog has changed) and removes the snapshots of older versions. The arrays are
+opened with np.load(mmap_mode='r'), so loading a snapshot takes next to no time and the pages of the files are shared by
+every process that maps them. ComponentMatrix shards sent to worker processes map the files again instead of carrying
+the arrays (see batchsizing.ComponentMatrix.__getstate__).
+"""
+
+# The ComponentMatrix prop/motor combo and battery arrays and the snapshot columns they are read from
+pmcombo_columns = {'prop_dia': 'prop_diameter', 'prop_weight': 'prop_weight', 'motor_body_dia': 'motor_body_diameter',
+                   'motor_weight': 'motor_weight', 'max_thrust': 'max_thrust', 'test_bat_volt': 'test_bat_volt',
+                   'thrust_table': 'thrust_table', 'current_table': 'current_table'}
+battery_columns = {'bat_weight': 'weight', 'bat_voltage': 'voltage', 'bat_capacity': 'capacity'}
+
+# The ColumnSnapshots opened by this process, by folder
+_opened = {}
+
+
+def snapshot_folder(path=None):
+    """
+    Returns the folder holding the snapshots of the catalogs of the catalog file at 'path' (by default
+    catalogdb.catalog_file).
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(path or catalogdb.catalog_file)), 'snapshots')
+
+
+def load_columns(name, path=None):
+    """
+    Returns the ColumnSnapshot of the current version of the catalog 'name' of the catalog file at 'path', compiling it
+    first if needed.
+    """
+    version = dict(catalogdb.versions([name], path))[name]
+    folder = os.path.join(snapshot_folder(path), '%s-%d' % (name, version))
+    if folder not in _opened and not os.path.exists(os.path.join(folder, 'header.json')):
+        folder = compile_columns(name, path)
+    if folder not in _opened:
+        _opened[folder] = ColumnSnapshot(folder)
+    return _opened[folder]
+
+
+def compile_columns(name, path=None):
+    """
+    Writes the snapshot of the current version of the catalog 'name' of the catalog file at 'path' (unless it already
+    exists), removes the snapshots of its older versions, and returns the folder of the snapshot.
+    """
+    root = snapshot_folder(path)
+    if not os.path.isdir(root):
+        os.makedirs(root)
+    catalog = catalogdb.Catalog(name, path)
+    try:
+        # Read everything in one transaction so that the snapshot matches its version stamp
+        with catalog.transaction():
+            version = catalog.version()
+            names, columns = catalog.table()
+            curves = catalog.curves() if name == 'propmotorcombodb' else None
+    finally:
+        catalog.close()
+
+    folder = os.path.join(root, '%s-%d' % (name, version))
+    if not os.path.exists(os.path.join(folder, 'header.json')):
+        # The snapshot is written to a temporary folder first so that other processes never see a partial snapshot
+        temp_folder = tempfile.mkdtemp(prefix=name + '-', suffix='.tmp', dir=root)
+        # The names are kept as the (UTF-8) byte strings the catalog file holds them as, so that they are the keys of
+        # the catalog as they are
+        np.save(os.path.join(temp_folder, 'names.npy'), np.array(names, dtype=str))
+        for column, values in columns.items():
+            np.save(os.path.join(temp_folder, column + '.npy'),
+                    np.array([np.nan if value is None else value for value in values], dtype=float))
+        if curves is not None:
+            thrust_table, current_table = batchsizing.pad_curves([curves.get(n, ([], []))[0] for n in names],
+                                                                 [curves.get(n, ([], []))[1] for n in names])
+            np.save(os.path.join(temp_folder, 'thrust_table.npy'), thrust_table)
+            np.save(os.path.join(temp_folder, 'current_table.npy'), current_table)
+            columns['thrust_table'] = columns['current_table'] = None
+        with open(os.path.join(temp_folder, 'header.json'), 'w') as header_file:
+            json.dump({'catalog': name, 'version': version, 'rows': len(names), 'columns': columns.keys()},
+                      header_file)
+        try:
+            os.rename(temp_folder, folder)
+        except OSError:
+            # Another process compiled the same snapshot first
+            shutil.rmtree(temp_folder, ignore_errors=True)
+
+    # Remove the snapshots of the older versions. On Windows the files of a snapshot that is still mapped by a process
+    # can not be removed, they are left for the next time.
+    for old_name in os.listdir(root):
+        old_folder = os.path.join(root, old_name)
+        if old_name.startswith(name + '-') and not old_name.endswith('.tmp') and old_folder != folder:
+            _opened.pop(old_folder, None)
+            shutil.rmtree(old_folder, ignore_errors=True)
+    return folder
+
+
+class ColumnSnapshot(object):
+    """
+    The memory-mapped arrays of a catalog snapshot. 'names' holds the names of the components in catalog order, and
+    column(name) returns the array of a column (in the same order).
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, 'header.json')) as header_file:
+            header = json.load(header_file)
+        self.name = str(header['catalog'])
+        self.version = header['version']
+        self.rows = header['rows']
+        self.columns = [str(column) for column in header['columns']]
+        self._arrays = {}
+        self.names = self.column('names')
+
+    def filename(self, column):
+        return os.path.join(self.folder, column + '.npy')
+
+    def column(self, column):
+        if column not in self._arrays:
+            # An empty file can not be memory-mapped
+            self._arrays[column] = np.load(self.filename(column), mmap_mode='r' if self.rows else None)
+        return self._arrays[column]
+
+
+class ComponentList(object):
+    """
+    Read-only list of the components 'names' of the catalog 'db_name'. The objects are taken from the in-memory copy of
+    the catalog (see catalogdb.load_catalog), which is only loaded when a component is first looked up.
+    """
+    def __init__(self, db_name, names, path=None):
+        self.db_name = db_name
+        self.names = names
+        self.path = path
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        # A slice or an index array gives the ComponentList of those components
+        if isinstance(i, (slice, np.ndarray)):
+            return ComponentList(self.db_name, self.names[i], self.path)
+        return catalogdb.load_catalog(self.db_name, self.path)[self.names[i]]
+
+    def __iter__(self):
+        db = catalogdb.load_catalog(self.db_name, self.path)
+        return (db[obj_name] for obj_name in self.names)
+
+
+def component_matrix(pmaterials, battery_positions=None, memoize=False, pair=True, path=None):
+    """
+    Returns a batchsizing.ComponentMatrix of every prop/motor combo of the catalog file at 'path', the batteries at
+    'battery_positions' of the battery catalog (all of them if None) and the print materials 'pmaterials', with its
+    arrays read from the catalog snapshots. The prop/motor combo arrays are the memory-mapped arrays themselves. The
+    pmcombos and batteries of the matrix are ComponentLists.
+    """
+    pm_snapshot = load_columns('propmotorcombodb', path)
+    bat_snapshot = load_columns('batterydb', path)
+    if battery_positions is None:
+        battery_positions = np.arange(bat_snapshot.rows)
+    columns = dict((attr, pm_snapshot.column(column)) for attr, column in pmcombo_columns.items())
+    columns.update((attr, np.asarray(bat_snapshot.column(column))[battery_positions])
+                   for attr, column in battery_columns.items())
+    matrix = batchsizing.ComponentMatrix(ComponentList('propmotorcombodb', pm_snapshot.names, path),
+                                         ComponentList('batterydb', bat_snapshot.names[battery_positions], path),
+                                         pmaterials, memoize, pair, columns)
+    matrix.column_files = dict((attr, pm_snapshot.filename(column)) for attr, column in pmcombo_columns.items())
+    matrix.pm_rows = (0, pm_snapshot.rows)
+    return matrix
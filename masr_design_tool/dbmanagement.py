@@ -4,7 +4,7 @@ except ImportError:
     from tkinter import *
 import ttk
 from collections import OrderedDict
-import shelve
+import catalogdb
 import tools
 from winplace import get_win_place
 import dblocation
@@ -81,8 +81,8 @@ class DatabaseMgtWindow(Toplevel):
         """
         if self.db_name == 'propmotorcombodb':
             # Obtain dictionary of available motors and propellers
-            motor_db = shelve.open(self.db_location+'motordb')
-            prop_db = shelve.open(self.db_location+'propellerdb')
+            motor_db = catalogdb.open_catalog('motordb')
+            prop_db = catalogdb.open_catalog('propellerdb')
             if not motor_db:
                 motor_db.close()
                 prop_db.close()
@@ -138,48 +138,34 @@ class DatabaseMgtWindow(Toplevel):
         self.add_button.pack(side=RIGHT)
 
     def save_edits(self):
-        # First delete all items in the existing database. The "edit" is actually a complete updating using the info
-        # from the writable entry widgets. This makes it easier to enforce the rules associated with certain object
-        # attributes that are enforced during initialization of the object. Create a copy of the old database
-        # temporarily in case something goes wrong after the old database is deleated.
-        old_db_copy = {}
-        try:
-            db = shelve.open(self.db_location+self.db_name)
-            for obj_name in db:
-                old_db_copy[obj_name] = db[obj_name]
-                del db[obj_name]
-            db.close()
-        except IOError:
-            self.edit_message.set("Could not delete old entries.")
-            raise
-
-        # Now look through the db_frame entries by row, get the entries, group them, and store them in the
-        # obj_info ordered dictionary. Pass this to the add_obj_to_database method which adds an object with the
-        # attributes given in obj_info to the database with name = self.db_name.
+        """
+        Saves the changes made in edit mode. Only the objects whose entries were changed are re-created (see
+        object_from_entries) and written back, all in one transaction: if any of them can not be created or written, the
+        database is left as it was and the window stays in edit mode so that the entries can be corrected.
+        """
+        changed = self.db_frame.changed_objects()
+        db = catalogdb.open_catalog(self.db_name)
         try:
-            # obj is type ordered dictionary here
-            for obj in self.db_frame.all_object_entries.values():
-                obj_info = OrderedDict()
-                # attr are the keys (type str) in obj
-                for attr in obj:
-                    if len(obj[attr]) == 1:
-                        # obj_info[attr] is a list with a single ttk.Entry
-                        obj_info[attr] = obj[attr]
-                    else:
-                        # obj_info[attr] is a list with a ttk.Entry and a ttk.Combobox
-                        obj_info[attr] = [obj[attr][0], obj[attr][2]]
-                self.add_obj_to_database(obj_info)
-            self.mode = 'view'
-            self.db_frame.refresh_db_frame()
+            with db.transaction():
+                for obj_name, changed_attrs in changed.items():
+                    obj = self.object_from_entries(db[obj_name], changed_attrs)
+                    if obj.name != obj_name:
+                        db.rename(obj_name, obj.name)
+                    db[obj.name] = obj
+        except (ValueError, TypeError, KeyError, tools.ConversionError) as e:
+            self.edit_message.set("No changes saved. %s" % e)
+            return
         except Exception:
-            # If something went wrong, restore old database
-            db = shelve.open(self.db_location+self.db_name)
-            for obj_name in old_db_copy:
-                db[obj_name] = old_db_copy[obj_name]
-            db.close()
-            self.edit_message.set("Could not add new entries.")
+            self.edit_message.set("Could not save changes.")
             raise
-        self.edit_message.set("Edit successful.")
+        finally:
+            db.close()
+        self.mode = 'view'
+        self.db_frame.refresh_db_frame()
+        if changed:
+            self.edit_message.set("Edit successful.")
+        else:
+            self.edit_message.set("No changes made to database.")
 
         # Return to default button configuration
         self.cancel_button.pack_forget()
@@ -199,7 +185,7 @@ class DatabaseMgtWindow(Toplevel):
         oc = OverwriteConfirm(self, oc_message)
         oc.wait_window()
         if self.overwrite_decision == 'confirmed':
-            db = shelve.open(self.db_location+self.db_name)
+            db = catalogdb.open_catalog(self.db_name)
             del db[current_obj_name]
             self.edit_message.set("Object deleted successfully.")
             if not db:
@@ -217,31 +203,28 @@ class DatabaseMgtWindow(Toplevel):
         else:
             self.edit_message.set("No changes made to database.")
 
-    def add_obj_to_database(self, object_info):
+    def object_from_entries(self, old_obj, changed_attrs):
         """
-        object_info is an OrderedDict with form
-                    {'obj_name': [name_entry], 'other_attr_with_unit': [attr_val_entry, attr_unit_combobox], ...}
-        i.e., it is a dictionary of the object's attributes with appropriate unit from which the object can be created.
+        Re-creates 'old_obj' with the values of its changed entries in the database frame. The attributes in
+        changed_attrs are read from the entries (value and unit), so they go through the same input processing as an
+        object added with AddObjectWindow. The other attributes are given the exact values of old_obj instead of the
+        rounded values shown in the entries.
         """
         obj_attr = []
-        # attr_info is a list with either 1 ttk.Entry or 1 Entry and 1 Combobox depending on the attribute
-        for attr_info in object_info.values():
-            entry_val_list = []
-            # entry is either a ttk.Entry widget or a ttk.Combobox widget
-            for entry in attr_info:
-                entry_value = entry.get()
-                if len(str(entry_value)) == 0 or entry_value == 0:
-                    entry_value = None
-                entry_val_list.append(entry_value)
+        for attr, widgets in self.db_frame.all_object_entries[old_obj.name].items():
+            if attr in changed_attrs:
+                # widgets is a list with either 1 ttk.Entry or 1 Entry, its StringVar and 1 Combobox
+                entry_val_list = []
+                for entry in [widgets[0]] + widgets[2:]:
+                    entry_value = entry.get()
+                    if len(str(entry_value)) == 0 or entry_value == 0:
+                        entry_value = None
+                    entry_val_list.append(entry_value)
+            else:
+                attr_val = getattr(old_obj, attr)
+                entry_val_list = [attr_val['value'], attr_val['unit']] if isinstance(attr_val, dict) else [attr_val]
             obj_attr.append(entry_val_list)
-
-        if all(entry[0] is None for entry in obj_attr):
-            obj_attr = None
-
-        obj = getattr(__import__(self.class_name.lower()), self.class_name)(obj_attr)
-        db = shelve.open(self.db_location+self.db_name)
-        db[obj.name] = obj
-        db.close()
+        return getattr(__import__(self.class_name.lower()), self.class_name)(obj_attr)
 
     def close_window(self):
         self.master.master.manuf_req_frame.max_build_dim_frame.refresh_printer_cutter_lists()
@@ -262,6 +245,7 @@ class DatabaseFrame(ttk.Frame):
         self.db_name = master.db_name
         self.db_location = master.db_location
         self.all_object_entries = OrderedDict()
+        self.original_values = {}
         self.current_object_selection = StringVar()
         self.radiobutton_list = []
 
@@ -283,7 +267,7 @@ class DatabaseFrame(ttk.Frame):
         for widget in self.children.values():
             widget.destroy()
 
-        db = shelve.open(self.db_location+self.db_name)
+        db = catalogdb.open_catalog(self.db_name)
         row = 0
         for obj in db.values():
             if row != 0:
@@ -305,11 +289,33 @@ class DatabaseFrame(ttk.Frame):
     def writable_entries(self):
         """
         Makes all the entries in the database frame writable. This method is called when the user clicks the edit button
-        in the database management window.
+        in the database management window. The values of the entries are recorded so that changed_objects can tell which
+        objects were edited.
         """
         for obj in self.all_object_entries.values():
             for attr_val in obj.values():
                 attr_val[0].config(state=NORMAL)
+        self.original_values = dict((obj_name, self.entry_values(obj_name)) for obj_name in self.all_object_entries)
+
+    def entry_values(self, obj_name):
+        """
+        Returns a dictionary of {attribute: (entry value, unit combobox value)} of the entries of the object 'obj_name'.
+        """
+        return dict((attr, tuple(widget.get() for widget in [widgets[0]] + widgets[2:]))
+                    for attr, widgets in self.all_object_entries[obj_name].items())
+
+    def changed_objects(self):
+        """
+        Returns an ordered dictionary of {object name: list of changed attributes} of the objects whose entries have
+        been changed since writable_entries was called.
+        """
+        changed = OrderedDict()
+        for obj_name in self.all_object_entries:
+            values = self.entry_values(obj_name)
+            changed_attrs = [attr for attr in values if values[attr] != self.original_values[obj_name][attr]]
+            if changed_attrs:
+                changed[obj_name] = changed_attrs
+        return changed
 
     def readonly_entries(self):
         """
@@ -390,12 +396,12 @@ class AddObjectWindow(Toplevel):
                 entry_val_list.append(entry_value)
             obj_attr.append(entry_val_list)
 
-        db = shelve.open(self.db_location+self.db_name)
+        db = catalogdb.open_catalog(self.db_name)
         try:
             # Create object
             obj = getattr(__import__(self.class_name.lower()), self.class_name)(obj_attr)
             # Add object to database
-            if obj.name in db.keys():
+            if obj.name in db:
                 overwrite_message = "An object with the name '%s' already exists in the database. " \
                                     "Would you like to overwrite the existing object?" % obj.name
                 oc = OverwriteConfirm(self, overwrite_message)
@@ -452,7 +458,7 @@ class AddEditPMComboWindow(Toplevel):
         # Important step. If the mode is edit, retrieve the selected prop/motor combo from the database window
         if self.mode == 'edit':
             self.current_obj_name = self.master.db_frame.current_object_selection.get()
-            db = shelve.open(self.db_location+self.db_name)
+            db = catalogdb.open_catalog(self.db_name)
             self.obj_for_edit = db[self.current_obj_name]
             db.close()
 
@@ -473,8 +479,8 @@ class AddEditPMComboWindow(Toplevel):
                                             command=self.delete_obj_from_database)
 
         # Create motor database and propeller databases
-        self.motor_db = shelve.open(self.db_location+'motordb')
-        self.prop_db = shelve.open(self.db_location+'propellerdb')
+        self.motor_db = catalogdb.open_catalog('motordb')
+        self.prop_db = catalogdb.open_catalog('propellerdb')
 
         # Create widgets in misc entry frame
         self.motor_label = ttk.Label(self.misc_entry_frame, text='Select Motor')
@@ -537,8 +543,8 @@ class AddEditPMComboWindow(Toplevel):
         Performs the same function as the analogous add_obj_to_database method in the AddObjectWindow class with some
         modifications to accommodate the more complicated data structures of the Prop/Motor combo object attributes.
         """
-        self.motor_db = shelve.open(self.db_location+'motordb')
-        self.prop_db = shelve.open(self.db_location+'propellerdb')
+        self.motor_db = catalogdb.open_catalog('motordb')
+        self.prop_db = catalogdb.open_catalog('propellerdb')
         selected_motor = self.motor_db[self.motor_selected.get()]
         selected_prop = self.prop_db[self.prop_selected.get()]
         self.motor_db.close()
@@ -565,9 +571,9 @@ class AddEditPMComboWindow(Toplevel):
             raise
 
         # Add object to database
-        pmcombo_db = shelve.open(self.db_location+self.db_name)
+        pmcombo_db = catalogdb.open_catalog(self.db_name)
         try:
-            if pmcombo_db and current_obj.name in [pmcombo for pmcombo in pmcombo_db]:
+            if current_obj.name in pmcombo_db:
                 if (self.mode == 'edit') and (current_obj.name == self.master.db_frame.current_object_selection.get()):
                     overwrite_message = "Are you sure you want to make these changes to the %s database entry?"\
                                         % current_obj.name
@@ -606,7 +612,7 @@ class AddEditPMComboWindow(Toplevel):
         oc = OverwriteConfirm(self, overwrite_message)
         oc.wait_window()
         if self.overwrite_decision == 'confirmed':
-            db = shelve.open(self.db_location+self.db_name)
+            db = catalogdb.open_catalog(self.db_name)
             try:
                 del db[self.current_obj_name]
                 self.master.edit_message.set("Object deleted successfully.")
@@ -657,7 +663,7 @@ class AddPMComboVectorFrame(ttk.Frame):
 
         # Create "spreadsheet" of entries
         if self.master.mode == 'edit':
-            db = shelve.open(self.master.db_location+self.master.db_name)
+            db = catalogdb.open_catalog(self.master.db_name)
             for obj_name in db.keys():
                 if obj_name == self.master.current_obj_name:
                     self.obj_for_edit = db[obj_name]
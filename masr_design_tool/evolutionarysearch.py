@@ -0,0 +1,358 @@
+from collections import namedtuple
+
+import numpy as np
+
+import alternatives_new
+import batchsizing
+from battery import BatteryVoltageIndex
+
+"""
+This module contains an NSGA-II style multi-objective search over the (platform, prop/motor combo, battery, print
+material) design space. It is meant for catalogs that are too large for the full factorial search in
+alternatives_new.generate_alternatives: only the designs the search visits are sized, so the cost depends on the
+population size and the number of generations rather than on the size of the Cartesian product.
+
+A design is a genome of four integer genes:
+
+    platform - index into the list of vehicle class names searched
+    pmcombo  - index into the prop/motor combos that have at least one compatible battery
+    battery  - index into the batteries compatible with that prop/motor combo (same 0.1 V pre-filter as always, see
+               battery.BatteryVoltageIndex), so every genome is a triple generate_alternatives would also have sized
+    pmaterial - index into the selected print materials
+
+Each generation is sized with the platform batch_is_feasible models in one call per platform (these give the same
+verdicts as the is_feasible methods), and every genome that has been sized is memoized, so a design is never sized
+twice. Infeasible designs are always ranked behind feasible ones, the ones that got further through the feasibility
+checks first. The best designs found so far are kept in a Pareto archive and the progress of the search is reported
+as the hypervolume the archive dominates.
+"""
+
+# The columns of batchsizing.BatchResult.performance and whether each is to be maximized or minimized
+performance_attrs = ['weight', 'payload', 'endurance', 'max_dim', 'build_time']
+performance_directions = ['low', 'high', 'high', 'low', 'low']
+
+# Progress of the search after each generation. hypervolume is the fraction of the reference box (see
+# EvolutionarySearch.hypervolume) dominated by the archive.
+GenerationStats = namedtuple('GenerationStats', ['generation', 'evaluations', 'feasible', 'archive_size',
+                                                 'hypervolume'])
+
+
+class GenomeSpace(object):
+    """
+    Maps genomes (rows of an integer array with the columns platform, pmcombo, battery, pmaterial) to the triples of a
+    batchsizing.ComponentMatrix. The matrix does not need its compatible pairs (see ComponentMatrix), only the
+    compatible battery window of each prop/motor combo is kept.
+    """
+    def __init__(self, matrix, platforms):
+        self.matrix = matrix
+        self.platforms = list(platforms)
+        self.platform_classes = [getattr(__import__(platform.lower()), platform) for platform in self.platforms]
+        bat_index = BatteryVoltageIndex(matrix.batteries, voltages=matrix.bat_voltage)
+        windows = np.array([bat_index.compatible_window(volt) for volt in matrix.test_bat_volt], dtype=int)
+        windows = windows.reshape(-1, 2)
+        usable = windows[:, 1] > windows[:, 0]
+        self.bat_order = np.array(bat_index.positions, dtype=int)
+        self.pmcombos = np.flatnonzero(usable)
+        self.bat_start = windows[usable, 0]
+        self.bat_count = windows[usable, 1] - windows[usable, 0]
+        self.n_pmaterials = len(matrix.pmat_density)
+
+    def size(self):
+        """
+        Returns the number of designs in the space, i.e. the number of alternatives a full factorial search would size.
+        """
+        return int(self.bat_count.sum()) * self.n_pmaterials * len(self.platforms)
+
+    def random(self, n, rng):
+        genomes = np.empty((n, 4), dtype=int)
+        genomes[:, 0] = rng.randint(len(self.platforms), size=n)
+        genomes[:, 1] = rng.randint(len(self.pmcombos), size=n)
+        genomes[:, 2] = rng.randint(np.iinfo(np.int32).max, size=n)
+        genomes[:, 3] = rng.randint(self.n_pmaterials, size=n)
+        return self.canonical(genomes)
+
+    def canonical(self, genomes):
+        """
+        Wraps the battery gene of each genome into the compatible battery window of its prop/motor combo. Crossover and
+        mutation may give a genome a battery gene that was meant for another prop/motor combo.
+        """
+        genomes[:, 2] %= self.bat_count[genomes[:, 1]]
+        return genomes
+
+    def triples(self, genomes):
+        """
+        Returns the (pmcombo, battery, pmaterial) index arrays into the matrix components for the rows of 'genomes'.
+        """
+        pm = self.pmcombos[genomes[:, 1]]
+        bat = self.bat_order[self.bat_start[genomes[:, 1]] + genomes[:, 2]]
+        return pm, bat, genomes[:, 3]
+
+    def vehicle(self, genome, outcome):
+        """
+        Builds the vehicle object of one genome from its memoized (reason, fail value, performance, geometry) outcome,
+        the same way batchsizing.BatchResult.vehicle does.
+        """
+        pm, bat, mat = [int(indices[0]) for indices in self.triples(np.array([genome]))]
+        this_vehicle = self.platform_classes[genome[0]](self.matrix.pmcombos[pm], self.matrix.batteries[bat],
+                                                        self.matrix.pmaterials[mat])
+        reason, fail_value, performance, geometry = outcome
+        if reason != 0:
+            this_vehicle.feasible = (batchsizing.fail_reasons[reason], None if np.isnan(fail_value) else fail_value)
+        else:
+            this_vehicle.set_performance(list(performance))
+            this_vehicle.set_geometry(list(geometry))
+        return this_vehicle
+
+
+class EvolutionarySearch(object):
+    """
+    NSGA-II search of the designs of 'matrix' (a batchsizing.ComponentMatrix, which may be made with pair=False) on the
+    vehicle class names in 'platforms' for the requirements in 'constraints' (the same list generate_alternatives is
+    given). The objectives are the five columns of the sizing model performance output (see performance_attrs).
+
+    Each generation, population_size children are made from the population by binary tournament selection, uniform
+    crossover (with probability crossover_rate) and random resetting of each gene (with probability mutation_rate, by
+    default one gene in four). The children and the population are then ranked together, by constrained Pareto front
+    and then by crowding distance, and the best population_size distinct genomes survive.
+
+    The archive holds the non-dominated feasible designs of every genome sized so far. Its hypervolume is measured in a
+    box between the 'reference' point (performance values in the stored units; by default slightly worse than the worst
+    archive member when the archive is first filled) and a point as far beyond the best archive member at that time.
+    The box is kept fixed from then on so the values of different generations can be compared. The hypervolume is
+    estimated with hv_samples fixed random points.
+    """
+    def __init__(self, matrix, constraints, platforms=None, population_size=100, crossover_rate=0.9,
+                 mutation_rate=0.25, reference=None, hv_samples=20000, seed=None):
+        if platforms is None:
+            platforms = ['Quadmultipiece']
+        self.space = GenomeSpace(matrix, platforms)
+        self.constraints = constraints
+        self.population_size = population_size
+        self.crossover_rate = crossover_rate
+        self.mutation_rate = mutation_rate
+        self.reference = reference
+        self.hv_samples = hv_samples
+        self.rng = np.random.RandomState(seed)
+        self.signs = np.array([-1.0 if direction == 'high' else 1.0 for direction in performance_directions])
+
+        # Memo of every genome sized so far: {genome tuple: (reason, fail value, performance, geometry)}
+        self.memo = {}
+        self.generation = 0
+        self.population = np.empty((0, 4), dtype=int)
+        self.archive = []
+        self.archive_values = np.empty((0, len(performance_attrs)))
+        self.box = None
+        self.hv_points = None
+        self.history = []
+
+    def evaluate(self, genomes):
+        """
+        Sizes the rows of 'genomes' that are not in the memo yet, with one batch_is_feasible call per platform, and
+        returns the (reason, performance) arrays of all of the rows. The new feasible designs are added to the archive.
+        """
+        keys = [tuple(genome) for genome in genomes.tolist()]
+        new = sorted(set(key for key in keys if key not in self.memo))
+        if new:
+            new_genomes = np.array(new, dtype=int)
+            for k, platform_cls in enumerate(self.space.platform_classes):
+                rows = np.flatnonzero(new_genomes[:, 0] == k)
+                if not len(rows):
+                    continue
+                view = self.space.matrix.select(*self.space.triples(new_genomes[rows]))
+                result = platform_cls.batch_is_feasible(view, self.constraints)
+                for i, row in enumerate(rows.tolist()):
+                    self.memo[new[row]] = (int(result.reason[i]), float(result.fail_value[i]),
+                                           tuple(result.performance[i].tolist()), tuple(result.geometry[i].tolist()))
+            self._update_archive([key for key in new if self.memo[key][0] == 0])
+
+        reason = np.array([self.memo[key][0] for key in keys], dtype=int)
+        performance = np.array([self.memo[key][2] for key in keys], dtype=float)
+        performance = performance.reshape(-1, len(performance_attrs))
+        return reason, performance
+
+    def _update_archive(self, keys):
+        if not keys:
+            return
+        candidates = self.archive + keys
+        values = np.vstack([self.archive_values, [self.memo[key][2] for key in keys]])
+        on_front = alternatives_new.pareto_mask(values, performance_directions)
+        self.archive = [key for key, keep in zip(candidates, on_front.tolist()) if keep]
+        self.archive_values = values[on_front]
+
+    def rank(self, reason, performance):
+        """
+        Returns the (front, crowding distance) arrays used to order the rows. Feasible rows are sorted into Pareto
+        fronts 1, 2, ... and infeasible rows come after the last feasible front, in order of how far through the
+        feasibility checks they got (the order of batchsizing.fail_reasons). Infeasible rows have a crowding distance
+        of 0.
+        """
+        n = len(reason)
+        fronts = np.zeros(n, dtype=int)
+        crowding = np.zeros(n)
+        feasible = np.flatnonzero(reason == 0)
+        n_fronts = 0
+        if len(feasible):
+            fronts[feasible] = alternatives_new.front_ranks(performance[feasible], performance_directions)
+            n_fronts = fronts[feasible].max()
+            for front in xrange(1, n_fronts + 1):
+                members = feasible[fronts[feasible] == front]
+                crowding[members] = crowding_distance(performance[members])
+        infeasible = reason != 0
+        fronts[infeasible] = n_fronts + len(batchsizing.fail_reasons) - reason[infeasible]
+        return fronts, crowding
+
+    def _tournament(self, fronts, crowding, n):
+        first = self.rng.randint(len(fronts), size=n)
+        second = self.rng.randint(len(fronts), size=n)
+        second_wins = (fronts[second] < fronts[first]) | ((fronts[second] == fronts[first]) &
+                                                          (crowding[second] > crowding[first]))
+        return np.where(second_wins, second, first)
+
+    def offspring(self, fronts, crowding):
+        """
+        Returns population_size children of the current population.
+        """
+        n = self.population_size
+        parents = self.population[self._tournament(fronts, crowding, 2*n)]
+        mothers, fathers = parents[:n], parents[n:]
+        swap = self.rng.rand(n, 4) < 0.5
+        swap &= (self.rng.rand(n) < self.crossover_rate)[:, None]
+        children = np.where(swap, fathers, mothers)
+        mutate = self.rng.rand(n, 4) < self.mutation_rate
+        resets = self.space.random(n, self.rng)
+        children[mutate] = resets[mutate]
+        return self.space.canonical(children)
+
+    def step(self):
+        """
+        Runs one generation (the first call sizes a random initial population) and returns its GenerationStats.
+        """
+        if not len(self.population):
+            self.population = self.space.random(self.population_size, self.rng)
+            self.evaluate(self.population)
+        else:
+            fronts, crowding = self.rank(*self.evaluate(self.population))
+            pool = np.vstack([self.population, self.offspring(fronts, crowding)])
+            # Drop duplicate genomes so that copies of a good design can not crowd out the rest of the population
+            _, first = np.unique(pool.view([('', pool.dtype)] * pool.shape[1]), return_index=True)
+            pool = pool[np.sort(first)]
+            fronts, crowding = self.rank(*self.evaluate(pool))
+            survivors = np.lexsort((-crowding, fronts))[:self.population_size]
+            self.population = pool[np.sort(survivors)]
+            self.generation += 1
+
+        n_feasible = sum(1 for outcome in self.memo.itervalues() if outcome[0] == 0)
+        stats = GenerationStats(self.generation, len(self.memo), n_feasible, len(self.archive), self.hypervolume())
+        self.history.append(stats)
+        return stats
+
+    def run(self, generations=50, callback=None):
+        """
+        Runs the initial population and 'generations' more generations, calling callback(stats) with the
+        GenerationStats of each one, and returns the archive vehicles (see vehicles()).
+        """
+        for _ in xrange(generations + 1 if not len(self.population) else generations):
+            stats = self.step()
+            if callback is not None:
+                callback(stats)
+        return self.vehicles()
+
+    def hypervolume(self):
+        """
+        Returns the estimated fraction of the reference box (see the class docstring) dominated by the archive, or 0.0
+        while the archive is empty.
+        """
+        if not self.archive:
+            return 0.0
+        values = self.archive_values * self.signs
+        if self.box is None:
+            best, worst = values.min(axis=0), values.max(axis=0)
+            if self.reference is not None:
+                worst = np.asarray(self.reference, dtype=float) * self.signs
+            span = np.where(worst > best, worst - best, np.maximum(np.abs(worst), 1.0))
+            self.box = best - span, worst + 0.1*span
+            self.hv_points = np.random.RandomState(0).rand(self.hv_samples, len(performance_attrs))
+        lower, upper = self.box
+        return hypervolume_fraction((values - lower) / (upper - lower), self.hv_points)
+
+    def vehicles(self):
+        """
+        Returns the vehicle objects of the archive designs.
+        """
+        return [self.space.vehicle(key, self.memo[key]) for key in self.archive]
+
+    def store(self):
+        """
+        Returns an alternatives_new.AlternativeStore of the designs sized so far, so that the outcome can be shown the
+        same way as that of a full factorial search. Its feasible list only holds the archive vehicles, while its stats
+        count every design that was sized. The infeasible designs are stored as compact rows.
+        """
+        store = alternatives_new.AlternativeStore(self.space.matrix, self.space.platforms)
+        store.feasible = self.vehicles()
+        failed = sorted(key for key, outcome in self.memo.iteritems() if outcome[0] != 0)
+        genomes = np.array(failed, dtype=int).reshape(-1, 4)
+        for k in xrange(len(self.space.platforms)):
+            rows = np.flatnonzero(genomes[:, 0] == k)
+            pm, bat, mat = self.space.triples(genomes[rows])
+            store.add_failures(k, pm, bat, mat, [self.memo[failed[row]][0] for row in rows],
+                               [self.memo[failed[row]][1] for row in rows])
+        store.stats.n_feasible = len(self.memo) - len(failed)
+        store.stats.n_alternatives += store.stats.n_feasible
+        return store
+
+
+def crowding_distance(values):
+    """
+    Returns the NSGA-II crowding distance of each row of the (designs x objectives) array 'values': the sum over the
+    objectives of the gap between the neighbours of the row when sorted on that objective, divided by the range of the
+    objective. The rows at either end of any objective get an infinite distance.
+    """
+    n, n_objectives = values.shape
+    distance = np.zeros(n)
+    if n < 3:
+        distance[:] = np.inf
+        return distance
+    for j in xrange(n_objectives):
+        order = np.argsort(values[:, j], kind='mergesort')
+        column = values[order, j]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        spread = column[-1] - column[0]
+        if spread > 0:
+            distance[order[1:-1]] += (column[2:] - column[:-2]) / spread
+    return distance
+
+
+def hypervolume_fraction(points, samples):
+    """
+    Monte Carlo estimate of the fraction of the unit box [0, 1]^d dominated (in the minimization sense) by the rows of
+    'points', using the (samples x d) array of uniform random points 'samples'.
+    """
+    covered = np.zeros(len(samples), dtype=bool)
+    for point in points:
+        covered |= (samples >= point).all(axis=1)
+    return covered.mean()
+
+
+def design_space_size(constraints, platforms=None):
+    """
+    Returns the number of designs a search on the vehicle class names in 'platforms' for the requirements in
+    'constraints' would cover, i.e. the number of alternatives the full factorial search would size. Only the catalog
+    snapshots are read, so this is quick even for a large catalog.
+    """
+    if platforms is None:
+        platforms = ['Quadmultipiece']
+    return GenomeSpace(alternatives_new.snapshot_matrix(constraints[-2], pair=False), platforms).size()
+
+
+def search_alternatives(constraints, platforms=None, generations=50, population_size=100, seed=None, callback=None):
+    """
+    Runs an EvolutionarySearch on the prop/motor combos and batteries in the databases and the print materials selected
+    in 'constraints', and returns the vehicle objects of the non-dominated feasible designs it found (in the same form
+    as the feasible alternatives of generate_alternatives) and the search itself, whose history attribute holds the
+    GenerationStats of every generation.
+    """
+    matrix = alternatives_new.snapshot_matrix(constraints[-2], pair=False)
+    search = EvolutionarySearch(matrix, constraints, platforms, population_size, seed=seed)
+    if not len(search.space.pmcombos) or not search.space.n_pmaterials:
+        return [], search
+    return search.run(generations, callback), search
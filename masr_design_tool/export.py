@@ -4,7 +4,7 @@ except ImportError:
     from tkinter import *
 import ttk
 import tkFileDialog
-import shelve
+import catalogdb
 import csv
 from winplace import get_win_place
 from collections import OrderedDict
@@ -67,7 +67,7 @@ class Exportdb(Toplevel):
 
         # Loop through selected databases and save to a .csv file located at dirname/db_name.csv
         for db_name in selected_names:
-            this_db = shelve.open(db_location + db_name)
+            this_db = catalogdb.open_catalog(db_name)
             class_name = db_name[:-2].capitalize()
             attr_names = getattr(__import__(class_name.lower()), class_name).real_attr_names
             pretty_attr_dict = getattr(__import__(class_name.lower()), class_name).pretty_attr_dict
@@ -0,0 +1,339 @@
+try:
+    from Tkinter import *
+except ImportError:
+    from tkinter import *
+import ttk
+import tkFileDialog
+import catalogdb
+import csv
+import json
+import re
+from winplace import get_win_place
+from collections import OrderedDict, namedtuple
+import tools
+
+"""
+This module contains the bulk importer for the component databases. Components are read from a CSV file (one row per
+component, with a header row) or a JSON file (a list of objects), checked with the process_input rules of their class
+and written to the database a batch at a time.
+
+The columns are named after the attributes of the class: either the names shown in the database window (e.g.,
+'Weight') or the attribute names (e.g., 'weight'), in any case. The unit of a column is given in parentheses (e.g.,
+'Weight (lbf)') and defaults to the first unit of the attribute (the standard metric unit), so the CSV files written by
+Exportdb can be imported again as they are.
+
+Prop/motor combo test data is given one test point per row, with 'Motor' and 'Propeller' columns holding the names of a
+motor and a propeller in their databases, a 'Test Battery Voltage (V)' column and the columns of the prop/motor combo
+spreadsheet ('Current (A)', 'Voltage (V)', 'Power (W)', 'RPM', 'Throttle', 'Thrust (N)'). The rows of a combo are
+grouped by motor and propeller. In a JSON file a combo may also be a single object whose test data values are lists.
+"""
+
+# Database names and classes of the components that can be imported
+importable = OrderedDict([('batterydb', 'Battery'), ('motordb', 'Motor'), ('propellerdb', 'Propeller'),
+                          ('sensordb', 'Sensor'), ('propmotorcombodb', 'Propmotorcombo')])
+
+# A problem with the input file. row is the row number of the offending component in the file (the line number for CSV
+# files, the position in the list for JSON files), or 0 for problems with the file itself.
+RowError = namedtuple('RowError', ['row', 'message'])
+
+# Exceptions raised by process_input (and the conversions it makes) for bad input
+input_errors = (ValueError, TypeError, KeyError, tools.ConversionError)
+
+
+def import_components(db_name, filename, overwrite=False, skip_invalid=False, batch_size=1000, path=None):
+    """
+    Imports the components in the CSV or JSON file 'filename' into the database 'db_name' (one of the keys of
+    'importable') of the catalog file at 'path' (by default catalogdb.catalog_file).
+
+    Every row is checked before anything is written, and all problems are returned at once. If there are any, nothing is
+    imported unless skip_invalid is True, in which case the valid rows are. Components whose name is already in the
+    database are problems unless overwrite is True. The components are written batch_size at a time, one transaction per
+    batch.
+
+    Returns the number of components written and the list of RowErrors.
+    """
+    try:
+        records = read_records(filename)
+    except (IOError, ValueError, csv.Error) as e:
+        return 0, [RowError(0, "Could not read %s: %s" % (filename, e))]
+    components, errors = build_components(db_name, records, path)
+
+    db = catalogdb.open_catalog(db_name, path)
+    try:
+        if not overwrite:
+            kept = []
+            for row, obj in components:
+                if obj.name in db:
+                    errors.append(RowError(row, "'%s' is already in the database." % obj.name))
+                else:
+                    kept.append((row, obj))
+            components = kept
+        errors.sort()
+        if errors and not skip_invalid:
+            return 0, errors
+        for start in xrange(0, len(components), batch_size):
+            db.update((obj.name, obj) for _, obj in components[start:start+batch_size])
+    finally:
+        db.close()
+    return len(components), errors
+
+
+def read_records(filename):
+    """
+    Returns the list of (row number, {column: value}) pairs of the components in the CSV or JSON file 'filename'. Empty
+    values are left out.
+    """
+    records = []
+    if filename.lower().endswith('.json'):
+        with open(filename, 'rb') as json_file:
+            data = json.load(json_file)
+        if not isinstance(data, list) or not all(isinstance(record, dict) for record in data):
+            raise ValueError("a JSON file must hold a list of objects")
+        for row, record in enumerate(data, 1):
+            records.append((row, dict((_as_str(column), _as_str(value)) for column, value in record.items()
+                                      if value not in (None, '', []))))
+    else:
+        with open(filename, 'rb') as csv_file:
+            reader = csv.reader(csv_file, dialect='excel')
+            header = [column.strip() for column in next(reader, [])]
+            if header:
+                # Byte order mark written by Excel
+                header[0] = header[0].lstrip('\xef\xbb\xbf')
+            for values in reader:
+                record = dict((column, value.strip()) for column, value in zip(header, values) if value.strip())
+                if record:
+                    records.append((int(reader.line_num), record))
+    return records
+
+
+def _as_str(value):
+    """
+    JSON strings are read as unicode. Names are kept as str everywhere else, so convert them (and lists of them).
+    """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, list):
+        return [_as_str(val) for val in value]
+    return value
+
+
+def build_components(db_name, records, path=None):
+    """
+    Creates the component objects of the database 'db_name' from the records returned by read_records. Returns the list
+    of (row number, object) pairs of the valid components and the list of RowErrors of the others.
+    """
+    class_name = importable[db_name]
+    cls = getattr(__import__(class_name.lower()), class_name)
+    if class_name == 'Propmotorcombo':
+        return _build_pmcombos(cls, records, path)
+
+    fields = [([key, key.split(' (')[0], cls.real_attr_names[i]], units)
+              for i, (key, units) in enumerate(cls.pretty_attr_dict.items())]
+    columns, errors = _match_columns(fields, records)
+    components = []
+    names = {}
+    for row, record in records:
+        # Same form as the attribute lists built from the entries of AddObjectWindow
+        attr_list = [[None, units[0]] if units else [None] for _, units in fields]
+        for column, value in record.items():
+            index, unit = columns[column]
+            if index is not None:
+                attr_list[index] = [value, unit] if unit else [value]
+        try:
+            obj = cls(attr_list)
+        except input_errors as e:
+            errors.append(RowError(row, str(e)))
+            continue
+        if obj.name in names:
+            errors.append(RowError(row, "'%s' is also on row %d." % (obj.name, names[obj.name])))
+            continue
+        names[obj.name] = row
+        components.append((row, obj))
+    return components, errors
+
+
+def _match_columns(fields, records):
+    """
+    Matches the columns used in 'records' to 'fields', a list of (list of names, list of units) with one entry per
+    attribute. Returns a dictionary of {column: (attribute index, unit)} and the list of RowErrors of the columns that
+    do not match any attribute or have an unknown unit (whose index is None, so that they are ignored).
+    """
+    labels = {}
+    for index, (names, _) in enumerate(fields):
+        for name in names:
+            labels[name.lower()] = index
+    columns = {}
+    errors = []
+    for column in sorted(set(column for _, record in records for column in record)):
+        index = labels.get(column.strip().lower())
+        unit = fields[index][1][0] if index is not None and fields[index][1] else None
+        match = re.match(r'^(.*?)\s*\(([^()]*)\)$', column.strip())
+        if index is None and match is not None and match.group(1).lower() in labels:
+            # The column name gives the unit
+            index = labels[match.group(1).lower()]
+            unit = dict((unit.lower(), unit) for unit in fields[index][1]).get(match.group(2).strip().lower())
+            if unit is None:
+                errors.append(RowError(0, "Unknown unit in column '%s', the units are %s." %
+                                       (column, ', '.join(fields[index][1]) or 'none')))
+                index = None
+        elif index is None:
+            errors.append(RowError(0, "Column '%s' does not match any attribute." % column))
+        columns[column] = (index, unit)
+    return columns, errors
+
+
+def _build_pmcombos(cls, records, path=None):
+    """
+    build_components for the prop/motor combo test data. The rows are grouped by motor and propeller, and each group is
+    turned into one combo with the same attribute list AddEditPMComboWindow makes.
+    """
+    fields = [(['Motor'], []), (['Propeller', 'Prop'], []), (['Test Battery Voltage', 'test_bat_volt_rating'], ['V'])]
+    fields += [([key, key.split(' (')[0]], units) for key, units in cls.add_obj_header_dict.items()]
+    # The combo name and maximum thrust (written by Exportdb) follow from the other columns
+    fields += [(['Motor/Propeller', 'name', 'Max Thrust', 'max_thrust'], [])]
+    columns, errors = _match_columns(fields, records)
+    motor_db = catalogdb.load_catalog('motordb', path)
+    prop_db = catalogdb.load_catalog('propellerdb', path)
+
+    groups = OrderedDict()
+    for row, record in records:
+        values = [[] for _ in fields]
+        units = set()
+        for column, value in record.items():
+            index, unit = columns[column]
+            if index is not None and index < len(fields) - 1:
+                values[index] += value if isinstance(value, list) else [value]
+                if index == len(fields) - 2:
+                    units.add(unit)
+        if len(values[0]) != 1 or len(values[1]) != 1:
+            errors.append(RowError(row, "A prop/motor combo row must have one motor and one propeller."))
+            continue
+        group = groups.setdefault((values[0][0], values[1][0]), {'row': row, 'values': [[] for _ in fields],
+                                                                 'units': set()})
+        for index in xrange(2, len(fields) - 1):
+            group['values'][index] += values[index]
+        group['units'] |= units
+
+    components = []
+    for (motor_name, prop_name), group in groups.items():
+        row, values = group['row'], group['values']
+        if motor_name not in motor_db:
+            errors.append(RowError(row, "Motor '%s' is not in the motor database." % motor_name))
+            continue
+        if prop_name not in prop_db:
+            errors.append(RowError(row, "Propeller '%s' is not in the propeller database." % prop_name))
+            continue
+        if len(group['units']) > 1:
+            errors.append(RowError(row, "The thrust of %s/%s is given in more than one unit." % (motor_name,
+                                                                                                 prop_name)))
+            continue
+        try:
+            test_volts = set(float(volt) for volt in values[2])
+            if len(test_volts) != 1:
+                raise ValueError("%s/%s must have one test battery voltage." % (motor_name, prop_name))
+            vectors = [[float(val) for val in values[index]] for index in xrange(3, len(fields) - 1)]
+            if not vectors[-1] or len(vectors[0]) != len(vectors[-1]):
+                raise ValueError("%s/%s must have the same (non-zero) number of current and thrust values." %
+                                 (motor_name, prop_name))
+            thrust_unit = group['units'].pop() if group['units'] else fields[-2][1][0]
+            attr_list = [[motor_db[motor_name]], [prop_db[prop_name]], [test_volts.pop()]] + vectors[:-1] + \
+                        [[vectors[-1], thrust_unit]]
+            components.append((row, cls(attr_list)))
+        except input_errors as e:
+            errors.append(RowError(row, str(e)))
+    return components, errors
+
+
+class Importdb(Toplevel):
+    """
+    Window for importing a CSV or JSON file of components into one of the databases (see import_components).
+    """
+    def __init__(self, master):
+        Toplevel.__init__(self, master)
+        self.master = master
+        self.title("Import Components")
+        self.resizable(width=FALSE, height=FALSE)
+        self.lift()
+
+        # Place window
+        xpos, ypos = get_win_place(self)
+        self.geometry('+%d+%d' % (xpos, ypos))
+
+        self.mainframe = ttk.Frame(self, padding=5)
+        self.mainframe.pack()
+
+        # Create header label, database combobox and file selection widgets
+        self.header_label = ttk.Label(self.mainframe, text='Select the database and the CSV or JSON file to import.',
+                                      wraplength=300)
+        self.db_dict = OrderedDict((comp_name, db_name) for comp_name, db_name in
+                                   zip(self.master.components, self.master.db_names) if db_name in importable)
+        self.db_cb = ttk.Combobox(self.mainframe, state='readonly', values=self.db_dict.keys())
+        self.db_cb.current(0)
+        self.file_frame = ttk.Frame(self.mainframe)
+        self.filename = StringVar()
+        self.file_entry = ttk.Entry(self.file_frame, textvariable=self.filename, width=35)
+        self.browse_button = ttk.Button(self.file_frame, text='Browse', command=self.browse)
+        self.overwrite_var = IntVar()
+        self.overwrite_check = ttk.Checkbutton(self.mainframe, text='Overwrite components already in the database',
+                                               variable=self.overwrite_var)
+        self.skip_var = IntVar()
+        self.skip_check = ttk.Checkbutton(self.mainframe, text='Import the valid rows if some rows have errors',
+                                          variable=self.skip_var)
+
+        # Create message label, error list, and import and close buttons
+        self.messagevar = StringVar()
+        self.info_label = ttk.Label(self.mainframe, textvar=self.messagevar, wraplength=300)
+        self.error_frame = ttk.Frame(self.mainframe)
+        self.error_text = Text(self.error_frame, width=50, height=10, wrap='word', state=DISABLED)
+        self.error_scroll = ttk.Scrollbar(self.error_frame, orient=VERTICAL, command=self.error_text.yview)
+        self.error_text['yscrollcommand'] = self.error_scroll.set
+        self.button_frame = ttk.Frame(self.mainframe)
+        self.impt_button = ttk.Button(self.button_frame, text='Import', command=self.import_file)
+        self.close_button = ttk.Button(self.button_frame, text='Close', command=self.destroy)
+
+        # Pack widgets
+        self.header_label.pack(expand=YES, padx=15, pady=5)
+        self.db_cb.pack(padx=15, pady=5)
+        self.file_entry.pack(side=LEFT)
+        self.browse_button.pack(side=LEFT, padx='5 0')
+        self.file_frame.pack(padx=15, pady=5)
+        self.overwrite_check.pack(padx=15, pady='5 2', anchor=W)
+        self.skip_check.pack(padx=15, pady='2 5', anchor=W)
+        self.info_label.pack(padx=15, pady='3 5')
+        self.error_text.pack(side=LEFT)
+        self.error_scroll.pack(side=LEFT, fill=Y)
+        self.error_frame.pack(padx=15, pady=5)
+        self.close_button.pack(side=RIGHT)
+        self.impt_button.pack(side=RIGHT)
+        self.button_frame.pack(fill=X)
+
+        self.protocol('WM_DELETE_WINDOW', self.destroy)
+
+    def browse(self):
+        file_opt = {'parent': self, 'title': 'Choose file to import.',
+                    'filetypes': [('CSV or JSON', '*.csv *.json'), ('All files', '*')]}
+        filename = tkFileDialog.askopenfilename(**file_opt)
+        self.lift()
+        if filename:
+            self.filename.set(filename)
+
+    def import_file(self):
+        if not self.filename.get():
+            self.messagevar.set("Choose a file to import.")
+            return
+        db_name = self.db_dict[self.db_cb.get()]
+        n_imported, errors = import_components(db_name, self.filename.get(), bool(self.overwrite_var.get()),
+                                               bool(self.skip_var.get()))
+        if errors and not n_imported:
+            self.messagevar.set("No components imported, %d problem(s) found." % len(errors))
+        else:
+            self.messagevar.set("%d component(s) imported, %d problem(s) found." % (n_imported, len(errors)))
+        self.error_text['state'] = NORMAL
+        self.error_text.delete('1.0', END)
+        for error in errors:
+            self.error_text.insert(END, ('Row %d: %s\n' % error) if error.row else (error.message + '\n'))
+        self.error_text['state'] = DISABLED
+
+        # Show new sensors in the main window
+        if n_imported and db_name == 'sensordb':
+            self.master.master.sensor_frame.refresh()
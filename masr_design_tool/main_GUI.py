@@ -7,7 +7,7 @@ except ImportError:
 import csv
 import os
 import subprocess
-import shelve
+import catalogdb
 import sys
 import tkFileDialog
 import tkFont
@@ -17,7 +17,9 @@ from collections import OrderedDict
 import alternatives_new
 import dblocation
 import dbmanagement
+import evolutionarysearch
 import export
+import importdb
 import tradespace
 import buildmodel
 from tools import convert_unit
@@ -87,6 +89,12 @@ class VehicleReqFrame(ttk.Frame):
         self.weights = OrderedDict([('max_endurance', [50, 'high']), ('max_payload', [50, 'high']),
                                     ('weight', [50, 'low']), ('max_dimension', [50, 'low']),
                                     ('build_time', [50, 'low'])])
+        # Grid resolution of each performance attribute for the epsilon-Pareto archive (see alternatives_new.
+        # epsilon_archive), in the units the vehicle attributes are stored in. Designs closer than this in every
+        # attribute are treated as duplicates when only the archive is shown.
+        self.resolutions = OrderedDict([('max_endurance', [1.0, 'min']), ('max_payload', [0.5, 'N']),
+                                        ('weight', [0.5, 'N']), ('max_dimension', [0.01, 'm']),
+                                        ('build_time', [0.5, 'hr'])])
 
         # Create subframes
         self.constraints_frame = ttk.Frame(self)
@@ -174,6 +182,11 @@ class VehicleReqFrame(ttk.Frame):
                                             command=self.set_weightings)
         self.weightings_button.pack()
 
+        # Create epsilon-Pareto archive resolution button
+        self.resolutions_button = ttk.Button(self.wgt_frame, text='Set Pareto Resolution',
+                                             command=self.set_resolutions)
+        self.resolutions_button.pack()
+
         # Pack subframes
         self.constraints_frame.pack(fill=BOTH, expand=YES)
         self.wgt_frame.pack(fill=BOTH, expand=YES)
@@ -251,6 +264,88 @@ class VehicleReqFrame(ttk.Frame):
         self.wait_window(weight_window)
 
 
+    def set_resolutions(self):
+        """
+        Opens a ResolutionsWindow in which the user can set the resolution of each performance attribute for the
+        epsilon-Pareto archive. The values in 'self.resolutions' are updated when the user saves.
+        """
+        requirements = ['Endurance', 'Payload', 'Weight', 'Size', 'Build time']
+        resolution_window = ResolutionsWindow(self, requirements)
+        self.wait_window(resolution_window)
+
+
+class ResolutionsWindow(Toplevel):
+    """
+    The input 'requirements' is a list of pretty names of the performance attributes in 'self.master.resolutions'. This
+    toplevel window lets the user set the grid resolution of each attribute used for the epsilon-Pareto archive shown
+    on the main GUI.
+    """
+
+    def __init__(self, master, requirements):
+        Toplevel.__init__(self, master)
+        self.master = master
+        self.title("Set Pareto Resolution")
+        self.resizable(width=FALSE, height=FALSE)
+
+        # Place window
+        xpos, ypos = get_win_place(self)
+        self.geometry('+%d+%d' % (xpos, ypos))
+
+        # Create subframes
+        self.mainframe = ttk.Frame(self, padding='12 0 5 15')
+        self.button_frame = ttk.Frame(self)
+
+        self.main_label = ttk.Label(self.mainframe,
+                                    text='Designs closer than these values in every attribute are treated as one.')
+        self.main_label.grid(column=0, row=0, columnspan=3, padx=10, pady='15 10')
+
+        self.resolution_vars = []
+        for row, (req, (value, unit)) in enumerate(zip(requirements, self.master.resolutions.values()), start=1):
+            req_label = ttk.Label(self.mainframe, text=req)
+            req_var = DoubleVar()
+            req_var.set(value)
+            req_entry = ttk.Entry(self.mainframe, textvariable=req_var, width=7)
+            unit_label = ttk.Label(self.mainframe, text=unit)
+            req_label.grid(column=0, row=row, sticky=W, padx=5, pady='10 0')
+            req_entry.grid(column=1, row=row, sticky=W, pady='10 0')
+            unit_label.grid(column=2, row=row, sticky=W, padx='2 5', pady='10 0')
+            self.resolution_vars.append(req_var)
+
+        self.info_var = StringVar()
+        self.info_label = ttk.Label(self.mainframe, textvariable=self.info_var)
+        self.info_label.grid(column=0, row=len(requirements)+1, columnspan=3, pady='10 0')
+
+        # Create widgets in button frame
+        self.save_button = ttk.Button(self.button_frame, text='Save', command=self.save_resolutions)
+        self.cancel_button = ttk.Button(self.button_frame, text='Cancel', command=self.destroy)
+        self.cancel_button.pack(side=RIGHT)
+        self.save_button.pack(side=RIGHT)
+
+        # Pack frames
+        self.mainframe.pack(fill=BOTH, expand=YES)
+        self.button_frame.pack(fill=X)
+
+        self.protocol('WM_DELETE_WINDOW', self.destroy)
+
+    def save_resolutions(self):
+        """
+        Saves the user selected values to the self.master.resolutions dictionary variable, closes the window and
+        refreshes the alternatives sheet in case the archive is shown.
+        """
+        try:
+            values = [float(var.get()) for var in self.resolution_vars]
+        except (ValueError, TclError):
+            self.info_var.set('Resolutions must be numbers.')
+            return
+        if min(values) <= 0:
+            self.info_var.set('Resolutions must be greater than zero.')
+            return
+        for value, val_list in zip(values, self.master.resolutions.values()):
+            val_list[0] = value
+        self.destroy()
+        self.master.master.alternatives_frame.rescore()
+
+
 class WeightingsWindow(Toplevel):
     """
         The input 'requirements'  is a list of strings containing vehicle requirement names. (See set_weightings()
@@ -327,12 +422,15 @@ class WeightingsWindow(Toplevel):
 
     def save_weights(self):
         """
-        Saves the user selected values to the self.master.weights dictionary variable and closes the window.
+        Saves the user selected values to the self.master.weights dictionary variable, closes the window and re-ranks
+        the feasible alternatives on the main GUI.
         """
         weight_vals = [var.get() for var in self.weightings_vars]
         for i, val_list in enumerate(self.master.weights.values()):
             val_list[0] = weight_vals[i]
         self.destroy()
+        # Re-rank the alternatives that are already displayed. This does not regenerate the alternatives.
+        self.master.master.alternatives_frame.rescore()
 
 
 class SensorFrame(ttk.Frame):
@@ -362,13 +460,12 @@ class SensorFrame(ttk.Frame):
         for widget in self.check_frame.children.values():
             widget.destroy()
         self.checkvar_list = []
-        sensor_db = shelve.open(db_location + 'sensordb')
+        sensor_db = catalogdb.load_catalog('sensordb')
         for sensor in sensor_db.values():
             checkvar = IntVar()
             check = ttk.Checkbutton(self.check_frame, text=sensor.name, variable=checkvar)
             check.pack(pady=5, anchor=W)
             self.checkvar_list.append(checkvar)
-        sensor_db.close()
 
         self.sensor_title.pack_forget()
         self.sensor_sub_title.pack_forget()
@@ -379,14 +476,13 @@ class SensorFrame(ttk.Frame):
 
     def get_selected(self):
         selected_list = []
-        sensor_db = shelve.open(db_location + 'sensordb')
+        sensor_db = catalogdb.load_catalog('sensordb')
         # Loop through sensors
         for i, sensor in enumerate(sensor_db.values()):
             this_sensor = sensor
             # If sensor is selected add it to the selected list
             if self.checkvar_list[i].get() == 1:
                 selected_list.append(this_sensor)
-        sensor_db.close()
         return selected_list
 
 
@@ -436,14 +532,12 @@ class MaxBuildDimFrame(ttk.Frame):
         ttk.Frame.__init__(self, master, borderwidth=1, relief='ridge')
         self.master = master
 
-        printer_db = shelve.open(db_location + 'printerdb')
+        printer_db = catalogdb.load_catalog('printerdb')
         if printer_db:
             self.printername_list = printer_db.keys()
         else:
             self.printername_list = ['No printers']
 
-        printer_db.close()
-
         # Create widgets within maximum build dimensions frame (which is within manufacturing requirements frame)
         self.max_build_dim_label = ttk.Label(self, text='3D Printer Options')
 
@@ -517,7 +611,7 @@ class MaxBuildDimFrame(ttk.Frame):
         This method sets the values of the printer and cutter comboboxes based on the objects contained in the
         respective databases.
         """
-        printer_db = shelve.open(db_location + 'printerdb')
+        printer_db = catalogdb.load_catalog('printerdb')
 
         self.printer_combobox['width'] = len(self.printer_combobox.get()) + 2
 
@@ -549,15 +643,13 @@ class MaxBuildDimFrame(ttk.Frame):
             self.printer_height_unit_cb.current(self.printer_height_unit_cb['values']
                                                 .index(str(current_printer.height['unit'])))
 
-        printer_db.close()
-
     def new_unit_selection(self, event, entry_name):
         """
         Defines the behavior that occurs when a new unit is selected from a unit combobox. The entry corresponding to
         that unit combobox is converted from the previous units to the unit selected. This
         does not impact the value of the object in the database, which is always stored in base metric units.
         """
-        p_db = shelve.open(db_location + 'printerdb')
+        p_db = catalogdb.load_catalog('printerdb')
         selected_printer = p_db[self.printer_combobox.get()]
 
         if entry_name == 'printer_len':
@@ -579,15 +671,13 @@ class MaxBuildDimFrame(ttk.Frame):
             self.printer_height_entry.insert(0, '%0.3f' % new_val)
             self.printer_height_entry['state'] = 'readonly'
 
-        p_db.close()
-
     def refresh_printer_cutter_lists(self):
         """
         This method refreshes the combobox lists. This is useful for when there are modifications made to either the
         printer or cutter databases during runtime. For example, if a user adds a printer to the database this method
         will refresh the combobox list allowing the user to select their newly added printer immediately.
         """
-        p_db = shelve.open(db_location + 'printerdb')
+        p_db = catalogdb.load_catalog('printerdb')
         if p_db:
             current_printer = self.printer_combobox.get()
             if set(self.printer_combobox['values']) != set(p_db.keys()):
@@ -597,7 +687,6 @@ class MaxBuildDimFrame(ttk.Frame):
         else:
             self.printer_combobox['values'] = ['No printers']
             self.printer_combobox.current(0)
-        p_db.close()
 
 
 class PrintingMaterialFrame(ttk.Frame):
@@ -621,7 +710,7 @@ class PrintingMaterialFrame(ttk.Frame):
         for widget in self.check_frame.children.values():
             widget.destroy()
         self.checkvar_list = []
-        pmat_db = shelve.open(db_location + 'printingmaterialdb')
+        pmat_db = catalogdb.load_catalog('printingmaterialdb')
         for pmat in pmat_db.values():
             checkvar = IntVar()
             check = ttk.Checkbutton(self.check_frame, text=pmat.name, variable=checkvar)
@@ -632,29 +721,27 @@ class PrintingMaterialFrame(ttk.Frame):
             check.pack(pady=5, anchor=W)
             self.checkvar_list.append(checkvar)
 
-        pmat_db.close()
-
         self.check_frame.pack_forget()
         self.check_frame.pack(side=LEFT, pady=3, padx=12)
 
     def get_selected(self):
         selected_list = []
-        pmat_db = shelve.open(db_location + 'printingmaterialdb')
+        pmat_db = catalogdb.load_catalog('printingmaterialdb')
         # Loop through sensors
         for i, sensor in enumerate(pmat_db.values()):
             this_sensor = sensor
             # If sensor is selected add it to the selected list
             if self.checkvar_list[i].get() == 1:
                 selected_list.append(this_sensor)
-        pmat_db.close()
         return selected_list
 
 
 class DataMgtFrame(ttk.Frame):
     """
     This is the database management frame within the main GUI window that holds the list of component databases, as well
-    as the "View Database" and "Export Database(s)" buttons. IF DEVELOPERS IN THE FUTURE WANT TO ADD COMPONENT TYPES TO
-    THE APPLICATION, THE VARIABLES "self.components" and "self.db_names" WILL NEED TO BE UPDATED APPROPRIATELY.
+    as the "View Database", "Import Components" and "Export Database(s)" buttons. IF DEVELOPERS IN THE FUTURE WANT TO
+    ADD COMPONENT TYPES TO THE APPLICATION, THE VARIABLES "self.components" and "self.db_names" WILL NEED TO BE UPDATED
+    APPROPRIATELY.
     """
 
     def __init__(self, master):
@@ -678,12 +765,14 @@ class DataMgtFrame(ttk.Frame):
             self.component_lbox.itemconfigure(i, background='#f0f0ff')
         self.component_lbox.select_set(0)
         self.view_db_button = ttk.Button(self, text='View Database', command=self.open_database_window)
+        self.import_db_button = ttk.Button(self, text='Import Components', command=self.open_import_window)
         self.export_db_button = ttk.Button(self, text='Export Database(s)', command=self.open_export_window)
 
         # Pack widgets
         self.data_mgt_title.pack(padx=12, pady=12)
         self.component_lbox.pack()
         self.view_db_button.pack(pady=10)
+        self.import_db_button.pack(pady='0 5')
         self.export_db_button.pack(pady='5 10')
 
         # Manage database management frame resizing
@@ -696,6 +785,9 @@ class DataMgtFrame(ttk.Frame):
             return
         dbmanagement.DatabaseMgtWindow(self, db_name)
 
+    def open_import_window(self):
+        importdb.Importdb(self)
+
     def open_export_window(self):
         export.Exportdb(self)
 
@@ -704,11 +796,20 @@ class AlternativesFrame(ttk.Frame):
     """
     This is the main alternatives frame which takes up the bottom half of the main GUI window.
     """
+    # With the automatic search, a design space of more than this many alternatives is searched with the evolutionary
+    # search instead of the full factorial search (see evolutionarysearch)
+    evolutionary_threshold = 10000000
+    # Size of the evolutionary search
+    generations = 50
+    population_size = 100
 
     def __init__(self, master):
         ttk.Frame.__init__(self, master, borderwidth=2, relief='sunken')
         self.master = master
-        self.alternatives = []
+        self.alt_store = None
+        self.alt_scores = None
+        # The EvolutionarySearch of the last search, or None if it was a full factorial search
+        self.evolution = None
         self.f_alternatives = []
         self.last_constraints = []
         self.overwrite_decision = 'cancel'
@@ -723,21 +824,57 @@ class AlternativesFrame(ttk.Frame):
         self.alt_infovar = StringVar()
         self.alt_info_label = ttk.Label(self.header_frame, textvariable=self.alt_infovar)
         self.sortby_label = ttk.Label(self.header_frame, text='Sort by:')
+        # self.ranking_vals contains (pretty name, ranking method) pairs for each way of scoring the alternatives (see
+        # alternatives_new.ranking_methods). Sorting by one of these re-scores the alternatives with that method.
+        self.ranking_vals = OrderedDict([('TOPSIS score', 'TOPSIS'), ('weighted sum score', 'weighted sum'),
+                                         ('VIKOR score', 'VIKOR'), ('lexicographic score', 'lexicographic')])
+        self.ranking_method = 'TOPSIS'
         # self.sortby_vals is an ordered dictionary object which contains (pretty name, attribute name) pairs for each
         # attribute which is to be included in the sort-by combobox.
-        self.sortby_vals = OrderedDict([('total score', 'score'), ('endurance', 'max_endurance'),
-                                        ('payload', 'max_payload'), ('build time', 'build_time'),
-                                        ('weight', 'weight'), ('max dimension', 'max_dimension')])
+        self.sortby_vals = OrderedDict([(name, 'score') for name in self.ranking_vals] +
+                                       [('endurance', 'max_endurance'), ('payload', 'max_payload'),
+                                        ('build time', 'build_time'), ('weight', 'weight'),
+                                        ('max dimension', 'max_dimension')])
         self.sortby_cb = ttk.Combobox(self.header_frame, values=self.sortby_vals.keys(), state='readonly',
                                       width=len(max(self.sortby_vals, key=len)) + 2)
         self.sortby_cb.current(0)
         self.sortby_cb.bind("<<ComboboxSelected>>", self.resort)
+        # self.show_vals holds (pretty name, number of alternatives) pairs for the show combobox. When only the top
+        # alternatives are shown they are the best-scored ones of all of the feasible alternatives (see
+        # AlternativeScores.best), so only that many rows are put on the sheet. The epsilon archive shows one design per
+        # grid box of the Pareto frontier (see VehicleReqFrame.resolutions).
+        self.show_label = ttk.Label(self.header_frame, text='Show:')
+        self.show_vals = OrderedDict([('all', None), ('top 200', 200), ('top 50', 50),
+                                      ('epsilon archive', 'epsilon archive')])
+        self.show_cb = ttk.Combobox(self.header_frame, values=self.show_vals.keys(), state='readonly',
+                                    width=len(max(self.show_vals, key=len)) + 2)
+        self.show_cb.current(0)
+        self.show_cb.bind("<<ComboboxSelected>>", self.rescore)
+        # If checked, components that are dominated by another component are left out of the search, which only keeps
+        # the Pareto designs (see batchsizing.ComponentSkyline)
+        self.pareto_only_var = IntVar()
+        self.pareto_only_check = ttk.Checkbutton(self.header_frame, text='Pareto designs only',
+                                                 variable=self.pareto_only_var)
+        # self.search_vals holds (pretty name, search) pairs for the search combobox. The evolutionary search only sizes
+        # the designs it visits and finds the Pareto designs (see evolutionarysearch). The automatic search picks it
+        # when the design space is larger than evolutionary_threshold.
+        self.search_label = ttk.Label(self.header_frame, text='Search:')
+        self.search_vals = OrderedDict([('automatic', 'automatic'), ('full factorial', 'full factorial'),
+                                        ('evolutionary', 'evolutionary')])
+        self.search_cb = ttk.Combobox(self.header_frame, values=self.search_vals.keys(), state='readonly',
+                                      width=len(max(self.search_vals, key=len)) + 2)
+        self.search_cb.current(0)
 
         self.find_alt_button.grid(column=0, row=0, rowspan=2, sticky='nsw')
         self.trade_button.grid(column=1, row=0, rowspan=2, sticky='nsw', padx='5 0')
         self.alt_info_label.grid(column=1, row=0, rowspan=2, sticky='e', padx='0 10')
         self.sortby_label.grid(column=2, row=0, sticky='sw')
         self.sortby_cb.grid(column=2, row=1, sticky='se')
+        self.show_label.grid(column=3, row=0, sticky='sw', padx='5 0')
+        self.show_cb.grid(column=3, row=1, sticky='se', padx='5 0')
+        self.search_label.grid(column=4, row=0, sticky='sw', padx='5 0')
+        self.search_cb.grid(column=4, row=1, sticky='se', padx='5 0')
+        self.pareto_only_check.grid(column=5, row=0, rowspan=2, sticky='se', padx='5 0')
         self.header_frame.columnconfigure(1, weight=1)
         self.header_frame.rowconfigure(0, weight=1)
         self.header_frame.rowconfigure(1, weight=1)
@@ -746,13 +883,16 @@ class AlternativesFrame(ttk.Frame):
         self.exp_alts_button = ttk.Button(self.button_frame, text='Export feasible alts',
                                           command=self.export_alternatives)
         self.view_fail_stats_button = ttk.Button(self.button_frame, text='Failure Stats', command=self.view_fail_stats)
+        self.sensitivity_button = ttk.Button(self.button_frame, text='Weight Sensitivity',
+                                             command=self.view_sensitivity)
         self.build_model_button = ttk.Button(self.button_frame, text='Build Model', command=self.build_model)
         self.view_details_button = ttk.Button(self.button_frame, text='View Details', command=self.view_details)
         self.total_quit_button = ttk.Button(self.button_frame, text='Close Tool', command=self.close_tool)
         self.total_quit_button.pack(side=RIGHT)
         self.build_model_button.pack(side=RIGHT, padx='0 3')
         self.view_details_button.pack(side=RIGHT, padx=3)
-        self.view_fail_stats_button.pack(side=RIGHT, padx='3 0')
+        self.view_fail_stats_button.pack(side=RIGHT, padx=3)
+        self.sensitivity_button.pack(side=RIGHT, padx='3 0')
         self.exp_alts_button.pack(side=RIGHT)
 
         # Create alternatives view frame
@@ -782,39 +922,108 @@ class AlternativesFrame(ttk.Frame):
     def find_alternatives(self):
         self.last_constraints = self.get_constraints()
         constraints = self.last_constraints
-        self.alternatives = alternatives_new.generate_alternatives(constraints)
-
-        # Note that "if alt.feasible is True" in the logic below is actually what I mean. "if alt.feasible" fails
-        # because the logical value of a python string (see quadrotor.Quadrotor.feasible) is True.
-        self.f_alternatives = [alt for alt in self.alternatives if alt.feasible is True]
-
-        infeasible_reasons = {}
-        for alt in self.alternatives:
-            if alt.feasible is not True:
-                if alt.feasible[0] in infeasible_reasons:
-                    infeasible_reasons[alt.feasible[0]] += 1
-                else:
-                    infeasible_reasons[alt.feasible[0]] = 1
+        # Only the feasible alternatives are built as vehicle objects. The infeasible alternatives, which are only
+        # counted, are kept as compact records in the alternative store (see alternatives_new.AlternativeStore).
+        # Alternatives that are bound to fail are pruned in groups and only counted. The sizing quantities that do not
+        # depend on the requirement thresholds are memoized, so pressing the button again after only changing
+        # requirements is quick.
+        search = self.search_vals[self.search_cb.get()]
+        if search == 'automatic':
+            search = 'evolutionary' if evolutionarysearch.design_space_size(constraints) > self.evolutionary_threshold \
+                else 'full factorial'
+        if search == 'evolutionary':
+            self.alt_store = self.evolutionary_search(constraints)
+        else:
+            self.evolution = None
+            self.alt_store = alternatives_new.store_alternatives(constraints, prune=True, memoize=True,
+                                                                 dominance_safe=bool(self.pareto_only_var.get()))
+        self.f_alternatives = self.alt_store.feasible
+        fail_stats = self.alt_store.stats
 
+        infeasible_reasons = fail_stats.counts
         if not infeasible_reasons:
-            info_str = "%d/%d feasible alternatives. Zero failures." % (len(self.f_alternatives),
-                                                                        len(self.alternatives))
+            info_str = "%d/%d feasible alternatives. Zero failures." % (fail_stats.n_feasible,
+                                                                        fail_stats.n_alternatives)
         else:
-            sorted_reasons = sorted(infeasible_reasons, key=infeasible_reasons.get, reverse=True)
-            info_str = "%d/%d feasible alternatives. Most popular fail: %s (%d)" % (len(self.f_alternatives),
-                                                                                    len(self.alternatives),
+            sorted_reasons = fail_stats.sorted_reasons()
+            info_str = "%d/%d feasible alternatives. Most popular fail: %s (%d)" % (fail_stats.n_feasible,
+                                                                                    fail_stats.n_alternatives,
                                                                                     sorted_reasons[0],
                                                                                     max(infeasible_reasons.values()))
+        if self.alt_store.skyline is not None:
+            info_str += "\n" + self.alt_store.skyline.summary()
+        if self.evolution is not None and self.evolution.history:
+            first, last = self.evolution.history[0], self.evolution.history[-1]
+            info_str += "\nEvolutionary search: %d Pareto designs, %d of %d alternatives sized in %d generations, " \
+                        "hypervolume %0.3f -> %0.3f" % (len(self.f_alternatives), last.evaluations,
+                                                         self.evolution.space.size(), last.generation,
+                                                         first.hypervolume, last.hypervolume)
 
         self.alt_infovar.set(info_str)
 
-        # Now we want to score the feasible alternatives based on user-defined vehicle requirements weightings
-        if self.f_alternatives:
-            self.f_alternatives = alternatives_new.score_alternatives(self.f_alternatives,
-                                                                      self.master.vehicle_req_frame.weights)
-        self.alt_view_frame.interior.refresh_alt_sheet()
+        # Now we want to score the feasible alternatives based on user-defined vehicle requirements weightings. The
+        # normalized performance values and the Pareto flags are kept in self.alt_scores so that the alternatives can be
+        # re-ranked without being regenerated when the weightings change (see rescore).
+        self.alt_scores = None
+        self.rescore()
         self.alt_view_frame.interior.config(width=505)
 
+    def evolutionary_search(self, constraints):
+        """
+        Runs the evolutionary search for the requirements in 'constraints', showing the hypervolume of the Pareto
+        archive after every generation, and returns the AlternativeStore of the designs it sized. Only the archive
+        designs are feasible alternatives of the store.
+        """
+        def show_progress(stats):
+            self.alt_infovar.set("Evolutionary search: generation %d/%d, %d designs sized, %d Pareto designs, "
+                                 "hypervolume %0.3f" % (stats.generation, self.generations, stats.evaluations,
+                                                        stats.archive_size, stats.hypervolume))
+            self.update_idletasks()
+
+        _, self.evolution = evolutionarysearch.search_alternatives(constraints, generations=self.generations,
+                                                                   population_size=self.population_size, seed=0,
+                                                                   callback=show_progress)
+        return self.evolution.store()
+
+    def rescore(self, event=None):
+        """
+        Re-ranks the feasible alternatives of the last search with the current importance weightings and ranking method
+        and refreshes the alternatives sheet. Called when the user saves new weightings, picks another ranking method or
+        changes how many alternatives are shown.
+        """
+        weights = self.master.vehicle_req_frame.weights
+        feasible = self.alt_store.feasible if self.alt_store is not None else []
+        show = self.show_vals[self.show_cb.get()]
+        top_k = show if show != 'epsilon archive' else None
+        if feasible:
+            # The top alternatives are also taken from the full scores, so the Pareto flags are always set and the
+            # ranking does not depend on what was shown before
+            if not self.alt_scores or not self.alt_scores.matches(weights):
+                self.alt_scores = alternatives_new.AlternativeScores(feasible, weights)
+            self.alt_scores.rescore(weights, self.ranking_method)
+            if show == 'epsilon archive':
+                resolutions = self.master.vehicle_req_frame.resolutions
+                self.f_alternatives = self.alt_scores.epsilon_members(dict((attr, val[0]) for attr, val in
+                                                                           resolutions.items()))
+            else:
+                self.f_alternatives = self.alt_scores.best(top_k or len(feasible))
+        else:
+            self.f_alternatives = []
+        self.alt_view_frame.interior.refresh_alt_sheet()
+
+    def set_front_ranks(self, max_front=None):
+        """
+        Sorts the feasible alternatives of the last search into Pareto fronts and sets their front attribute (see
+        alternatives_new.AlternativeScores.set_front_ranks). Called from the tradespace when designs are coloured by
+        front.
+        """
+        if self.alt_store is None or not self.alt_store.feasible:
+            return
+        weights = self.master.vehicle_req_frame.weights
+        if not self.alt_scores or not self.alt_scores.matches(weights):
+            self.alt_scores = alternatives_new.AlternativeScores(self.alt_store.feasible, weights)
+        self.alt_scores.set_front_ranks(max_front)
+
     def get_constraints(self):
         """
         This method gets the vehicle requirements and other constraints from the GUI widgets and puts them into the
@@ -825,7 +1034,7 @@ class AlternativesFrame(ttk.Frame):
         English units. There is no documentation for these equations and therefore there is no way for me to convert the
         coefficients to metric without completely re-deriving the equations, which may be a project for another day.
         """
-        p_db = shelve.open(db_location + 'printerdb')
+        p_db = catalogdb.load_catalog('printerdb')
         selected_printer = p_db[self.master.manuf_req_frame.max_build_dim_frame.printer_combobox.get()]
 
         endurance_req = float(self.master.vehicle_req_frame.endurance_var.get())  # Endurance in minutes
@@ -850,12 +1059,16 @@ class AlternativesFrame(ttk.Frame):
         constraints = [endurance_req, payload_req, max_weight, max_size, maneuverability,
                        p_len, p_width, p_height, max_build_time, sensors, pmaterials, cover_flag]
 
-        p_db.close()
-
         return constraints
 
     def resort(self, event):
-        self.alt_view_frame.interior.refresh_alt_sheet()
+        # Choosing a score made with another ranking method only re-applies the weightings to the cached objectives
+        method = self.ranking_vals.get(self.sortby_cb.get())
+        if method is not None and method != self.ranking_method:
+            self.ranking_method = method
+            self.rescore()
+        else:
+            self.alt_view_frame.interior.refresh_alt_sheet()
 
     def view_details(self):
         if not self.f_alternatives:
@@ -878,9 +1091,24 @@ class AlternativesFrame(ttk.Frame):
             return
 
     def view_fail_stats(self):
-        if not self.alternatives:
+        if self.alt_store is None or not self.alt_store.stats.n_alternatives:
             return
-        ViewFailedStats(self, self.alternatives, self.last_constraints)
+        ViewFailedStats(self, self.alt_store.stats, self.last_constraints)
+
+    def view_sensitivity(self):
+        """
+        Samples importance weightings around the current ones, re-ranks the feasible alternatives for each sample with
+        the current ranking method and displays how often the leading alternatives come out on top.
+        """
+        if self.alt_store is None or not self.alt_store.feasible:
+            return
+        weights = self.master.vehicle_req_frame.weights
+        if not self.alt_scores or not self.alt_scores.matches(weights):
+            self.alt_scores = alternatives_new.AlternativeScores(self.alt_store.feasible, weights)
+        # The lexicographic and VIKOR methods are applied one sample at a time, so fewer samples are drawn for them
+        n_samples = 2000 if self.ranking_method in ('TOPSIS', 'weighted sum') else 200
+        sensitivity = self.alt_scores.weight_sensitivity(weights, n_samples=n_samples, method=self.ranking_method)
+        ViewWeightSensitivity(self, self.alt_scores.alternatives, sensitivity, self.ranking_method)
 
     def export_alternatives(self):
         """
@@ -1090,25 +1318,26 @@ class ViewQuadDetails(Toplevel):
 class ViewFailedStats(Toplevel):
     """
     This class defines the toplevel window that appears when the user clicks the Failure Stats button on the main GUI
-    after finding alternatives for a set of constraints. It retrieves the alternative.feasible attribute values for the
-    failed alternatives and organizes them so the user can see the most common reasons for alternative failure.
+    after finding alternatives for a set of constraints. It displays the alternatives_new.FailureHistogram built while
+    finding the alternatives so the user can see the most common reasons for alternative failure.
     """
 
-    def __init__(self, master, quad_alts, constraints):
+    def __init__(self, master, fail_histogram, constraints):
         Toplevel.__init__(self, master)
         self.master = master
-        self.alternatives = quad_alts
+        self.fail_histogram = fail_histogram
         xpos, ypos = get_win_place(self)
         self.geometry('+%d+%d' % (xpos, ypos))
 
         endurance_req, payload_req, max_weight, max_size, maneuverability, \
         p_len, p_width, p_height, max_build_time, sensors, pmaterials, cover_flag = constraints
         sensors_list = ",".join([s.name for s in sensors])
-        self.failed_alts = [alt for alt in self.alternatives if alt.feasible is not True]
 
         self.mainframe = ttk.Frame(self)
         self.mainframe.pack(fill=BOTH, expand=YES)
         constraints_dict = {"Max dimension too large.": max_size, "Arms too long for printer.": max(p_len, p_width),
+                            "Hub too large for printer": min(p_len, p_width),
+                            "Body too large for printer.": (p_len**2 + p_width**2)**0.5, "Insufficient Data": 'N/A',
                             "Too heavy.": max_weight, "Not enough payload capacity.": payload_req,
                             "Not enough endurance.": endurance_req, "Takes too long to build.": max_build_time,
                             "Could not place sensors in/on hub.": sensors_list}
@@ -1125,26 +1354,17 @@ class ViewFailedStats(Toplevel):
         self.constraint_header.grid(column=3, row=0, sticky=W, pady='10 5', padx='10 15')
         self.heading_separator.grid(column=0, row=1, columnspan=4, sticky='ew')
 
-        infeasible_reasons = {}
-        for alt in self.failed_alts:
-            if alt.feasible[0] in infeasible_reasons:
-                infeasible_reasons[alt.feasible[0]] += 1
-            else:
-                infeasible_reasons[alt.feasible[0]] = 1
-        sorted_reasons = sorted(infeasible_reasons, key=infeasible_reasons.get, reverse=True)
+        infeasible_reasons = self.fail_histogram.counts
+        sorted_reasons = self.fail_histogram.sorted_reasons()
 
         for grid_row, reason in enumerate(sorted_reasons, start=2):
             reason_label = ttk.Label(self.mainframe, text=reason)
             num_alts_label = ttk.Label(self.mainframe, text=str(infeasible_reasons[reason]))
-            fail_sum = 0
-            try:
-                for alt in self.failed_alts:
-                    if alt.feasible[0] == reason:
-                        fail_sum += alt.feasible[1]
-                avg_fail = float(fail_sum) / infeasible_reasons[reason]
-                avg_fail_label = ttk.Label(self.mainframe, text="%0.2f" % avg_fail)
-            except TypeError:
+            avg_fail = self.fail_histogram.average(reason)
+            if avg_fail is None:
                 avg_fail_label = ttk.Label(self.mainframe, text='N/A')
+            else:
+                avg_fail_label = ttk.Label(self.mainframe, text="%0.2f" % avg_fail)
             constraint_label = ttk.Label(self.mainframe, text=str(constraints_dict[reason]))
 
             reason_label.grid(column=0, row=grid_row, sticky=W, pady=5, padx='15 10')
@@ -1153,6 +1373,45 @@ class ViewFailedStats(Toplevel):
             constraint_label.grid(column=3, row=grid_row, pady=5, padx=10)
 
 
+class ViewWeightSensitivity(Toplevel):
+    """
+    This class defines the toplevel window that appears when the user clicks the Weight Sensitivity button on the main
+    GUI. It displays the alternatives_new.WeightSensitivity of the feasible alternatives, listing the alternatives that
+    are most often ranked first when the importance weightings are varied around the ones the user set.
+    """
+
+    def __init__(self, master, alternatives, sensitivity, ranking_method, n_shown=15):
+        Toplevel.__init__(self, master)
+        self.master = master
+        self.sensitivity = sensitivity
+        self.title('Weight Sensitivity')
+        xpos, ypos = get_win_place(self)
+        self.geometry('+%d+%d' % (xpos, ypos))
+
+        self.mainframe = ttk.Frame(self)
+        self.mainframe.pack(fill=BOTH, expand=YES)
+
+        info_str = "%s ranking over %d sampled weightings." % (ranking_method, sensitivity.n_samples)
+        self.info_label = ttk.Label(self.mainframe, text=info_str)
+        self.info_label.grid(column=0, row=0, columnspan=4, sticky=W, pady='10 0', padx=15)
+
+        # Create and grid header and separator
+        headers = ['Alternative', 'P(ranked 1st)', 'P(top 5)', 'Avg rank']
+        for column, header in enumerate(headers):
+            header_label = ttk.Label(self.mainframe, text=header)
+            header_label.grid(column=column, row=1, sticky=W, pady='10 5', padx='15 10' if column == 0 else 10)
+        self.heading_separator = ttk.Separator(self.mainframe, orient=HORIZONTAL)
+        self.heading_separator.grid(column=0, row=2, columnspan=4, sticky='ew')
+
+        prob_top5 = sensitivity.prob_top(min(5, sensitivity.max_rank))
+        for grid_row, i in enumerate(sensitivity.most_robust(n_shown).tolist(), start=3):
+            values = [str(alternatives[i]), "%0.3f" % sensitivity.prob_best[i], "%0.3f" % prob_top5[i],
+                      "%0.1f" % sensitivity.mean_rank[i]]
+            for column, value in enumerate(values):
+                value_label = ttk.Label(self.mainframe, text=value)
+                value_label.grid(column=column, row=grid_row, sticky=W, pady=5, padx='15 10' if column == 0 else 10)
+
+
 def main():
     """
     This is the main function that creates the root Tk window. The mainframe variable is an instance of the QuadGUI
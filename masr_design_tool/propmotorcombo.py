@@ -1,5 +1,6 @@
 from displayable import Displayable
 from collections import OrderedDict
+import numpy as np
 from tools import convert_unit
 try:
     from Tkinter import *
@@ -32,6 +33,29 @@ class Propmotorcombo(Displayable):
         self.thrust_vec = thrust_vec
         self.max_thrust = {'value': max(self.thrust_vec['value']), 'unit': self.thrust_vec['unit']}
         self.name = "%s/%s" % (self.motor.name, self.prop.name)
+        self._current_table = CurrentThrustTable(self.thrust_vec['value'], self.current_vec['value'])
+
+    def __getstate__(self):
+        # The lookup table is rebuilt when it is first needed (see current_table()), so it is not pickled into the
+        # database. This keeps the databases readable without NumPy and keeps older database entries valid.
+        state = self.__dict__.copy()
+        state.pop('_current_table', None)
+        return state
+
+    def current_table(self):
+        """
+        Returns the CurrentThrustTable of this combo, building it if the object was loaded from a database.
+        """
+        if getattr(self, '_current_table', None) is None:
+            self._current_table = CurrentThrustTable(self.thrust_vec['value'], self.current_vec['value'])
+        return self._current_table
+
+    def interp_many(self, thrusts):
+        """
+        Returns a NumPy array of the current draw (in A) at each of the 'thrusts' (in N). See
+        CurrentThrustTable.interp_many.
+        """
+        return self.current_table().interp_many(thrusts)
 
     @staticmethod
     def process_input(attr_list):
@@ -107,3 +131,60 @@ class Propmotorcombo(Displayable):
             return mainframe, current_obj_vars
         else:
             return mainframe
+
+
+class CurrentThrustTable(object):
+    """
+    Current vs. thrust lookup table of a prop/motor combo, held as NumPy arrays sorted by thrust. interp_many gives the
+    same results as tools.interp(thrust_vec, current_vec, thrust) for thrust data in ascending order (which is how the
+    test data is entered), but uses a binary search instead of scanning the data for every thrust value.
+    """
+    # Closeness tolerances of tools.float_is_close
+    rel_tol = 1e-09
+    abs_tol = 0.000001
+
+    def __init__(self, thrust_vec, current_vec):
+        order = np.argsort(thrust_vec, kind='mergesort')
+        self.thrust = np.asarray(thrust_vec, dtype=float)[order]
+        self.current = np.asarray(current_vec, dtype=float)[order]
+
+    def interp_many(self, thrusts):
+        """
+        Linearly interpolates the current at each of the 'thrusts' and returns the currents as a NumPy array with the
+        same shape as 'thrusts' (which may be a scalar or any array-like).
+
+        A thrust that is "close" to a data point (see tools.float_is_close) gets the current of that data point exactly.
+        A thrust below the smallest or above the largest thrust in the data (and not close to it) is out of range and
+        its current is nan; this is where tools.interp raises "Insufficient Data". Nothing is extrapolated.
+        """
+        shape = np.shape(thrusts)
+        thrusts = np.atleast_1d(np.asarray(thrusts, dtype=float)).ravel()
+        x = self.thrust
+        y = self.current
+        currents = np.full(thrusts.shape, np.nan)
+        if not len(x):
+            return currents.reshape(shape)
+
+        # The closest data points to each thrust are the one before and the one after its insertion point. The first
+        # of them that is close wins, as in the tools.interp scan.
+        tol = np.maximum(self.rel_tol*np.maximum(abs(thrusts), max(abs(x[0]), abs(x[-1]))), self.abs_tol)
+        lower = np.searchsorted(x, thrusts - tol, side='left').clip(0, len(x)-1)
+        upper = (lower+1).clip(0, len(x)-1)
+        lower_close = self._is_close(x[lower], thrusts)
+        upper_close = self._is_close(x[upper], thrusts)
+        close = lower_close | upper_close
+        close_index = np.where(lower_close, lower, upper)
+        in_range = ((x[0] <= thrusts) & (thrusts <= x[-1])) | close
+
+        # Otherwise interpolate between the first data point above the thrust and the one before it
+        interpolate = in_range & ~close
+        above = np.searchsorted(x, thrusts[interpolate], side='right')
+        x1 = x[above-1]
+        y1 = y[above-1]
+        slope = (y[above]-y1)/(x[above]-x1)
+        currents[interpolate] = slope*(thrusts[interpolate]-x1) + y1
+        currents[close] = y[close_index[close]]
+        return currents.reshape(shape)
+
+    def _is_close(self, a, b):
+        return abs(a-b) <= np.maximum(self.rel_tol*np.maximum(abs(a), abs(b)), self.abs_tol)
@@ -1,7 +1,9 @@
 from vehicle import Vehicle
 from collections import OrderedDict
-from tools import convert_unit, interp
+from tools import convert_unit
+import batchsizing
 import math
+import numpy as np
 try:
     from Tkinter import *
 except ImportError:
@@ -25,7 +27,13 @@ class Quadmultipiece(Vehicle):
     # list using a tuple of the format ('Pretty name', 'attribute real name', unit list (if applicable))
     export_info = part_attrs + Vehicle.perf_attrs_export + geometry_attrs
 
-    def __init__(self, pmcombo, battery, pmaterial, geometry=None, feasible=True, score=0, pareto=False):
+    # Number of arms (and prop/motor combos) of the platform
+    n_arms = 4
+
+    # Hub dimensions (x, y) in meters, from David Locascio's documentation on the new quad design
+    hub_dims = (convert_unit(4.25, 'in', 'm'), convert_unit(5.75, 'in', 'm'))
+
+    def __init__(self, pmcombo, battery, pmaterial, geometry=None, feasible=True, score=0, pareto=False, front=0):
         """
 
         The input "feasible" will be true by default. If the quad is found to be infeasible the value will be changed
@@ -50,6 +58,7 @@ class Quadmultipiece(Vehicle):
         self.feasible = feasible
         self.score = score
         self.pareto = pareto
+        self.front = front  # Pareto front (1 is the frontier), 0 until the alternatives are sorted into fronts
         self.name = "(%s, %s)" % (self.pmcombo.name, self.battery.name)
 
     def __str__(self):
@@ -77,8 +86,6 @@ class Quadmultipiece(Vehicle):
         pmc_max_thrust = self.pmcombo.max_thrust['value']
         bat_voltage = self.battery.voltage['value']
         bat_capacity = convert_unit(self.battery.capacity['value'], 'Wh', 'mAh', bat_voltage)
-        pmc_thrust_vec = self.pmcombo.thrust_vec['value']
-        pmc_current_vec = self.pmcombo.current_vec['value']
 
         endurance_req, payload_req, max_weight, max_size, maneuverability, \
             p_len, p_width, p_height, max_build_time, sensors, selected_pmaterials, cover_flag = constraints
@@ -89,18 +96,12 @@ class Quadmultipiece(Vehicle):
         # 3) The length of the arm must be less than max(printer_len, printer_width). This assumes the other dimension
         # of the printer is sufficiently large, which is a fair assumption since the arm is long and narrow. This also
         # assumes the printer height is sufficient.
-
-        # The following hub dimensions are from David Locascio's documentation on the new quad design
-        hub_xdim = convert_unit(4.25, 'in', 'm')
-        hub_ydim = convert_unit(5.75, 'in', 'm')
-        hub_separation = convert_unit(1.55, 'in', 'm')
+        hub_xdim, hub_ydim = self.hub_dims
         big_hub_dim = max(hub_xdim, hub_ydim)
-
-        safe_factor = 1.15
-        n_arms = 4
-        arm_len_in = convert_unit(prop_dia, 'm', 'in')*0.357 + 2.965  #in inches
-        arm_len = convert_unit(arm_len_in, 'in', 'm')
-        size = math.sqrt(hub_xdim**2 + hub_ydim**2) + 2*arm_len + prop_dia  # This is an approximation
+        n_arms = self.n_arms
+        terms = self.frame_terms(prop_dia, cover_flag)
+        arm_len = terms['arm_len']
+        size = terms['size']
         if size > max_size:
             return "Max dimension too large.", size, None
         if big_hub_dim > min(p_len, p_width):
@@ -108,31 +109,11 @@ class Quadmultipiece(Vehicle):
         if arm_len > max(p_len, p_width):
             return "Arms too long for printer.", arm_len, None
 
-        # Note that the frame volume regressions should probably be the same in the first two terms, since the volume of
-        # the hub top cover should not depend on the length of the arm. This is probably due to rounding error.
-        if cover_flag:
-            frame_vol = 0.2954*arm_len_in**2 - 1.0534*arm_len_in + 12.0648  # in cubic inches
-        else:
-            frame_vol = 0.2995*arm_len_in**2 - 1.0690*arm_len_in + 10.4840  # in cubic inches
-
-        # Convert to volume to cubic meters, don't feel like adding volume to tools_convert unit for a one-off
-        frame_vol *= 1.6387e-5
-
-        # Calculate frame weight
-        frame_weight = frame_vol * pmat_density
-
-        # The original authors give misc other weights for parts to go into the aggregate weight. Note: if the user
-        # wishes to include sensors this weight should also be added.
+        # Calculate frame weight and the aggregate vehicle weight
+        frame_weight = terms['frame_vol'] * pmat_density
         sensors_weight = sum(s.weight['value'] for s in sensors)
-        wire_weight = convert_unit(0.000612394*arm_len*n_arms, 'lbf', 'N')
-        esc_weight = convert_unit(0.2524, 'lbf', 'N')
-        apm_weight = convert_unit(0.0705479, 'lbf', 'N')
-        compass_weight = convert_unit(0.06062712, 'lbf', 'N')
-        receiver_weight = convert_unit(0.033069, 'lbf', 'N')
-        propnut_weight = convert_unit(0.0251327, 'lbf', 'N')
-        weights = [frame_weight, compass_weight, receiver_weight, apm_weight, wire_weight, esc_weight, propnut_weight]
-        weights += [bat_weight, motor_weight*n_arms, prop_weight*n_arms, sensors_weight]
-        vehicle_weight = sum(weights)
+        vehicle_weight = self.total_weight(frame_weight, terms['wire_weight'], bat_weight, motor_weight, prop_weight,
+                                           sensors_weight)
         if vehicle_weight > max_weight:
             return "Too heavy.", vehicle_weight, None
 
@@ -152,20 +133,14 @@ class Quadmultipiece(Vehicle):
         # using the average thrust as the interpolation point of interest. The equation for average thrust given below
         # assumes that the mission consists only of hovering. This could be replaced with a real mission model result.
         avg_thrust = 1.125 * (vehicle_weight + payload_req) / n_arms
-        try:
-            avg_current = interp(pmc_thrust_vec, pmc_current_vec, avg_thrust)
-        except ValueError as e:
-            return str(e)
+        avg_current = float(self.pmcombo.interp_many(avg_thrust))
+        if math.isnan(avg_current):
+            return "Insufficient Data", None, None
         vehicle_endurance = bat_capacity / (n_arms * avg_current * 1000) * 60
         if vehicle_endurance < endurance_req:
             return "Not enough endurance.", vehicle_endurance, None
 
-        # Calculate build time in minutes using regressions
-        if cover_flag:
-            build_time = (12.6868*arm_len_in**2 - 34.6260*arm_len_in + 832.9249) / 60
-        else:
-            build_time = (13.6458*arm_len_in**2 - 47.1064*arm_len_in + 757.0298) / 60
-
+        build_time = terms['build_time']
         if build_time > max_build_time:
             return "Takes too long to build.", build_time, None
 
@@ -174,6 +149,110 @@ class Quadmultipiece(Vehicle):
         vehicle_geometry = [hub_xdim, hub_ydim, arm_len]
         return 'true', vehicle_performance, vehicle_geometry
 
+    @classmethod
+    def batch_is_feasible(cls, matrix, constraints):
+        """
+        Array-based version of is_feasible. Evaluates every (pmcombo, battery, pmaterial) triple of the
+        batchsizing.ComponentMatrix 'matrix' in one pass and returns a batchsizing.BatchResult. The equations and the
+        order in which the constraints are tested are identical to is_feasible, so the verdict and the first failure
+        reason of each triple are the same as if is_feasible had been called on it.
+
+        The quantities that do not depend on the requirement thresholds are computed by batch_sizing_terms, and are
+        memoized if the matrix memoizes, in which case only the comparisons below are re-run when just the thresholds
+        change.
+        """
+        endurance_req, payload_req, max_weight, max_size, maneuverability, \
+            p_len, p_width, p_height, max_build_time, sensors, selected_pmaterials, cover_flag = constraints
+        pm, bat, mat = matrix.triples()
+        result = batchsizing.BatchResult(matrix, cls, pm, bat, mat)
+
+        hub_xdim, hub_ydim = cls.hub_dims
+        big_hub_dim = max(hub_xdim, hub_ydim)
+        n_arms = cls.n_arms
+        sensors_weight = sum(s.weight['value'] for s in sensors)
+        key = (cls.__name__, cover_flag, sensors_weight)
+        terms = matrix.memoized(key, lambda pm, bat, mat:
+                                cls.batch_sizing_terms(matrix, pm, bat, mat, cover_flag, sensors_weight))
+        size = terms['size']
+        arm_len = terms['arm_len']
+        vehicle_weight = terms['vehicle_weight']
+        build_time = terms['build_time']
+
+        result.reject(size > max_size, "Max dimension too large.", size)
+        result.reject(big_hub_dim > min(p_len, p_width), "Hub too large for printer", big_hub_dim)
+        result.reject(arm_len > max(p_len, p_width), "Arms too long for printer.", arm_len)
+        result.reject(vehicle_weight > max_weight, "Too heavy.", vehicle_weight)
+        payload_capacity, vehicle_endurance = batchsizing.payload_and_endurance(result, vehicle_weight, constraints,
+                                                                                n_arms, key)
+        result.reject(build_time > max_build_time, "Takes too long to build.", build_time)
+
+        result.performance = np.column_stack([vehicle_weight, payload_capacity, vehicle_endurance, size, build_time])
+        result.geometry = np.column_stack([np.full(len(result), hub_xdim), np.full(len(result), hub_ydim), arm_len])
+        return result
+
+    @classmethod
+    def batch_sizing_terms(cls, matrix, pm, bat, mat, cover_flag, sensors_weight):
+        """
+        The part of batch_is_feasible that does not depend on the requirement thresholds. Returns a dictionary of
+        arrays (size, arm_len, vehicle_weight, and build_time) with one entry per given triple of 'matrix'.
+
+        Quantities that only depend on one component (e.g., the arm length only depends on the prop diameter) are
+        computed once per component and then broadcast over the triples.
+        """
+        terms = cls.frame_terms(matrix.prop_dia, cover_flag)
+        frame_weight = terms['frame_vol'][pm] * matrix.pmat_density[mat]
+        vehicle_weight = cls.total_weight(frame_weight, terms['wire_weight'][pm], matrix.bat_weight[bat],
+                                          matrix.motor_weight[pm], matrix.prop_weight[pm], sensors_weight)
+        return {'size': terms['size'][pm], 'arm_len': terms['arm_len'][pm], 'vehicle_weight': vehicle_weight,
+                'build_time': terms['build_time'][pm]}
+
+    @classmethod
+    def frame_terms(cls, prop_dia, cover_flag):
+        """
+        Sizing equations of the multi piece frame, which only depend on the propeller diameter (in meters) and on
+        whether or not the hub has a top cover. Returns a dictionary of the arm length, the maximum vehicle dimension,
+        the frame volume in cubic meters, the weight of the wires, and the build time in hours. prop_dia is either a
+        number (is_feasible) or an array with one entry per prop/motor combo (batch_sizing_terms), so that both use the
+        same equations.
+        """
+        hub_xdim, hub_ydim = cls.hub_dims
+        arm_len_in = convert_unit(prop_dia, 'm', 'in')*0.357 + 2.965  # in inches
+        arm_len = convert_unit(arm_len_in, 'in', 'm')
+        size = math.sqrt(hub_xdim**2 + hub_ydim**2) + 2*arm_len + prop_dia  # This is an approximation
+
+        # Note that the frame volume regressions should probably be the same in the first two terms, since the volume of
+        # the hub top cover should not depend on the length of the arm. This is probably due to rounding error.
+        # The build time regressions are in minutes and are converted to hours.
+        if cover_flag:
+            frame_vol = 0.2954*arm_len_in**2 - 1.0534*arm_len_in + 12.0648  # in cubic inches
+            build_time = (12.6868*arm_len_in**2 - 34.6260*arm_len_in + 832.9249) / 60
+        else:
+            frame_vol = 0.2995*arm_len_in**2 - 1.0690*arm_len_in + 10.4840  # in cubic inches
+            build_time = (13.6458*arm_len_in**2 - 47.1064*arm_len_in + 757.0298) / 60
+
+        # Convert to volume to cubic meters, don't feel like adding volume to tools_convert unit for a one-off
+        frame_vol *= 1.6387e-5
+        wire_weight = convert_unit(0.000612394*arm_len*cls.n_arms, 'lbf', 'N')
+        return {'arm_len': arm_len, 'size': size, 'frame_vol': frame_vol, 'wire_weight': wire_weight,
+                'build_time': build_time}
+
+    @classmethod
+    def total_weight(cls, frame_weight, wire_weight, bat_weight, motor_weight, prop_weight, sensors_weight):
+        """
+        Aggregate vehicle weight (in N) from the weights of the frame, wires, and components, for either numbers or
+        arrays. The original authors give misc other weights for parts to go into the aggregate weight. Note: if the
+        user wishes to include sensors this weight should also be added.
+        """
+        n_arms = cls.n_arms
+        esc_weight = convert_unit(0.2524, 'lbf', 'N')
+        apm_weight = convert_unit(0.0705479, 'lbf', 'N')
+        compass_weight = convert_unit(0.06062712, 'lbf', 'N')
+        receiver_weight = convert_unit(0.033069, 'lbf', 'N')
+        propnut_weight = convert_unit(0.0251327, 'lbf', 'N')
+        weights = [frame_weight, compass_weight, receiver_weight, apm_weight, wire_weight, esc_weight, propnut_weight]
+        weights += [bat_weight, motor_weight*n_arms, prop_weight*n_arms, sensors_weight]
+        return sum(weights)
+
     def set_geometry(self, geometry):
         """
         Set geometry method for when the geometry needs to be changed after initialization of the object,
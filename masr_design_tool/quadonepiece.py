@@ -1,7 +1,9 @@
 from vehicle import Vehicle
 from collections import OrderedDict
-from tools import convert_unit, interp
+from tools import convert_unit
+import batchsizing
 import math
+import numpy as np
 try:
     from Tkinter import *
 except ImportError:
@@ -25,7 +27,13 @@ class Quadonepiece(Vehicle):
     # list using a tuple of the format ('Pretty name', 'attribute real name', unit list (if applicable))
     export_info = part_attrs + Vehicle.perf_attrs_export + geometry_attrs
 
-    def __init__(self, pmcombo, battery, pmaterial, geometry=None, feasible=True, score=0, pareto=False):
+    # Number of arms (and prop/motor combos) of the platform
+    n_arms = 4
+
+    # Hub dimensions (x, y) in meters, from David Locascio's documentation on the new quad design
+    hub_dims = (convert_unit(4.25, 'in', 'm'), convert_unit(5.75, 'in', 'm'))
+
+    def __init__(self, pmcombo, battery, pmaterial, geometry=None, feasible=True, score=0, pareto=False, front=0):
         """
 
         The input "feasible" will be true by default. If the quad is found to be infeasible the value will be changed
@@ -50,6 +58,7 @@ class Quadonepiece(Vehicle):
         self.feasible = feasible
         self.score = score
         self.pareto = pareto
+        self.front = front  # Pareto front (1 is the frontier), 0 until the alternatives are sorted into fronts
         self.name = "(%s, %s)" % (self.pmcombo.name, self.battery.name)
 
     def __str__(self):
@@ -77,8 +86,6 @@ class Quadonepiece(Vehicle):
         pmc_max_thrust = self.pmcombo.max_thrust['value']
         bat_voltage = self.battery.voltage['value']
         bat_capacity = convert_unit(self.battery.capacity['value'], 'Wh', 'mAh', bat_voltage)
-        pmc_thrust_vec = self.pmcombo.thrust_vec['value']
-        pmc_current_vec = self.pmcombo.current_vec['value']
 
         endurance_req, payload_req, max_weight, max_size, maneuverability, \
             p_len, p_width, p_height, max_build_time, sensors, selected_pmaterials, cover_flag = constraints
@@ -89,42 +96,21 @@ class Quadonepiece(Vehicle):
         # 3) The length of the arm must be less than max(printer_len, printer_width). This assumes the other dimension
         # of the printer is sufficiently large, which is a fair assumption since the arm is long and narrow. This also
         # assumes the printer height is sufficient.
-
-        # The following hub dimensions are from David Locascio's documentation on the new quad design
-        hub_xdim = convert_unit(4.25, 'in', 'm')
-        hub_ydim = convert_unit(5.75, 'in', 'm')
-        hub_separation = convert_unit(1.64, 'in', 'm')
-        big_hub_dim = max(hub_xdim, hub_ydim)
-
-        safe_factor = 1.15
-        n_arms = 4
-        half_arm_width = motor_body_dia/float(2) + 0.05
-        prop_disc_separation_limited_len = safe_factor * (prop_dia/2/math.sin(math.pi/n_arms) + 0.75*motor_body_dia -
-                                                          0.5*big_hub_dim)
-        prop_to_hub_limited_len = safe_factor * \
-            (prop_dia/2 + 1.5*motor_body_dia/2)
-        arm_len = max(prop_disc_separation_limited_len, prop_to_hub_limited_len)
-        size = math.sqrt(hub_xdim**2 + hub_ydim**2) + 2*arm_len + prop_dia  # This is an approximation
+        hub_xdim, hub_ydim = self.hub_dims
+        n_arms = self.n_arms
+        terms = self.frame_terms(prop_dia, motor_body_dia)
+        arm_len = terms['arm_len']
+        size = terms['size']
         if size > max_size:
             return "Max dimension too large.", size, None
         if size > math.sqrt(p_len**2 + p_width**2):
             return "Body too large for printer.", size, None
 
-        # Calculate the volume of the body and calculate the vehicle weight using known regression
-        unit_vol_incube = -6.6375 + 2.0725 * arm_len + 4.29 * half_arm_width + -1.36 * (size/2) + 1.005 * hub_separation
-        unit_vol_mcube = unit_vol_incube * 1.63871e-5
-        unit_weight = unit_vol_mcube * pmat_density
-
+        # Calculate the weight of the body from its volume and the aggregate vehicle weight
+        unit_weight = terms['unit_vol'] * pmat_density
         sensors_weight = sum(s.weight['value'] for s in sensors)
-        wire_weight = convert_unit(0.000612394*arm_len*n_arms, 'lbf', 'N')
-        esc_weight = convert_unit(0.2524, 'lbf', 'N')
-        apm_weight = convert_unit(0.0705479, 'lbf', 'N')
-        compass_weight = convert_unit(0.06062712, 'lbf', 'N')
-        receiver_weight = convert_unit(0.033069, 'lbf', 'N')
-        propnut_weight = convert_unit(0.0251327, 'lbf', 'N')
-        weights = [compass_weight, receiver_weight, apm_weight, wire_weight, esc_weight, propnut_weight]
-        weights += [unit_weight, bat_weight, motor_weight*n_arms, prop_weight*n_arms, sensors_weight]
-        vehicle_weight = sum(weights)
+        vehicle_weight = self.total_weight(unit_weight, terms['wire_weight'], bat_weight, motor_weight, prop_weight,
+                                           sensors_weight)
         if vehicle_weight > max_weight:
             return "Too heavy.", vehicle_weight, None
 
@@ -144,17 +130,14 @@ class Quadonepiece(Vehicle):
         # using the average thrust as the interpolation point of interest. The equation for average thrust given below
         # assumes that the mission consists only of hovering. This could be replaced with a real mission model result.
         avg_thrust = 1.125 * (vehicle_weight + payload_req) / n_arms
-        try:
-            avg_current = interp(pmc_thrust_vec, pmc_current_vec, avg_thrust)
-        except ValueError as e:
-            return str(e)
+        avg_current = float(self.pmcombo.interp_many(avg_thrust))
+        if math.isnan(avg_current):
+            return "Insufficient Data", None, None
         vehicle_endurance = bat_capacity / (n_arms * avg_current * 1000) * 60
         if vehicle_endurance < endurance_req:
             return "Not enough endurance.", vehicle_endurance, None
 
-        # Now calculate the estimated build time.
-        build_time = -25.9989583333333 + 4.41875 * arm_len + 12.025 * half_arm_width + -0.725 * (size/2) + \
-            8.79583333333333 * hub_separation
+        build_time = terms['build_time']
         if build_time > max_build_time:
             return "Takes too long to build.", build_time, None
 
@@ -163,6 +146,102 @@ class Quadonepiece(Vehicle):
         vehicle_geometry = [hub_xdim, hub_ydim, arm_len]
         return 'true', vehicle_performance, vehicle_geometry
 
+    @classmethod
+    def batch_is_feasible(cls, matrix, constraints):
+        """
+        Array-based version of is_feasible. See Quadmultipiece.batch_is_feasible; the only differences are the arm
+        length, unit volume, and build time regressions of the one piece frame (see batch_sizing_terms), which are the
+        same as in is_feasible.
+        """
+        endurance_req, payload_req, max_weight, max_size, maneuverability, \
+            p_len, p_width, p_height, max_build_time, sensors, selected_pmaterials, cover_flag = constraints
+        pm, bat, mat = matrix.triples()
+        result = batchsizing.BatchResult(matrix, cls, pm, bat, mat)
+
+        hub_xdim, hub_ydim = cls.hub_dims
+        n_arms = cls.n_arms
+        sensors_weight = sum(s.weight['value'] for s in sensors)
+        # The one piece frame does not depend on the cover flag
+        key = (cls.__name__, sensors_weight)
+        terms = matrix.memoized(key, lambda pm, bat, mat: cls.batch_sizing_terms(matrix, pm, bat, mat, sensors_weight))
+        size = terms['size']
+        arm_len = terms['arm_len']
+        vehicle_weight = terms['vehicle_weight']
+        build_time = terms['build_time']
+
+        result.reject(size > max_size, "Max dimension too large.", size)
+        result.reject(size > math.sqrt(p_len**2 + p_width**2), "Body too large for printer.", size)
+        result.reject(vehicle_weight > max_weight, "Too heavy.", vehicle_weight)
+        payload_capacity, vehicle_endurance = batchsizing.payload_and_endurance(result, vehicle_weight, constraints,
+                                                                                n_arms, key)
+        result.reject(build_time > max_build_time, "Takes too long to build.", build_time)
+
+        result.performance = np.column_stack([vehicle_weight, payload_capacity, vehicle_endurance, size, build_time])
+        result.geometry = np.column_stack([np.full(len(result), hub_xdim), np.full(len(result), hub_ydim), arm_len])
+        return result
+
+    @classmethod
+    def batch_sizing_terms(cls, matrix, pm, bat, mat, sensors_weight):
+        """
+        The part of batch_is_feasible that does not depend on the requirement thresholds. Returns a dictionary of
+        arrays (size, arm_len, vehicle_weight, and build_time) with one entry per given triple of 'matrix'.
+        """
+        terms = cls.frame_terms(matrix.prop_dia, matrix.motor_body_dia)
+        unit_weight = terms['unit_vol'][pm] * matrix.pmat_density[mat]
+        vehicle_weight = cls.total_weight(unit_weight, terms['wire_weight'][pm], matrix.bat_weight[bat],
+                                          matrix.motor_weight[pm], matrix.prop_weight[pm], sensors_weight)
+        return {'size': terms['size'][pm], 'arm_len': terms['arm_len'][pm], 'vehicle_weight': vehicle_weight,
+                'build_time': terms['build_time'][pm]}
+
+    @classmethod
+    def frame_terms(cls, prop_dia, motor_body_dia):
+        """
+        Sizing equations of the one piece body, which only depend on the propeller and motor body diameters (in
+        meters). Returns a dictionary of the arm length, the maximum vehicle dimension, the body volume in cubic meters,
+        the weight of the wires, and the build time. The diameters are either numbers (is_feasible) or arrays with one
+        entry per prop/motor combo (batch_sizing_terms), so that both use the same equations.
+        """
+        hub_xdim, hub_ydim = cls.hub_dims
+        hub_separation = convert_unit(1.64, 'in', 'm')
+        big_hub_dim = max(hub_xdim, hub_ydim)
+
+        safe_factor = 1.15
+        n_arms = cls.n_arms
+        half_arm_width = motor_body_dia/float(2) + 0.05
+        prop_disc_separation_limited_len = safe_factor * (prop_dia/2/math.sin(math.pi/n_arms) + 0.75*motor_body_dia -
+                                                          0.5*big_hub_dim)
+        prop_to_hub_limited_len = safe_factor * \
+            (prop_dia/2 + 1.5*motor_body_dia/2)
+        arm_len = np.maximum(prop_disc_separation_limited_len, prop_to_hub_limited_len)
+        size = math.sqrt(hub_xdim**2 + hub_ydim**2) + 2*arm_len + prop_dia  # This is an approximation
+
+        # Calculate the volume of the body using known regression
+        unit_vol_incube = -6.6375 + 2.0725 * arm_len + 4.29 * half_arm_width + -1.36 * (size/2) + 1.005 * hub_separation
+        unit_vol_mcube = unit_vol_incube * 1.63871e-5
+        wire_weight = convert_unit(0.000612394*arm_len*n_arms, 'lbf', 'N')
+
+        # Now calculate the estimated build time.
+        build_time = -25.9989583333333 + 4.41875 * arm_len + 12.025 * half_arm_width + -0.725 * (size/2) + \
+            8.79583333333333 * hub_separation
+        return {'arm_len': arm_len, 'size': size, 'unit_vol': unit_vol_mcube, 'wire_weight': wire_weight,
+                'build_time': build_time}
+
+    @classmethod
+    def total_weight(cls, unit_weight, wire_weight, bat_weight, motor_weight, prop_weight, sensors_weight):
+        """
+        Aggregate vehicle weight (in N) from the weights of the body, wires, and components, for either numbers or
+        arrays. See Quadmultipiece.total_weight.
+        """
+        n_arms = cls.n_arms
+        esc_weight = convert_unit(0.2524, 'lbf', 'N')
+        apm_weight = convert_unit(0.0705479, 'lbf', 'N')
+        compass_weight = convert_unit(0.06062712, 'lbf', 'N')
+        receiver_weight = convert_unit(0.033069, 'lbf', 'N')
+        propnut_weight = convert_unit(0.0251327, 'lbf', 'N')
+        weights = [compass_weight, receiver_weight, apm_weight, wire_weight, esc_weight, propnut_weight]
+        weights += [unit_weight, bat_weight, motor_weight*n_arms, prop_weight*n_arms, sensors_weight]
+        return sum(weights)
+
     def set_geometry(self, geometry):
         """
         Set geometry method for when the geometry needs to be changed after initialization of the object,
@@ -6,69 +6,105 @@ class CapacityConvError(ConversionError):
     pass
 
 
+# Conversion factors of each unit family (other than capacity), as the number of units per standard metric unit. The
+# registry is built once at import; convert_unit caches the factors of each (start unit, end unit) pair it sees.
+weight_per_newton = {'N': 1, 'lbf': 0.2248, 'kg': 1/9.81}
+length_per_meter = {'m': 1, 'cm': 100, 'in': 39.37, 'ft': 3.281}
+density_per_metric = {'kg*m^-3': 1, 'slug*ft^-3': 0.00194, 'lbf*ft^-3': 0.00194/32.2}
+cs_area_per_sqmeter = {'m^2': 1, 'cm^2': 10000, 'in^2': 1550, 'ft^2': 10.764}
+time_per_sec = {'s': 1, 'min': float(1)/60, 'hr': float(1)/3600}
+unit_families = [weight_per_newton, length_per_meter, density_per_metric, cs_area_per_sqmeter, time_per_sec]
+unit_family = dict((unit, family) for family in unit_families for unit in family)
+
+# Battery capacity units. The mAh <--> Wh conversion depends on the battery voltage, so it is not in the registry (see
+# capacity_per_wh).
+capacity_units = ('Wh', 'mAh')
+
+_factor_cache = {}
+
+
 def convert_unit(val, unit_start, unit_end, voltage=None):
-    weight_per_newton = {'N': 1, 'lbf': 0.2248, 'kg': 1/9.81}
-    length_per_meter = {'m': 1, 'cm': 100, 'in': 39.37, 'ft': 3.281}
-    if voltage is not None:
-        capacity_per_Wh = {'Wh': 1, 'mAh': float(voltage)/1000}
-    else:
-        capacity_per_Wh = {'mAh': 1, 'Wh': 1}
-    density_per_metric = {'kg*m^-3': 1, 'slug*ft^-3': 0.00194, 'lbf*ft^-3': 0.00194/32.2}
-    cs_area_per_sqmeter = {'m^2': 1, 'cm^2': 10000, 'in^2': 1550, 'ft^2': 10.764}
-    time_per_sec = {'s': 1, 'min': float(1)/60, 'hr': float(1)/3600}
-    unit_list_of_dict = [weight_per_newton, length_per_meter, capacity_per_Wh, density_per_metric, cs_area_per_sqmeter,
-                         time_per_sec]
+    """
+    Converts 'val' from unit_start to unit_end, or to the standard metric unit of its family if unit_end is
+    'std_metric'. 'val' may be a number or a NumPy array (which is converted element-wise).
 
+    Converting a capacity between mAh and Wh requires the battery voltage, which may also be an array with one entry per
+    value.
+    """
     # Handle None inputs
     if val is None:
         return None
+    val = _as_float(val)
 
-    # Handle case during object initialization when everything will be converted to standard metric units
-    if unit_end == 'std_metric':
-        if unit_start in weight_per_newton:
-            val_end = float(val)/weight_per_newton[unit_start]
-            return val_end
-        elif unit_start in length_per_meter:
-            val_end = float(val)/length_per_meter[unit_start]
-            return val_end
-        elif unit_start in capacity_per_Wh:
-            if unit_start == 'mAh' and voltage is None:
-                raise CapacityConvError("If inputting capacity as mAh must give voltage or num cells")
-            else:
-                val_end = float(val)/capacity_per_Wh[unit_start]
-                return val_end
-        elif unit_start in density_per_metric:
-            val_end = float(val)/density_per_metric[unit_start]
-            return val_end
-        elif unit_start in cs_area_per_sqmeter:
-            val_end = float(val)/cs_area_per_sqmeter[unit_start]
-            return val_end
-        elif unit_start in time_per_sec:
-            val_end = float(val)/time_per_sec[unit_start]
-            return val_end
-        else:
-            print unit_start
-            raise ConversionError("Problem converting unit during __init__")
+    if unit_start in capacity_units or unit_end in capacity_units:
+        return convert_capacity(val, unit_start, unit_end, voltage)
 
     # Handle cases when the user wants to change the units for visualization purposes
+    if unit_start == unit_end and unit_end != 'std_metric':
+        return val
+    multiplier, divisor = unit_factors(unit_start, unit_end)
+    return val * multiplier / divisor
+
+
+def unit_factors(unit_start, unit_end):
+    """
+    Returns (multiplier, divisor) such that a value in unit_start times multiplier divided by divisor is the value in
+    unit_end ('std_metric' for the standard metric unit of the family). Capacity units are not handled here.
+    """
+    try:
+        return _factor_cache[unit_start, unit_end]
+    except KeyError:
+        pass
+    if unit_start not in unit_family:
+        # Handle case during object initialization when everything will be converted to standard metric units
+        if unit_end == 'std_metric':
+            raise ConversionError("Problem converting unit %s during __init__" % unit_start)
+        raise ConversionError("Start unit, %s, not found." % unit_start)
+    family = unit_family[unit_start]
+    if unit_end == 'std_metric':
+        factors = 1, family[unit_start]
+    elif unit_end in family:
+        factors = family[unit_end], family[unit_start]
+    else:
+        raise KeyError("End unit not found: stu=%s eu=%s" % (unit_start, unit_end))
+    _factor_cache[unit_start, unit_end] = factors
+    return factors
+
+
+def convert_capacity(val, unit_start, unit_end, voltage=None):
+    """
+    Converts a battery capacity between Wh and mAh ('std_metric' is Wh). The voltage is required for any conversion
+    between the two units.
+    """
+    if unit_end == 'std_metric':
+        if unit_start == 'mAh' and voltage is None:
+            raise CapacityConvError("If inputting capacity as mAh must give voltage or num cells")
+        return val / capacity_per_wh(unit_start, voltage)
     if unit_start == unit_end:
-        return float(val)
-    elif unit_start in capacity_per_Wh.keys() and voltage is None:
+        return val
+    if unit_start in capacity_units and voltage is None:
         raise CapacityConvError("If converting mAh <--> Wh, must give voltage.")
-    else:
-        try:
-            for d in unit_list_of_dict:
-                if unit_start in d.keys():
-                    unit_start_conv = d[unit_start]
-                    unit_end_conv = d[unit_end]
-                    val_end = float(val) * unit_end_conv / unit_start_conv
-                    return val_end
-            raise ValueError("Start unit, %s, not found." % unit_start)
-        except ValueError as error:
-            print error
-        except KeyError:
-            print "End unit not found: stu=%s eu=%s" % (unit_start, unit_end)
-            raise
+    if unit_start not in capacity_units and unit_start not in unit_family:
+        raise ConversionError("Start unit, %s, not found." % unit_start)
+    if unit_start not in capacity_units or unit_end not in capacity_units:
+        raise KeyError("End unit not found: stu=%s eu=%s" % (unit_start, unit_end))
+    return val * capacity_per_wh(unit_end, voltage) / capacity_per_wh(unit_start, voltage)
+
+
+def capacity_per_wh(unit, voltage):
+    """
+    Number of 'unit' (Wh or mAh) per Wh for a battery of the given voltage.
+    """
+    if unit == 'Wh':
+        return 1
+    return _as_float(voltage)/1000
+
+
+def _as_float(val):
+    # NumPy arrays are converted element-wise. NumPy is not imported here so that this module does not depend on it.
+    if hasattr(val, 'dtype'):
+        return val.astype(float)
+    return float(val)
 
 
 def interp(x, y, xint):
@@ -17,6 +17,24 @@ rcParams.update({'figure.autolayout': True})
 from mpl_toolkits.mplot3d import Axes3D
 
 
+# Colours of the first Pareto fronts when the designs are coloured by front. Designs beyond these fronts are blue.
+front_colours = ['r', 'orange', 'y', 'g']
+
+
+def point_colour(alt, by_front):
+    """
+    Returns the plot colour of an alternative. Non-dominated alternatives are red and dominated ones blue, unless the
+    designs are coloured by Pareto front (see front_colours).
+    """
+    if by_front:
+        if 0 < alt.front <= len(front_colours):
+            return front_colours[alt.front-1]
+        return 'b'
+    if alt.pareto:
+        return 'r'
+    return 'b'
+
+
 class Tradespace(Toplevel):
     def __init__(self, master):
         Toplevel.__init__(self, master)
@@ -29,12 +47,14 @@ class Tradespace(Toplevel):
 
         # Load alternatives from oo_quad_GUI.AlternativesFrame
         self.f_alts = self.master.f_alternatives
-        self.alts = self.master.alternatives
 
         # Load vehicle performance attribute info
         self.attr_dict = Vehicle.perf_attr_dict
         self.attr_names = Vehicle.perf_attr_names
 
+        # Whether the plots colour the designs by Pareto front rather than only marking the non-dominated ones
+        self.by_front_var = IntVar()
+
         # Create mainframe and subframes
         self.mainframe = ttk.Frame(self, padding=5)
         self.env_frame = EnvelopePlot(self)
@@ -53,11 +73,14 @@ class Tradespace(Toplevel):
         self.var_distr_var.set(1)
         self.var_distr_check = ttk.Checkbutton(self.button_frame, variable=self.var_distr_var,
                                                text='1 Perf Requirement for all Alts', command=self.plot_selected)
+        self.by_front_check = ttk.Checkbutton(self.button_frame, variable=self.by_front_var,
+                                              text='Colour by Pareto front', command=self.colour_by_front)
 
         # Place everything
         self.plot_select_label.pack()
         self.env_frame_check.pack(pady=5)
         self.var_distr_check.pack(pady=5)
+        self.by_front_check.pack(pady=5)
         self.close_button.pack(side=RIGHT, padx='3 5')
         self.new_ts_win.pack(side=RIGHT, padx='5 3')
 
@@ -77,6 +100,13 @@ class Tradespace(Toplevel):
             self.var_distr_frame.pack(side=LEFT, fill=BOTH, expand=1)
         self.button_frame.pack(fill=Y, side=RIGHT)
 
+    def colour_by_front(self):
+        if self.by_front_var.get():
+            # Only the fronts that get their own colour need to be sorted out
+            self.master.set_front_ranks(len(front_colours))
+        self.env_frame.plot3d()
+        self.var_distr_frame.plot()
+
     def open_ts_win(self):
         Tradespace(self.master)
 
@@ -217,10 +247,7 @@ class EnvelopePlot(ttk.Frame):
             x.append(convert_unit(xattr['value'], xattr['unit'], xvar_unit))
             y.append(convert_unit(yattr['value'], yattr['unit'], yvar_unit))
             z.append(convert_unit(zattr['value'], zattr['unit'], zvar_unit))
-            if alt.pareto:
-                c.append('r')
-            else:
-                c.append('b')
+            c.append(point_colour(alt, self.master.by_front_var.get()))
 
         self.ax3d.clear()
         if self.pt3Dshow_var.get():
@@ -325,10 +352,7 @@ class VariableDistrPlot(ttk.Frame):
         for alt in self.f_alts_sorted:
             attr_val = getattr(alt, attr_name)
             attr_vals.append(convert_unit(attr_val['value'], attr_val['unit'], attr_unit))
-            if alt.pareto:
-                c.append('r')
-            else:
-                c.append('b')
+            c.append(point_colour(alt, self.master.by_front_var.get()))
 
         self.ax.clear()
         self.ax.scatter(num_alt_range, attr_vals, c=c, picker=True)
@@ -337,11 +361,16 @@ class VariableDistrPlot(ttk.Frame):
         self.ax.set_ylabel(self.attr2plot_var.get()+' ('+attr_unit+')')
         self.ax.set_ylim([0, np.ceil(max(attr_vals))])
         self.ax.set_xlim([0, max(num_alt_range)+1])
-        red_marker, = self.ax.plot(range(1), range(1), color='white', marker='o', markerfacecolor='red',
-                                   label='Non-dominated alt')
-        blue_marker, = self.ax.plot(range(1), range(1), color='white', marker='o', markerfacecolor='blue',
-                                    label='Dominated alt')
-        self.ax.legend(handles=[red_marker, blue_marker], numpoints=1, loc=4)
+        if self.master.by_front_var.get():
+            legend_entries = [(colour, 'Front %d' % (i+1)) for i, colour in enumerate(front_colours)]
+            legend_entries.append(('b', 'Front %d+' % (len(front_colours)+1)))
+        else:
+            legend_entries = [('r', 'Non-dominated alt'), ('b', 'Dominated alt')]
+        markers = []
+        for colour, label in legend_entries:
+            marker, = self.ax.plot(range(1), range(1), color='white', marker='o', markerfacecolor=colour, label=label)
+            markers.append(marker)
+        self.ax.legend(handles=markers, numpoints=1, loc=4)
 
         # When the user selects a point, display information about the datapoint (i.e., alternative) selected in a new
         # toplevel defined by the DisplayAlternative class.
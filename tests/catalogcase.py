@@ -0,0 +1,42 @@
+import glob
+import os
+import shelve
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'masr_design_tool'))
+
+import catalogdb
+import dblocation
+
+"""
+Base test case for the tests that read the component catalogs. The shipped databases are copied to a temporary folder
+so that the catalog file and its snapshots are not written next to the package.
+"""
+
+
+class CatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for filename in glob.glob(os.path.join(dblocation.db_location, '*db.*')):
+            shutil.copy(filename, self.folder)
+        self.catalog_file = catalogdb.catalog_file
+        catalogdb.catalog_file = os.path.join(self.folder, 'catalogs.sqlite')
+        self.pmaterials = self.shelf_values('printingmaterialdb')
+
+    def tearDown(self):
+        catalogdb.invalidate()
+        catalogdb.catalog_file = self.catalog_file
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def shelf_values(self, name):
+        """
+        Returns the objects of the copy of the shipped shelve database 'name'.
+        """
+        db = shelve.open(os.path.join(self.folder, name), 'r')
+        try:
+            return db.values()
+        finally:
+            db.close()
@@ -0,0 +1,105 @@
+import itertools
+import random
+import unittest
+from collections import Counter
+
+import catalogcase
+
+import alternatives_new
+import batchsizing
+from vehicle import Vehicle
+
+"""
+Checks that the batch sizing path (batch_is_feasible on a batchsizing.ComponentMatrix, worker processes, pruning, and
+memoization) gives every alternative the same verdict, first reason for failure, and performance as sizing it on its
+own with is_feasible.
+"""
+
+platforms = ['Quadmultipiece', 'Quadonepiece']
+
+
+class Sensor(object):
+    weight = {'value': 0.5, 'unit': 'N'}
+
+
+def outcome(alt):
+    """
+    Returns what the search found out about an alternative: its platform and components, and either its (reason for
+    failure, failed value) or its performance and geometry.
+    """
+    if alt.feasible is True:
+        result = tuple(getattr(alt, attr)['value'] for attr in Vehicle.perf_attr_names + ['hub_xdim', 'hub_ydim',
+                                                                                          'arm_len'])
+    else:
+        result = alt.feasible
+    return alt.__class__.__name__, alt.pmcombo.name, alt.battery.name, alt.pmaterial.name, result
+
+
+def reason_counts(alternatives):
+    return Counter(True if alt.feasible is True else alt.feasible[0] for alt in alternatives)
+
+
+class BatchSizingTest(catalogcase.CatalogTestCase):
+    def setUp(self):
+        catalogcase.CatalogTestCase.setUp(self)
+        # A sample of requirements which, between them, reject alternatives for every reason
+        grid = list(itertools.product([5, 12], [-100, 0, 15], [7, 40], [0.8, 2.0], ['Normal', 'Acrobatic'],
+                                      [0.13, 0.17, 0.5], [0, 30], [[], [Sensor()]], [0, 1]))
+        self.grid = [[endurance, payload, max_weight, max_size, maneuverability, printer, printer, printer,
+                      build_time, sensors, self.pmaterials, cover_flag]
+                     for endurance, payload, max_weight, max_size, maneuverability, printer, build_time, sensors,
+                     cover_flag in random.Random(0).sample(grid, 40)]
+        # The memoized component matrix is kept between searches, it must not be taken from another test's catalogs
+        alternatives_new._last_matrix.update(key=None, matrix=None)
+        self.addCleanup(alternatives_new._last_matrix.update, key=None, matrix=None)
+
+    def test_batch_matches_scalar(self):
+        reasons = set()
+        for constraints in self.grid:
+            scalar = alternatives_new.generate_alternatives(constraints, platforms, batch=False)
+            batch = alternatives_new.generate_alternatives(constraints, platforms, batch=True)
+            self.assertEqual(map(outcome, batch), map(outcome, scalar))
+            reasons.update(reason_counts(scalar))
+        self.assertEqual(reasons, set([True] + batchsizing.fail_reasons[1:]))
+
+    def test_processes(self):
+        for constraints in self.grid[:5]:
+            scalar = alternatives_new.generate_alternatives(constraints, platforms, batch=False)
+            pooled = alternatives_new.generate_alternatives(constraints, platforms, processes=2)
+            self.assertEqual(map(outcome, pooled), map(outcome, scalar))
+            store = alternatives_new.store_alternatives(constraints, platforms, processes=2, shard_size=50)
+            self.assertEqual(sorted(map(outcome, store.feasible)),
+                             sorted(outcome(alt) for alt in scalar if alt.feasible is True))
+
+    def test_pruned_memoized_store(self):
+        # The same matrix is reused for every search, only the thresholds change
+        for constraints in self.grid:
+            scalar = alternatives_new.generate_alternatives(constraints, platforms, batch=False)
+            store = alternatives_new.store_alternatives(constraints, platforms, prune=True, memoize=True)
+            self.assertEqual(sorted(map(outcome, store.feasible)),
+                             sorted(outcome(alt) for alt in scalar if alt.feasible is True))
+            counts = reason_counts(scalar)
+            self.assertEqual(len(store), len(scalar))
+            self.assertEqual(store.stats.n_feasible, counts.pop(True, 0))
+            self.assertEqual(store.stats.counts, dict(counts))
+            # The failures that were not pruned can still be built as vehicle objects
+            scalar_outcomes = set(map(outcome, scalar))
+            for k in range(0, store.n_stored_failures, 7):
+                self.assertIn(outcome(store.vehicle(k)), scalar_outcomes)
+
+    def test_is_feasible_matches_batch_is_feasible(self):
+        # Sizes every triple of the matrix directly with both methods of each platform
+        matrix = batchsizing.ComponentMatrix(*alternatives_new.load_components() + (self.pmaterials,))
+        pm, bat, mat = matrix.triples()
+        for constraints in self.grid:
+            for platform in platforms:
+                platform_cls = getattr(__import__(platform.lower()), platform)
+                result = platform_cls.batch_is_feasible(matrix, constraints)
+                for i in range(len(pm)):
+                    vehicle = platform_cls(matrix.pmcombos[pm[i]], matrix.batteries[bat[i]], matrix.pmaterials[mat[i]])
+                    feasibility, performance, geometry = vehicle.is_feasible(constraints)
+                    self.assertEqual(result.outcome(i), (feasibility, performance, geometry))
+
+
+if __name__ == '__main__':
+    unittest.main()
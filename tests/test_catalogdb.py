@@ -0,0 +1,128 @@
+import glob
+import os
+import shelve
+import subprocess
+import sys
+import unittest
+
+import catalogcase
+
+import catalogdb
+
+"""
+Checks the SQLite catalog store: transactions, the copy of the shipped shelve databases into the catalog file, and the
+in-memory catalogs of load_catalog.
+"""
+
+
+def attributes(obj):
+    """
+    Returns the attributes of 'obj' as nested dictionaries, so that two copies of a component compare equal.
+    """
+    if hasattr(obj, '__dict__'):
+        return (obj.__class__.__name__, dict((attr, attributes(value)) for attr, value in vars(obj).items()))
+    if isinstance(obj, dict):
+        return dict((key, attributes(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return [attributes(value) for value in obj]
+    return obj
+
+
+class CatalogTest(catalogcase.CatalogTestCase):
+    def shelf_items(self, name):
+        db = shelve.open(os.path.join(self.folder, name), 'r')
+        try:
+            return dict((obj_name, db[obj_name]) for obj_name in db.keys())
+        finally:
+            db.close()
+
+    def snapshot_of(self, catalog):
+        return catalog.keys(), [attributes(obj) for obj in catalog.values()], catalog.version(), catalog.curves()
+
+    def test_nested_transaction_rollback(self):
+        catalog = catalogdb.Catalog('propmotorcombodb')
+        self.addCleanup(catalog.close)
+        before = self.snapshot_of(catalog)
+        names = catalog.keys()
+        combo = catalog[names[0]]
+        try:
+            with catalog.transaction():
+                catalog['new combo'] = combo
+                del catalog[names[1]]
+                with catalog.transaction():
+                    catalog.update([(names[2], combo)])
+                    catalog.rename(names[3], 'renamed combo')
+                    raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.snapshot_of(catalog), before)
+        # Also as seen from a new connection and from the in-memory catalog
+        other = catalogdb.Catalog('propmotorcombodb')
+        self.addCleanup(other.close)
+        self.assertEqual(self.snapshot_of(other), before)
+        self.assertEqual(catalogdb.load_catalog('propmotorcombodb').keys(), names)
+
+        # The same writes without the error are committed
+        with catalog.transaction():
+            del catalog[names[1]]
+            with catalog.transaction():
+                catalog.rename(names[3], 'renamed combo')
+        self.assertEqual(other.keys(), [names[0], names[2], 'renamed combo'] + names[4:])
+        self.assertTrue(other.version() > before[2])
+
+    def test_migrate_shelves(self):
+        shelves = sorted(set(os.path.splitext(os.path.basename(filename))[0]
+                             for filename in glob.glob(os.path.join(self.folder, '*db.*'))))
+        # Write over the catalogs first, the shelves must replace what the catalog file holds
+        for name in shelves:
+            catalog = catalogdb.Catalog(name)
+            try:
+                catalog.update([('extra', catalog.values()[0])])
+            finally:
+                catalog.close()
+
+        copied = catalogdb.migrate_shelves(shelves)
+        for name in shelves:
+            items = self.shelf_items(name)
+            self.assertEqual(copied[name], len(items))
+            catalog = catalogdb.Catalog(name)
+            try:
+                self.assertEqual(sorted(catalog.keys()), sorted(items))
+                for obj_name, obj in catalog.items():
+                    self.assertEqual(attributes(obj), attributes(items[obj_name]))
+                if name == 'propmotorcombodb':
+                    self.assertEqual(catalog.curves(), dict(
+                        (obj_name, (obj.thrust_vec['value'], obj.current_vec['value']))
+                        for obj_name, obj in items.items()))
+            finally:
+                catalog.close()
+
+    def test_load_catalog_reloads(self):
+        snapshot = catalogdb.load_catalog('batterydb')
+        self.assertIs(catalogdb.load_catalog('batterydb'), snapshot)
+        name = snapshot.keys()[0]
+
+        # A write through a Catalog of this process
+        catalog = catalogdb.Catalog('batterydb')
+        try:
+            battery = catalog[name]
+            battery.weight = {'value': 99.0, 'unit': 'N'}
+            catalog[name] = battery
+        finally:
+            catalog.close()
+        reloaded = catalogdb.load_catalog('batterydb')
+        self.assertIsNot(reloaded, snapshot)
+        self.assertEqual(reloaded[name].weight['value'], 99.0)
+        self.assertEqual(dict(reloaded.column('weight'))[name], 99.0)
+
+        # A write by another process
+        script = ('import sys; sys.path.insert(0, %r); import catalogdb; catalog = catalogdb.Catalog("batterydb", %r); '
+                  'del catalog[%r]; catalog.close()' % (os.path.dirname(catalogdb.__file__), catalogdb.catalog_file,
+                                                        name))
+        subprocess.check_call([sys.executable, '-c', script])
+        self.assertNotIn(name, catalogdb.load_catalog('batterydb'))
+        self.assertEqual(catalogdb.load_catalog('batterydb').keys(), reloaded.keys()[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
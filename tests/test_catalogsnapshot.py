@@ -0,0 +1,98 @@
+import os
+import unittest
+
+import numpy as np
+
+import catalogcase
+
+import alternatives_new
+import batchsizing
+import catalogdb
+import catalogsnapshot
+
+"""
+Checks the catalog snapshots: the ComponentMatrix read from them matches the one built from the component objects,
+a write to a catalog gives a new snapshot in place of the old one, and the component names survive the round trip.
+"""
+
+# The ComponentMatrix arrays that are read from the snapshots or worked out from them
+matrix_arrays = batchsizing.ComponentMatrix.pmcombo_columns + ['bat_weight', 'bat_voltage', 'bat_capacity_wh',
+                                                                  'bat_capacity', 'pmat_density', 'pair_pm', 'pair_bat']
+
+
+class SnapshotTest(catalogcase.CatalogTestCase):
+    def assertSameMatrix(self, matrix, expected):
+        for attr in matrix_arrays:
+            # The padding of the current tables is nan, which assert_array_equal takes as equal
+            np.testing.assert_array_equal(getattr(matrix, attr), getattr(expected, attr), attr)
+        for components in ['pmcombos', 'batteries']:
+            self.assertEqual([obj.name for obj in getattr(matrix, components)],
+                             [obj.name for obj in getattr(expected, components)])
+
+    def test_matrix_matches_objects(self):
+        pmcombos, batteries = alternatives_new.load_components()
+        expected = batchsizing.ComponentMatrix(pmcombos, batteries, self.pmaterials)
+        self.assertSameMatrix(alternatives_new.snapshot_matrix(self.pmaterials), expected)
+
+        # Every battery, not only the compatible ones
+        batteries = catalogdb.load_catalog('batterydb').values()
+        expected = batchsizing.ComponentMatrix(pmcombos, batteries, self.pmaterials)
+        matrix = catalogsnapshot.component_matrix(self.pmaterials)
+        self.assertSameMatrix(matrix, expected)
+        self.assertIsInstance(matrix.thrust_table, np.memmap)
+        self.assertEqual(len(matrix.pair_pm), len(expected.pair_pm))
+
+    def test_new_version(self):
+        root = catalogsnapshot.snapshot_folder()
+        old = catalogsnapshot.load_columns('batterydb')
+        self.assertEqual(sorted(name for name in os.listdir(root) if name.startswith('batterydb')),
+                         ['batterydb-%d' % old.version])
+        self.assertIs(catalogsnapshot.load_columns('batterydb'), old)
+
+        catalog = catalogdb.Catalog('batterydb')
+        try:
+            name = catalog.keys()[0]
+            battery = catalog[name]
+            battery.weight = {'value': 99.0, 'unit': 'N'}
+            catalog[name] = battery
+            version = catalog.version()
+        finally:
+            catalog.close()
+        new = catalogsnapshot.load_columns('batterydb')
+        self.assertEqual(new.version, version)
+        self.assertNotEqual(new.version, old.version)
+        self.assertEqual(sorted(name for name in os.listdir(root) if name.startswith('batterydb')),
+                         ['batterydb-%d' % version])
+        self.assertFalse(os.path.exists(old.folder))
+        self.assertEqual(new.column('weight')[new.names.tolist().index(name)], 99.0)
+        # The other catalogs keep their snapshots
+        pm_snapshot = catalogsnapshot.load_columns('propmotorcombodb')
+        catalogsnapshot.load_columns('batterydb')
+        self.assertTrue(os.path.exists(pm_snapshot.folder))
+
+    def test_non_ascii_names(self):
+        catalog = catalogdb.Catalog('batterydb')
+        try:
+            renamed = catalog[catalog.keys()[0]]
+            catalog.rename(renamed.name, u'Akku Gr\xf6\xdfe 3S \u26a1'.encode('utf-8'))
+            renamed.name = u'Akku Gr\xf6\xdfe 3S \u26a1'.encode('utf-8')
+            catalog[renamed.name] = renamed
+            battery = catalog[catalog.keys()[1]]
+            battery.name = u'\u30d0\u30c3\u30c6\u30ea\u30fc'.encode('utf-8')
+            catalog[battery.name] = battery
+        finally:
+            catalog.close()
+
+        snapshot = catalogsnapshot.load_columns('batterydb')
+        db = catalogdb.load_catalog('batterydb')
+        self.assertEqual(snapshot.names.tolist(), db.keys())
+        batteries = catalogsnapshot.ComponentList('batterydb', snapshot.names)
+        for i, obj_name in enumerate(db.keys()):
+            self.assertIs(batteries[i], db[obj_name])
+        self.assertEqual([battery.name for battery in batteries], db.keys())
+        self.assertEqual(db.keys()[0], renamed.name)
+        self.assertIn(battery.name, db.keys())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from collections import OrderedDict
+
+import catalogcase
+
+import alternatives_new
+
+"""
+Regression check of the dominance-safe pre-filter (batchsizing.ComponentSkyline): a search that leaves out the
+dominated components must find exactly the same Pareto designs as the full search.
+"""
+
+performance_attrs = OrderedDict([('max_endurance', 'high'), ('max_payload', 'high'), ('weight', 'low'),
+                                 ('max_dimension', 'low'), ('build_time', 'low')])
+
+
+def pareto_designs(store):
+    """
+    Returns the set of (platform, name) of the Pareto designs among the feasible alternatives of 'store'.
+    """
+    feasible = store.feasible
+    on_front = alternatives_new.pareto_mask(alternatives_new.objective_matrix(feasible, performance_attrs.keys()),
+                                            performance_attrs.values())
+    return set((alt.__class__.__name__, alt.name) for alt, pareto in zip(feasible, on_front) if pareto)
+
+
+class DominanceSafeTest(catalogcase.CatalogTestCase):
+    def test_same_pareto_designs(self):
+        platforms = ['Quadmultipiece', 'Quadonepiece']
+        for endurance, payload, max_weight, max_size, printer in [(8, 0, 20, 2.0, 0.3), (2, 1, 40, 0.5, 0.15),
+                                                                   (15, 4, 40, 2.0, 0.3)]:
+            constraints = [endurance, payload, max_weight, max_size, 'Normal', printer, printer, printer, 30, [],
+                           self.pmaterials, 0]
+            full = alternatives_new.store_alternatives(constraints, platforms, prune=True)
+            safe = alternatives_new.store_alternatives(constraints, platforms, prune=True, dominance_safe=True)
+            self.assertEqual(pareto_designs(safe), pareto_designs(full))
+
+
+if __name__ == '__main__':
+    unittest.main()
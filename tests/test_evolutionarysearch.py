@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+import catalogcase
+
+import alternatives_new
+import evolutionarysearch
+from vehicle import Vehicle
+
+"""
+Checks the evolutionary search against the full factorial search on the shipped catalog: the designs it keeps are
+feasible Pareto designs of the whole design space, and its hypervolume never goes down.
+"""
+
+platforms = ['Quadmultipiece', 'Quadonepiece']
+
+
+def design(alt):
+    return alt.__class__.__name__, alt.pmcombo.name, alt.battery.name, alt.pmaterial.name
+
+
+def performance(alternatives):
+    return alternatives_new.objective_matrix(alternatives, Vehicle.perf_attr_names)
+
+
+class EvolutionarySearchTest(catalogcase.CatalogTestCase):
+    def setUp(self):
+        catalogcase.CatalogTestCase.setUp(self)
+        # Loose requirements, so that most of the designs are feasible and the Pareto set is large
+        self.constraints = [5, 0, 40, 2.0, 'Normal', 0.5, 0.5, 0.5, 30, [], self.pmaterials, 0]
+
+    def test_archive(self):
+        full = alternatives_new.store_alternatives(self.constraints, platforms)
+        on_front = alternatives_new.pareto_mask(performance(full.feasible), evolutionarysearch.performance_directions)
+        pareto = dict((design(alt), alt) for alt, keep in zip(full.feasible, on_front.tolist()) if keep)
+        self.assertEqual(evolutionarysearch.design_space_size(self.constraints, platforms), len(full))
+
+        for seed in range(3):
+            archive, search = evolutionarysearch.search_alternatives(self.constraints, platforms, generations=10,
+                                                                     population_size=20, seed=seed)
+            self.assertTrue(archive)
+            self.assertTrue(len(search.memo) < len(full))
+            # Feasible, not dominated by each other, and Pareto designs of the whole design space, with the same
+            # performance as the full factorial search found
+            self.assertTrue(all(alt.feasible is True for alt in archive))
+            self.assertTrue(alternatives_new.pareto_mask(performance(archive),
+                                                         evolutionarysearch.performance_directions).all())
+            for alt in archive:
+                self.assertIn(design(alt), pareto)
+                self.assertEqual([getattr(alt, attr)['value'] for attr in Vehicle.perf_attr_names],
+                                 [getattr(pareto[design(alt)], attr)['value'] for attr in Vehicle.perf_attr_names])
+
+            hypervolumes = [stats.hypervolume for stats in search.history]
+            self.assertEqual(len(hypervolumes), 11)
+            self.assertTrue(hypervolumes[-1] > 0)
+            self.assertTrue(all(np.diff(hypervolumes) >= 0))
+
+            # The store of the search counts every design it sized
+            store = search.store()
+            self.assertEqual(map(design, store.feasible), map(design, archive))
+            self.assertEqual(len(store), len(search.memo))
+            self.assertEqual(store.stats.n_feasible + store.n_stored_failures, len(search.memo))
+            infeasible = [store.vehicle(k) for k in range(store.n_stored_failures)]
+            self.assertTrue(all(alt.feasible is not True for alt in infeasible))
+            self.assertEqual(sum(store.stats.counts.values()), len(infeasible))
+
+    def test_infeasible(self):
+        # Nothing can carry this payload: the archive stays empty and so does the hypervolume
+        self.constraints[1] = 1000
+        archive, search = evolutionarysearch.search_alternatives(self.constraints, platforms, generations=3,
+                                                                 population_size=10, seed=0)
+        self.assertEqual(archive, [])
+        self.assertEqual([stats.hypervolume for stats in search.history], [0.0] * 4)
+        self.assertEqual(len(search.store()), len(search.memo))
+
+
+if __name__ == '__main__':
+    unittest.main()
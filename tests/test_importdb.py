@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import catalogcase
+from test_catalogdb import attributes
+
+import catalogdb
+import export
+import importdb
+import tools
+
+"""
+Checks importdb.import_components: the CSV files written by Exportdb import again as they are, a file with problems is
+imported all-or-nothing unless skip_invalid is set, and prop/motor combo test points are grouped by motor and propeller.
+"""
+
+
+class Value(object):
+    """
+    Stand-in for the Tkinter variables of the Exportdb window.
+    """
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class ExportWindow(object):
+    """
+    Stand-in for an Exportdb window with every database in 'db_names' checked.
+    """
+    master = None
+
+    def __init__(self, db_names):
+        self.db_dict = OrderedDict((db_name, db_name) for db_name in db_names)
+        self.checkvar_list = [Value(1) for _ in db_names]
+        self.messagevar = Value()
+
+    def lift(self):
+        pass
+
+
+class ImportTest(catalogcase.CatalogTestCase):
+    def setUp(self):
+        catalogcase.CatalogTestCase.setUp(self)
+        self.files = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.files, True)
+
+    def write_file(self, filename, lines):
+        filename = os.path.join(self.files, filename)
+        with open(filename, 'wb') as csv_file:
+            csv_file.write('\r\n'.join(lines) + '\r\n')
+        return filename
+
+    def catalog_items(self, db_name, path=None):
+        catalog = catalogdb.Catalog(db_name, path)
+        try:
+            return catalog.keys(), [attributes(obj) for obj in catalog.values()]
+        finally:
+            catalog.close()
+
+    def test_export_round_trip(self):
+        # The prop/motor combo export is left out: the shipped combos have no test points to write
+        db_names = ['batterydb', 'motordb', 'propellerdb', 'sensordb']
+        askdirectory = export.tkFileDialog.askdirectory
+        export.tkFileDialog.askdirectory = lambda **kwargs: self.files
+        try:
+            export.Exportdb.export.im_func(ExportWindow(db_names))
+        finally:
+            export.tkFileDialog.askdirectory = askdirectory
+
+        # A new catalog file, in a folder of its own so that the CSV files are not taken for shelve databases
+        new_file = os.path.join(self.files, 'new', 'catalogs.sqlite')
+        os.mkdir(os.path.dirname(new_file))
+        for db_name in db_names:
+            keys, objs = self.catalog_items(db_name)
+            n_imported, errors = importdb.import_components(db_name, os.path.join(self.files, db_name + '.csv'),
+                                                            path=new_file)
+            self.assertEqual((n_imported, errors), (len(keys), []))
+            self.assertEqual(self.catalog_items(db_name, new_file), (keys, objs))
+
+    def test_all_or_nothing(self):
+        before = self.catalog_items('sensordb')
+        existing = before[0][0]
+        filename = self.write_file('sensors.csv', [
+            'Name,Weight (lbf),XDim (in),YDim (in),ZDim (in),Required Layer,Required Orientation',
+            'Camera,0.5,2,2,1,top,forward',
+            'Lidar,heavy,3,3,2,,',
+            '%s,0.1,1,1,1,bottom,' % existing,
+            'Sonar,0.2,1,1,1,sideways,'])
+        n_imported, errors = importdb.import_components('sensordb', filename)
+        self.assertEqual(n_imported, 0)
+        self.assertEqual([error.row for error in errors], [3, 4, 5])
+        self.assertEqual(self.catalog_items('sensordb'), before)
+
+        n_imported, errors = importdb.import_components('sensordb', filename, skip_invalid=True)
+        self.assertEqual(n_imported, 1)
+        self.assertEqual([error.row for error in errors], [3, 4, 5])
+        catalog = catalogdb.load_catalog('sensordb')
+        self.assertEqual(catalog.keys(), before[0] + ['Camera'])
+        self.assertAlmostEqual(catalog['Camera'].weight['value'], tools.convert_unit(0.5, 'lbf', 'N'))
+        self.assertEqual(attributes(catalog[existing]), before[1][0])
+
+        # Overwriting an existing component is not a problem
+        n_imported, errors = importdb.import_components('sensordb', filename, overwrite=True, skip_invalid=True)
+        self.assertEqual((n_imported, [error.row for error in errors]), (2, [3, 5]))
+        self.assertEqual(catalogdb.load_catalog('sensordb')[existing].req_layer, 'bottom')
+
+    def test_pmcombo_groups(self):
+        header = 'Motor,Propeller,Test Battery Voltage (V),Current (A),Voltage (V),Power (W),RPM,Throttle,Thrust (N)'
+        filename = self.write_file('combos.csv', [
+            header,
+            'DJI 2212,GWS-2-8-3.8,11.1,1.0,11.0,11.0,3000,25,1.0',
+            'Gartt-ML2212,GWS-2-9-4.7,11.1,2.0,11.0,22.0,4000,50,2.0',
+            'DJI 2212,GWS-2-8-3.8,11.1,3.0,10.9,32.7,5000,50,3.0',
+            'Gartt-ML2212,GWS-2-9-4.7,11.1,4.0,10.8,43.2,6000,100,4.5',
+            'DJI 2212,GWS-2-8-3.8,11.1,5.0,10.8,54.0,6000,100,5.0'])
+        new_file = os.path.join(self.files, 'catalogs.sqlite')
+        # The motors and propellers are looked up in the databases of the target catalog file
+        for db_name in ['motordb', 'propellerdb']:
+            catalog = catalogdb.Catalog(db_name)
+            try:
+                objs = catalog.items()
+            finally:
+                catalog.close()
+            new_catalog = catalogdb.Catalog(db_name, new_file)
+            try:
+                new_catalog.update(objs)
+            finally:
+                new_catalog.close()
+
+        n_imported, errors = importdb.import_components('propmotorcombodb', filename, path=new_file)
+        self.assertEqual((n_imported, errors), (2, []))
+        catalog = catalogdb.Catalog('propmotorcombodb', new_file)
+        try:
+            self.assertEqual(catalog.keys(), ['DJI 2212/GWS-2-8-3.8', 'Gartt-ML2212/GWS-2-9-4.7'])
+            first, second = catalog.values()
+            self.assertEqual(first.current_vec['value'], [1.0, 3.0, 5.0])
+            self.assertEqual(first.thrust_vec['value'], [1.0, 3.0, 5.0])
+            self.assertEqual(first.rpm_vec, [3000.0, 5000.0, 6000.0])
+            self.assertEqual(first.test_bat_volt_rating['value'], 11.1)
+            self.assertEqual(first.motor.name, 'DJI 2212')
+            self.assertEqual(second.current_vec['value'], [2.0, 4.0])
+            self.assertEqual(second.thrust_vec['value'], [2.0, 4.5])
+            self.assertEqual(second.max_thrust['value'], 4.5)
+            self.assertEqual(catalog.curves()['Gartt-ML2212/GWS-2-9-4.7'], ([2.0, 4.5], [2.0, 4.0]))
+        finally:
+            catalog.close()
+
+        # A group with a problem is reported on its first row, and then nothing is imported
+        filename = self.write_file('bad_combos.csv', [
+            header,
+            'DJI 2212,GWS-2-10-4.5,11.1,1.0,11.0,11.0,3000,25,1.0',
+            'No Such Motor,GWS-2-8-3.8,11.1,1.0,11.0,11.0,3000,25,1.0',
+            'DJI 2212,GWS-2-10-4.5,11.1,3.0,10.9,32.7,5000,50,3.0',
+            'No Such Motor,GWS-2-8-3.8,11.1,3.0,10.9,32.7,5000,50,3.0',
+            'Gartt-ML2212,GWS-2-10-4.5,11.1,2.0,11.0,22.0,4000,50,2.0',
+            'Gartt-ML2212,GWS-2-10-4.5,14.8,4.0,14.6,58.4,6000,100,4.5'])
+        n_imported, errors = importdb.import_components('propmotorcombodb', filename, path=new_file)
+        self.assertEqual(n_imported, 0)
+        self.assertEqual([error.row for error in errors], [3, 6])
+        self.assertIn("Motor 'No Such Motor'", errors[0].message)
+        self.assertIn('one test battery voltage', errors[1].message)
+        self.assertEqual(self.catalog_items('propmotorcombodb', new_file)[0],
+                         ['DJI 2212/GWS-2-8-3.8', 'Gartt-ML2212/GWS-2-9-4.7'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'masr_design_tool'))
+
+import alternatives_new
+
+"""
+Checks alternatives_new.pareto_mask, front_ranks and epsilon_archive against plain O(n^2) pairwise comparisons on random
+objective matrices, including exact ties, duplicate rows, and values that only differ by rounding.
+"""
+
+rel_tol = 1e-09
+
+
+def minimized(objectives, directions):
+    return objectives * np.array([-1.0 if direction == 'high' else 1.0 for direction in directions])
+
+
+def dominates(a, b):
+    """
+    Tells whether row a is better (lower, and not close) than row b in every column.
+    """
+    return all(bj - aj > rel_tol*max(abs(aj), abs(bj)) for aj, bj in zip(a, b))
+
+
+def brute_front_ranks(objectives, directions):
+    """
+    Peels off the non-dominated rows one front at a time.
+    """
+    values = minimized(objectives, directions).tolist()
+    ranks = [0] * len(values)
+    left = range(len(values))
+    front = 0
+    while left:
+        front += 1
+        members = [i for i in left if not any(dominates(values[k], values[i]) for k in left)]
+        for i in members:
+            ranks[i] = front
+        left = [i for i in left if ranks[i] == 0]
+    return ranks
+
+
+def brute_epsilon_archive(objectives, directions, resolutions):
+    """
+    Keeps the alternative closest to the best corner of each box (the first one if several are equally close), and
+    drops every box that another box is at least as good as in every attribute.
+    """
+    scaled = minimized(objectives, directions) / np.array(resolutions, dtype=float)
+    representatives = {}
+    for i, row in enumerate(scaled.tolist()):
+        box = tuple(int(np.floor(v)) for v in row)
+        dist = sum((v - np.floor(v))**2 for v in row)
+        if box not in representatives or dist < representatives[box][0]:
+            representatives[box] = (dist, i)
+    archive = [i for box, (dist, i) in representatives.items()
+               if not any(other != box and all(o <= b for o, b in zip(other, box)) for other in representatives)]
+    return sorted(archive)
+
+
+class ParetoTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.cases = []
+        for n, n_attrs in [(1, 2), (2, 3), (40, 2), (120, 3), (300, 5)]:
+            directions = [['high', 'low'][k % 2] for k in range(n_attrs)]
+            continuous = random.rand(n, n_attrs) * 10
+            # Few distinct values, so that many rows tie in some columns or are duplicates
+            ties = random.randint(0, 4, (n, n_attrs)).astype(float)
+            # Some rows that only differ from another row by rounding
+            rounded = ties.copy()
+            rounded[::3] *= 1 + 1e-12
+            self.cases += [(continuous, directions), (ties, directions), (rounded, directions)]
+
+    def test_pareto_mask(self):
+        for objectives, directions in self.cases:
+            expected = [rank == 1 for rank in brute_front_ranks(objectives, directions)]
+            for block_size in [7, 256]:
+                mask = alternatives_new.pareto_mask(objectives, directions, rel_tol, block_size)
+                self.assertEqual(mask.tolist(), expected)
+
+    def test_front_ranks(self):
+        for objectives, directions in self.cases:
+            expected = np.array(brute_front_ranks(objectives, directions))
+            for block_size in [7, 256]:
+                ranks = alternatives_new.front_ranks(objectives, directions, rel_tol, block_size=block_size)
+                self.assertEqual(ranks.tolist(), expected.tolist())
+                for max_front in [1, 2]:
+                    ranks = alternatives_new.front_ranks(objectives, directions, rel_tol, max_front, block_size)
+                    self.assertEqual(ranks.tolist(), np.minimum(expected, max_front + 1).tolist())
+
+    def test_epsilon_archive(self):
+        for objectives, directions in self.cases:
+            for resolutions in [[1.0] * objectives.shape[1], [0.3 + 0.4*j for j in range(objectives.shape[1])]]:
+                expected = brute_epsilon_archive(objectives, directions, resolutions)
+                for block_size in [7, 256]:
+                    archive = alternatives_new.epsilon_archive(objectives, directions, resolutions, block_size)
+                    self.assertEqual(archive.tolist(), expected)
+
+    def test_empty(self):
+        empty = np.zeros((0, 3))
+        self.assertEqual(len(alternatives_new.pareto_mask(empty, ['high', 'low', 'low'])), 0)
+        self.assertEqual(len(alternatives_new.front_ranks(empty, ['high', 'low', 'low'])), 0)
+        self.assertEqual(len(alternatives_new.epsilon_archive(empty, ['high', 'low', 'low'], [1, 1, 1])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'masr_design_tool'))
+
+import batchsizing
+import tools
+from propmotorcombo import CurrentThrustTable
+
+"""
+Checks the current vs. thrust lookups of propmotorcombo.CurrentThrustTable and batchsizing.batch_interp against
+tools.interp, the scan they replace.
+"""
+
+
+def scan_interp(thrust_vec, current_vec, thrust):
+    """
+    tools.interp, with nan instead of the "Insufficient Data" error (which tools.interp also prints the data for).
+    """
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        return tools.interp(list(thrust_vec), list(current_vec), thrust)
+    except ValueError:
+        return np.nan
+    finally:
+        sys.stdout = stdout
+
+
+def sample_thrusts(thrust_vec):
+    """
+    Thrusts at, close to, between, and outside of the data points.
+    """
+    x = np.sort(thrust_vec)
+    return np.concatenate([x, x + 1e-7, x - 1e-7, (x[1:] + x[:-1]) / 2, [x[0] - 0.5, x[-1] + 0.5, x[-1] + 1e-7]])
+
+
+class CurrentThrustTableTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.curves = []
+        for n in [1, 2, 5, 12]:
+            thrust_vec = np.cumsum(random.rand(n) + 0.1).tolist()
+            current_vec = np.cumsum(random.rand(n)).tolist()
+            self.curves.append((thrust_vec, current_vec))
+
+    def assert_same(self, a, b):
+        self.assertTrue(np.array_equal(np.isnan(a), np.isnan(b)))
+        self.assertTrue(np.array_equal(a[~np.isnan(a)], b[~np.isnan(b)]))
+
+    def test_sorted_data(self):
+        for thrust_vec, current_vec in self.curves:
+            thrusts = sample_thrusts(thrust_vec)
+            expected = np.array([scan_interp(thrust_vec, current_vec, t) for t in thrusts])
+            self.assert_same(CurrentThrustTable(thrust_vec, current_vec).interp_many(thrusts), expected)
+
+    def test_unsorted_data(self):
+        # The table sorts the data by thrust, so it gives what tools.interp gives for the sorted data
+        random = np.random.RandomState(1)
+        for thrust_vec, current_vec in self.curves:
+            order = random.permutation(len(thrust_vec))
+            table = CurrentThrustTable([thrust_vec[i] for i in order], [current_vec[i] for i in order])
+            thrusts = sample_thrusts(thrust_vec)
+            expected = np.array([scan_interp(thrust_vec, current_vec, t) for t in thrusts])
+            self.assert_same(table.interp_many(thrusts), expected)
+
+            # batch_interp on the padded table of the same data
+            x_table, y_table = batchsizing.pad_curves([[thrust_vec[i] for i in order]] + [c[0] for c in self.curves],
+                                                      [[current_vec[i] for i in order]] + [c[1] for c in self.curves])
+            currents, ok = batchsizing.batch_interp(x_table, y_table, np.zeros(len(thrusts), dtype=int), thrusts)
+            self.assert_same(currents, expected)
+            self.assertTrue(np.array_equal(ok, ~np.isnan(expected)))
+
+    def test_out_of_range(self):
+        table = CurrentThrustTable([3.0, 1.0, 2.0], [30.0, 10.0, 20.0])
+        self.assertTrue(np.isnan(table.interp_many([0.5, 3.5])).all())
+        self.assertEqual(table.interp_many(3.0 + 1e-7), 30.0)
+        self.assertEqual(table.interp_many(1.5), 15.0)
+        self.assertEqual(np.shape(table.interp_many(1.5)), ())
+        self.assertTrue(np.isnan(CurrentThrustTable([], []).interp_many([1.0])).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import sys
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'masr_design_tool'))
+
+import alternatives_new
+
+"""
+Checks the ranking methods of alternatives_new (see ranking_methods) against the original scalar TOPSIS scoring and
+against hand-computed examples.
+"""
+
+
+class Design(object):
+    """
+    Stand-in for a feasible vehicle, with its performance attributes as {'value': ...} dictionaries.
+    """
+    pareto = False
+
+    def __init__(self, **attrs):
+        for attr, value in attrs.items():
+            setattr(self, attr, {'value': value})
+
+
+def scalar_topsis(alternatives, weightings):
+    """
+    The TOPSIS closeness as the original score_alternatives computed it, one attribute at a time with Python lists.
+    """
+    wgt_sum = float(sum(val[0] for val in weightings.values()))
+    total_d_pos = [0] * len(alternatives)
+    total_d_neg = [0] * len(alternatives)
+    for perf_attr, (weight, direction) in weightings.items():
+        attr_vals = [getattr(quad, perf_attr)['value'] for quad in alternatives]
+        norm = sum(val**2 for val in attr_vals)**0.5
+        weighted_vals = [weight/wgt_sum*val/norm for val in attr_vals]
+        pos_ideal, neg_ideal = (max(weighted_vals), min(weighted_vals)) if direction == 'high' else \
+            (min(weighted_vals), max(weighted_vals))
+        total_d_pos = [d + (val-pos_ideal)**2 for d, val in zip(total_d_pos, weighted_vals)]
+        total_d_neg = [d + (val-neg_ideal)**2 for d, val in zip(total_d_neg, weighted_vals)]
+    return [neg**0.5/(pos**0.5 + neg**0.5) for pos, neg in zip(total_d_pos, total_d_neg)]
+
+
+class RankingTest(unittest.TestCase):
+    def setUp(self):
+        # Endurance (high is better) and weight (low is better). A is better than C, B is the lightest.
+        self.designs = [Design(max_endurance=10.0, weight=2.0), Design(max_endurance=5.0, weight=1.0),
+                        Design(max_endurance=10.0, weight=4.0)]
+        self.weightings = OrderedDict([('max_endurance', [3, 'high']), ('weight', [1, 'low'])])
+
+    def scores(self, method, designs=None):
+        designs = designs or self.designs
+        alternatives_new.AlternativeScores(designs, self.weightings).rescore(self.weightings, method)
+        return [design.score for design in designs]
+
+    def test_topsis_matches_scalar(self):
+        random = np.random.RandomState(0)
+        weightings = OrderedDict([('max_endurance', [4, 'high']), ('max_payload', [2, 'high']), ('weight', [5, 'low']),
+                                  ('max_dimension', [1, 'low']), ('build_time', [3, 'low'])])
+        designs = [Design(**dict(zip(weightings, row))) for row in (random.rand(50, 5) * 20 + 1).tolist()]
+        alternatives_new.score_alternatives(designs, weightings)
+        self.assertTrue(np.allclose([design.score for design in designs], scalar_topsis(designs, weightings),
+                                    rtol=1e-12, atol=0))
+        self.assertEqual(sum(design.pareto for design in designs),
+                         alternatives_new.pareto_mask(alternatives_new.objective_matrix(designs, weightings.keys()),
+                                                      [direction for weight, direction in weightings.values()]).sum())
+
+    def test_weighted_sum(self):
+        # Utilities: endurance (1, 0, 1), weight (2/3, 1, 0); weights 0.75 and 0.25
+        self.assertTrue(np.allclose(self.scores('weighted sum'), [0.75 + 0.25*2/3.0, 0.25, 0.75]))
+
+    def test_vikor(self):
+        # Group utility (1/12, 3/4, 1/4) and individual regret (1/12, 3/4, 1/4), both scaled to (0, 1, 1/4)
+        self.assertTrue(np.allclose(self.scores('VIKOR'), [1.0, 0.0, 0.75]))
+
+    def test_lexicographic(self):
+        # Endurance first: A and C tie and A is lighter. A copy of A shares its score.
+        designs = self.designs + [Design(max_endurance=10.0, weight=2.0)]
+        self.assertTrue(np.allclose(self.scores('lexicographic', designs), [1.0, 0.0, 1/3.0, 1.0]))
+        self.weightings['weight'][0] = 4
+        self.assertTrue(np.allclose(self.scores('lexicographic', designs), [2/3.0, 1.0, 0.0, 2/3.0]))
+
+    def test_batched_scores(self):
+        random = np.random.RandomState(1)
+        normalized = alternatives_new.normalize_objectives(random.rand(30, 3))
+        directions = ['high', 'low', 'low']
+        samples = random.dirichlet([1, 1, 1], 40)
+        for method, score in alternatives_new.ranking_methods.items():
+            expected = np.array([score(normalized, weights, directions) for weights in samples])
+            batches = list(alternatives_new.batched_scores(normalized, samples, directions, method, max_elements=300))
+            self.assertTrue(len(batches) > 1)
+            self.assertTrue(np.allclose(np.vstack(batches), expected, rtol=1e-12, atol=1e-15))
+
+    def test_best(self):
+        designs = [Design(max_endurance=value, weight=1.0) for value in [3.0, 7.0, 7.0, 1.0, 7.0, 5.0]]
+        scores = alternatives_new.AlternativeScores(designs, self.weightings)
+        scores.rescore(self.weightings, 'weighted sum')
+        for k in range(8):
+            expected = np.argsort(-scores.scores, kind='mergesort')[:k]
+            self.assertEqual(scores.best(k), [designs[i] for i in expected])
+
+
+class WeightSensitivityTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(2)
+        self.weightings = OrderedDict([('max_endurance', [3, 'high']), ('weight', [2, 'low']),
+                                       ('build_time', [1, 'low'])])
+        self.designs = [Design(**dict(zip(self.weightings, row))) for row in (random.rand(6, 3) * 10 + 1).tolist()]
+
+    def test_rank_distribution(self):
+        scores = alternatives_new.AlternativeScores(self.designs, self.weightings)
+        for method in alternatives_new.ranking_methods:
+            sensitivity = scores.weight_sensitivity(self.weightings, n_samples=300, method=method, seed=0)
+            self.assertEqual(sensitivity.n_samples, 300)
+            # Every design gets a rank within max_rank in every sample, and without ties every rank goes to one design
+            self.assertTrue(np.allclose(sensitivity.rank_probs.sum(axis=1), 1))
+            self.assertTrue(np.allclose(sensitivity.rank_probs[:, :len(self.designs)].sum(axis=0), 1))
+            self.assertTrue(np.allclose(sensitivity.prob_top(len(self.designs)), 1))
+
+            # The mean ranks are those of ranking the designs for each sampled weighting one at a time
+            ranks = []
+            for weights in sensitivity.samples:
+                sample_scores = alternatives_new.ranking_methods[method](scores.normalized, weights, scores.directions)
+                ranks.append([1 + (sample_scores > score).sum() for score in sample_scores])
+            self.assertTrue(np.allclose(sensitivity.mean_rank, np.mean(ranks, axis=0)))
+            self.assertTrue(np.allclose(sensitivity.rank_std, np.std(ranks, axis=0)))
+
+    def test_dominating_design(self):
+        # A design that is better in every attribute is ranked first for every weighting, by every method
+        designs = self.designs + [Design(max_endurance=20.0, weight=0.5, build_time=0.5)]
+        scores = alternatives_new.AlternativeScores(designs, self.weightings)
+        for method in alternatives_new.ranking_methods:
+            sensitivity = scores.weight_sensitivity(self.weightings, n_samples=200, method=method, seed=1)
+            self.assertEqual(sensitivity.prob_best.tolist(), [0.0] * len(self.designs) + [1.0])
+            self.assertEqual(sensitivity.mean_rank[-1], 1)
+            self.assertEqual(sensitivity.rank_std[-1], 0)
+            self.assertEqual(sensitivity.most_robust(1).tolist(), [len(self.designs)])
+
+    def test_ties_share_rank(self):
+        designs = self.designs + [Design(max_endurance=20.0, weight=0.5, build_time=0.5) for _ in range(2)]
+        scores = alternatives_new.AlternativeScores(designs, self.weightings)
+        sensitivity = scores.weight_sensitivity(self.weightings, n_samples=50, max_rank=3, seed=2)
+        self.assertEqual(sensitivity.prob_best[-2:].tolist(), [1.0, 1.0])
+        # Nobody is ranked second, the next design is third
+        self.assertEqual(sensitivity.rank_probs[:, 1].sum(), 0)
+        self.assertTrue(np.allclose(sensitivity.rank_probs[:, 2].sum(), 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'masr_design_tool'))
+
+import tools
+
+"""
+Checks tools.convert_unit and tools.convert_capacity on numbers and NumPy arrays.
+"""
+
+
+class ConvertUnitTest(unittest.TestCase):
+    def test_families(self):
+        values = np.array([0.0, 1.5, 42.0, -3.25])
+        for family in tools.unit_families:
+            for unit_start in family:
+                for unit_end in family:
+                    # Converting to the same unit leaves the value as it is
+                    expected = [float(v) if unit_end == unit_start else float(v) * family[unit_end] / family[unit_start]
+                                for v in values]
+                    self.assertEqual([tools.convert_unit(v, unit_start, unit_end) for v in values.tolist()], expected)
+                    self.assertEqual(tools.convert_unit(values, unit_start, unit_end).tolist(), expected)
+                self.assertEqual(tools.convert_unit(values, unit_start, 'std_metric').tolist(),
+                                 [float(v) / family[unit_start] for v in values])
+
+    def test_examples(self):
+        self.assertAlmostEqual(tools.convert_unit(1, 'in', 'cm'), 2.54, places=3)
+        self.assertAlmostEqual(tools.convert_unit(2, 'kg', 'N'), 19.62)
+        self.assertAlmostEqual(tools.convert_unit(90, 'min', 'hr'), 1.5)
+        self.assertEqual(tools.convert_unit(12, 'ft', 'ft'), 12.0)
+        self.assertIsNone(tools.convert_unit(None, 'm', 'in'))
+        self.assertEqual(tools.convert_unit(np.arange(3), 'm', 'm').dtype, float)
+
+    def test_capacity(self):
+        voltages = np.array([3.7, 7.4, 11.1, 22.2])
+        capacities = np.array([1.0, 5.5, 20.0, 80.0])
+        mah = tools.convert_unit(capacities, 'Wh', 'mAh', voltages)
+        self.assertEqual(mah.tolist(), [tools.convert_capacity(c, 'Wh', 'mAh', v)
+                                        for c, v in zip(capacities.tolist(), voltages.tolist())])
+        self.assertTrue(np.allclose(tools.convert_unit(mah, 'mAh', 'Wh', voltages), capacities))
+        self.assertTrue(np.allclose(tools.convert_unit(mah, 'mAh', 'std_metric', voltages), capacities))
+        self.assertEqual(tools.convert_unit(capacities, 'Wh', 'std_metric').tolist(), capacities.tolist())
+        self.assertEqual(tools.convert_unit(5.0, 'mAh', 'mAh'), 5.0)
+
+    def test_errors(self):
+        self.assertRaises(tools.ConversionError, tools.convert_unit, 1.0, 'furlong', 'm')
+        self.assertRaises(tools.ConversionError, tools.convert_unit, 1.0, 'furlong', 'std_metric')
+        self.assertRaises(tools.ConversionError, tools.convert_unit, np.ones(3), 'furlong', 'm')
+        self.assertRaises(tools.ConversionError, tools.convert_unit, 1.0, 'furlong', 'Wh', 11.1)
+        self.assertRaises(KeyError, tools.convert_unit, 1.0, 'm', 'furlong')
+        self.assertRaises(KeyError, tools.convert_unit, 1.0, 'm', 'N')
+        self.assertRaises(tools.CapacityConvError, tools.convert_unit, 1.0, 'mAh', 'std_metric')
+        self.assertRaises(tools.CapacityConvError, tools.convert_unit, 1.0, 'Wh', 'mAh')
+
+
+if __name__ == '__main__':
+    unittest.main()